@@ -1,20 +1,23 @@
 import os
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
 import auth
+from database import session_scope_dependency
 from api import admin_api
 from api import channel_api
 from api import coin_api
 from api import event_bonus_api
 from api import hot_bonus_api
 from api import language_api
+from api import metrics_api
 from api import public_api
 from api import slots_api
+from api import statistic_api
 from api import task_api
 from api import user_api
 
-base_router = APIRouter()
+base_router = APIRouter(dependencies=[Depends(session_scope_dependency)])
 base_router.include_router(public_api.router)
 base_router.include_router(admin_api.router)
 base_router.include_router(coin_api.router)
@@ -29,4 +32,6 @@ if not bool(int(os.getenv("DISABLE_HOT_BONUS", "0"))):
     base_router.include_router(hot_bonus_api.router)
 
 base_router.include_router(event_bonus_api.router)
+base_router.include_router(metrics_api.router)
+base_router.include_router(statistic_api.router)
 __all__ = ['base_router']
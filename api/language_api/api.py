@@ -6,7 +6,7 @@ from starlette.responses import JSONResponse
 
 import auth
 from database import update_user_language
-from lang.lang_provider import get_cached_lang, cache_lang
+from lang.lang_provider import get_cached_lang
 from lang_based_variable import Lang, message_data
 
 logger = logging.getLogger(__name__)
@@ -68,7 +68,6 @@ async def change_language(lang: Annotated[str, Query(description='The language')
                           user_id=Depends(auth.auth_dependency)):
     try:
         await update_user_language(user_id, Lang(lang))
-        await cache_lang(user_id, Lang(lang))
     except Exception as e:
         logger.error(e)
         return False
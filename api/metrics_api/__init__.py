@@ -0,0 +1,5 @@
+from .api import router
+
+__all__ = [
+    'router'
+]
@@ -0,0 +1,26 @@
+import logging
+
+from fastapi import APIRouter, Depends
+from starlette.responses import JSONResponse, PlainTextResponse
+
+from api.admin_api.auth import auth_dependency
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+    dependencies=[Depends(auth_dependency)],
+)
+
+
+@router.get('/')
+async def get_metrics():
+    return PlainTextResponse(registry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@router.get('/json')
+async def get_metrics_json():
+    return JSONResponse({"status": "OK",
+                         "data": registry.to_dict()})
@@ -0,0 +1,46 @@
+import logging
+from datetime import timedelta
+
+from fastapi import APIRouter, Depends, Query, HTTPException
+from redis import RedisError
+from starlette.responses import JSONResponse
+
+import database
+from api.admin_api.auth import auth_dependency
+from database import now
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/statistic",
+    tags=["statistic"],
+    dependencies=[Depends(auth_dependency)],
+)
+
+
+@router.get('/callbacks')
+async def get_callback_statistic(days: int = Query(7, ge=1, le=90, description="number of days up to today")):
+    """
+    Activities and distinct active users per callback query prefix and day, from the daily rollups.
+    """
+    since = now().date() - timedelta(days=days - 1)
+    rows = await database.get_callback_activity_statistic(since)
+    return JSONResponse({"status": "OK",
+                         "data": [{"date": day.isoformat(), "callback_query_prefix": prefix, "activities": activities, "active_users": active_users}
+                                  for day, prefix, activities, active_users in rows]})
+
+
+@router.get('/active-users')
+async def get_active_users(prefix: str | None = Query(None, description="registered callback query prefix, or 'other' for the rest; all activities if omitted")):
+    """
+    Live distinct active users of the current UTC hour, today (DAU), the last 7 days (WAU) and 30 days (MAU),
+    estimated from the HyperLogLogs of `ActivityStatisticMiddleware`.
+    """
+    try:
+        active_users = await database.count_active_users(prefix)
+    except RedisError as e:
+        logger.error(f"Failed to count active users: {e}")
+        raise HTTPException(status_code=503, detail="Active users are unavailable")
+    return JSONResponse({"status": "OK",
+                         "data": {"prefix": prefix, "hau": active_users.hour, "dau": active_users.day,
+                                  "wau": active_users.week, "mau": active_users.month}})
@@ -26,16 +26,18 @@ router = APIRouter(
     description=(
             "Fetch a paginated list of active tasks for the authenticated user. "
             "This endpoint allows filtering tasks by type and supports pagination "
-            "using the 'page' and 'limit' parameters. A valid user authentication token "
-            "is required to access this endpoint."
+            "using the 'page' and 'limit' parameters, or the 'next_cursor'/'prev_cursor' of the "
+            "previous response passed as 'cursor' (then 'page' is only echoed back as the current page). "
+            "A valid user authentication token is required to access this endpoint."
     )
 )
 async def get_active_task_page(user_id=Depends(auth.auth_dependency),
                                page: int = 1,
                                task_type: TaskType = None,
                                limit: int = 1,
+                               cursor: str = None,
                                ):
-    result = await get_task_page(user_id, page, task_type, limit)
+    result = await get_task_page(user_id, page, task_type, limit, cursor)
     return PaginatedResponse(result)
 
 
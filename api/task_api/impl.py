@@ -2,12 +2,13 @@ import asyncio
 import logging
 from io import BytesIO
 
+from fastapi.exceptions import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api_request import check_user_exists_via_api
 from chat_processor.chat_image import get_chat_img_by_chat_id
 from chat_processor.member import check_memberships
-from database import get_active_tasks_page, TaskType, Task, get_active_task_by_id, with_session, check_task_is_done, TaskDoneHistory, TransactionOperation, get_active_task
+from database import get_active_tasks_page, TaskType, Task, get_active_task_by_id, with_session, check_task_is_done, add_task_done, TransactionOperation, get_active_task, TaskSlot, ActiveTask, TaskDoneResult, mark_task_done, release_scoped_connection
 from transaction_manager import make_transaction_from_system, generate_trace, TraceType
 from utils.pagination import Pagination
 from .dto import TaskDto
@@ -18,8 +19,12 @@ logger = logging.getLogger(__name__)
 async def get_task_page(user_id: int,
                         page: int = 1,
                         task_type: TaskType = None,
-                        limit: int = 1, ) -> Pagination[dict]:
-    tasks: Pagination = await get_active_tasks_page(user_id=user_id, page=page, task_type=task_type, limit=limit)
+                        limit: int = 1,
+                        cursor: str = None) -> Pagination[dict]:
+    try:
+        tasks: Pagination = await get_active_tasks_page(user_id=user_id, page=page, task_type=task_type, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     tasks.map_each(lambda task: TaskDto.model_validate(task, from_attributes=True).model_dump(mode='json'))
     return tasks
 
@@ -27,26 +32,43 @@ async def get_task_page(user_id: int,
 @with_session(transaction=True)
 async def process_task_done(user_id: int, task_id: int, s: AsyncSession = None) -> bool:
     task: Task = await get_active_task_by_id(task_id, session=s)
+    if task is None:
+        return False
 
-    done = await check_task_is_done(task.id, user_id, s=s)
+    done = await check_task_is_done(task.id, user_id)
 
     if done:
         return True
 
-    logger.info(f"Checking task {task.id} for user {user_id} - Validating memberships and API activations")
+    async with TaskSlot(task) as slot:
+        if not slot.reserved:
+            return False
 
-    subscription_passed = await check_memberships(user_id, task.require_subscriptions)
-    api_validation_passed = await check_api_activation(user_id, task)
+        logger.info(f"Checking task {task.id} for user {user_id} - Validating memberships and API activations")
 
-    if not (subscription_passed and api_validation_passed):
-        logger.warning(f"Task {task.id} validation failed for user {user_id}. Subscriptions passed: {subscription_passed}, API passed: {api_validation_passed}")
-        return False
+        # the checks call Telegram and the task's services, the update's connection isn't needed meanwhile
+        await release_scoped_connection()
+        subscription_passed = await check_memberships(user_id, task.require_subscriptions)
+        api_validation_passed = await check_api_activation(user_id, task)
+
+        if not (subscription_passed and api_validation_passed):
+            logger.warning(f"Task {task.id} validation failed for user {user_id}. Subscriptions passed: {subscription_passed}, API passed: {api_validation_passed}")
+            return False
+
+        logger.info(f"Task {task.id} successfully validated for user {user_id}. Adding task history and processing transaction.")
+
+        result = await add_task_done(task, user_id, s=s)
+        if result is TaskDoneResult.ALREADY_DONE:
+            return True
+        if result is TaskDoneResult.USED_UP:
+            return False
 
-    logger.info(f"Task {task.id} successfully validated for user {user_id}. Adding task history and processing transaction.")
+        # commits the completion along with the reward: the slot is used and the task marked done only once it is
+        await make_transaction_from_system(user_id, TransactionOperation.INCREMENT, task.done_reward, description="task done",
+                                           trace=generate_trace(TraceType.TASK_DONE, str(task.trace_uuid)), session=s, currency_type=task.coin_type)
+        slot.confirm()
 
-    s.add(TaskDoneHistory(reward=task.done_reward, user_id=user_id, task_id=task.id))
-    await make_transaction_from_system(user_id, TransactionOperation.INCREMENT, task.done_reward, description="task done",
-                                       trace=generate_trace(TraceType.TASK_DONE, str(task.trace_uuid)), session=s, currency_type=task.coin_type)
+    await mark_task_done(user_id, task.id)
 
     logger.info(f"Task {task.id} done successfully for user {user_id}. Reward: {task.done_reward}")
     return True
@@ -66,7 +88,7 @@ async def check_api_activation(user_id: int, task: Task) -> bool:
 
 
 async def get_task_chat_photo(user_id: int, task_id: int, img_filed_name: str) -> BytesIO | None:
-    task: Task = await get_active_task(user_id, task_id)
+    task: ActiveTask = await get_active_task(user_id, task_id)
 
     if task.require_subscriptions is None or len(task.require_subscriptions) == 0:
         return None
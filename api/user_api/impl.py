@@ -8,7 +8,7 @@ from variables import bot
 from .dto import UserDto
 
 
-@with_session
+@with_session(readonly=True)
 async def get_user(user_id: int, s: AsyncSession = None) -> UserDto | None:
     user = await get_user_by_tg(user_id, s=s)
     ref_count = await get_user_referrals_count(user_id, s=s, cache_id=user_id)
@@ -0,0 +1,108 @@
+"""
+Compares the cache codecs on the values the `@cacheable` functions actually return.
+
+    python -m benchmarks.cache_codecs [--iterations N]
+
+`legacy` is what `cacheable` did before the codec layer: dill for the
+`save_as_blob` functions, JSON with a dill fallback for the rest.
+"""
+import argparse
+import datetime
+import random
+import time
+import timeit
+from typing import Any, Callable
+
+from sqlalchemy import create_engine, MetaData, Table, Column, Date, Integer, select
+from tabulate import tabulate
+
+from cache.codecs import BinaryCodec, DillCodec, JsonCodec, CodecError
+from database.entities import EventBonus
+from database.enums import CurrencyType
+
+
+def _rows(days: int) -> list:
+    """Real `Row` objects shaped like the `(date, count)` statistics results."""
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    table = Table("stats", metadata, Column("d", Date), Column("c", Integer))
+    metadata.create_all(engine)
+    today = datetime.date.today()
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{"d": today - datetime.timedelta(days=i), "c": random.randint(0, 50_000)} for i in range(days)])
+        return list(reversed(conn.execute(select(table.c.d, table.c.c)).all()))
+
+
+def _event_bonus() -> EventBonus:
+    now = datetime.datetime.now(datetime.UTC)
+    return EventBonus(id=7, name="halloween", cooldown="3h", conversion_to=CurrencyType.GMEME, min_win=900, max_win=3000,
+                      start_datetime=now, end_datetime=now + datetime.timedelta(days=3))
+
+
+def samples() -> dict[str, tuple[Any, bool]]:
+    """name -> (value, was it cached with save_as_blob=True)"""
+    return {
+        'is_user_exists_by_tg (bool)': (True, False),
+        'get_setting (int)': (1000, False),
+        'get_users_statistic (tuple)': ((412, 1_254_331), True),
+        'get_incoming_statistic (30 rows)': (_rows(30), True),
+        'get_activity_statistic (365 rows)': (_rows(365), True),
+        'get_active_event_by_id (ORM)': (_event_bonus(), True),
+    }
+
+
+class LegacyCodec:
+    def __init__(self, save_as_blob: bool):
+        self._save_as_blob = save_as_blob
+        self._json = JsonCodec()
+        self._dill = DillCodec()
+
+    def encode(self, value: Any) -> bytes:
+        if self._save_as_blob:
+            return self._dill.encode(value)
+        try:
+            return self._json.encode(value)
+        except CodecError:
+            return self._dill.encode(value)
+
+    def decode(self, payload: bytes) -> Any:
+        if self._save_as_blob:
+            return self._dill.decode(payload)
+        try:
+            return self._json.decode(payload)
+        except CodecError:
+            return self._dill.decode(payload)
+
+
+def _per_call_us(fn: Callable[[], Any], iterations: int) -> float:
+    return min(timeit.repeat(fn, number=iterations, repeat=5)) / iterations * 1_000_000
+
+
+def run(iterations: int) -> str:
+    binary = BinaryCodec()
+    rows = []
+    for name, (value, save_as_blob) in samples().items():
+        for codec_name, codec in (('legacy', LegacyCodec(save_as_blob)), ('binary', binary)):
+            payload = codec.encode(value)
+            rows.append([
+                name,
+                codec_name,
+                len(payload),
+                f"{_per_call_us(lambda: codec.encode(value), iterations):.1f}",
+                f"{_per_call_us(lambda: codec.decode(payload), iterations):.1f}",
+            ])
+    return tabulate(rows, headers=['value', 'codec', 'bytes', 'encode us', 'decode us'], tablefmt='grid')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    print(run(args.iterations))
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
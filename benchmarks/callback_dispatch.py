@@ -0,0 +1,133 @@
+"""
+Measures the dispatch overhead of a callback query through the router tree, with and without the prefix pre-filters.
+
+    python -m benchmarks.callback_dispatch [--rounds N]
+
+The tree is a copy of `handlers.base_router` and `handlers.custom_router`
+with no-op handlers, keeping only each handler's `CallbackData` filter
+(handlers without one get a filter that rejects), so only the dispatch
+itself is measured. `3x` repeats the whole tree three times under distinct
+prefixes. Every prefix of the tree is dispatched once per round; no
+Telegram, Redis or database access.
+"""
+import argparse
+import asyncio
+import enum
+import functools
+import time
+import types
+import typing
+from typing import Any
+
+from aiogram import Router, Bot
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.filters.callback_data import CallbackData, CallbackQueryFilter
+from aiogram.types import CallbackQuery, User
+from tabulate import tabulate
+
+import handlers
+from utils.callback_prefix_filters import install_callback_prefix_filters
+
+_USER = User(id=1, is_bot=False, first_name="benchmark")
+
+
+async def _handle(*_, **__) -> None:
+    pass
+
+
+async def _reject(*_, **__) -> bool:
+    return False
+
+
+@functools.cache
+def _renamed(callback_data: type[CallbackData], copy: int) -> type[CallbackData]:
+    if copy == 0:
+        return callback_data
+    prefix = f"{callback_data.__prefix__}-{copy}"
+    return types.new_class(f"{callback_data.__name__}{copy}", (callback_data,), {'prefix': prefix})
+
+
+def _clone(router: Router, copy: int, callback_data: set) -> Router:
+    clone = Router(name=f"{router.name}-{copy}")
+    for handler in router.callback_query.handlers:
+        filters = []
+        for filter_object in handler.filters or ():
+            if isinstance(filter_object.callback, CallbackQueryFilter):
+                cls = _renamed(filter_object.callback.callback_data, copy)
+                callback_data.add(cls)
+                filters.append(cls.filter())
+        # handlers filtering on something else than callback data (a state) are tried, but don't match
+        clone.callback_query.register(_handle, *(filters or [_reject]))
+    for sub_router in router.sub_routers:
+        clone.include_router(_clone(sub_router, copy, callback_data))
+    return clone
+
+
+def _tree(copies: int) -> tuple[Router, list[type[CallbackData]]]:
+    root = Router(name="root")
+    callback_data = set()
+    for copy in range(copies):
+        for router in (handlers.base_router, handlers.custom_router):
+            root.include_router(_clone(router, copy, callback_data))
+    return root, sorted(callback_data, key=lambda cls: cls.__prefix__)
+
+
+def _sample_value(annotation: Any) -> Any:
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        annotation = next(a for a in typing.get_args(annotation) if a is not type(None))
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return next(iter(annotation))
+    return {int: 1, float: 1.0, bool: False, str: "x"}[annotation]
+
+
+def _sample_data(cls: type[CallbackData]) -> str:
+    return cls(**{name: _sample_value(field.annotation) for name, field in cls.model_fields.items()}).pack()
+
+
+async def _measure(root: Router, data: list[str], rounds: int) -> tuple[float, float]:
+    bot = Bot("1:benchmark")
+    events = [CallbackQuery(id=str(i), from_user=_USER, chat_instance="benchmark", data=d) for i, d in enumerate(data)]
+    checks = 0
+    check = HandlerObject.check
+
+    async def counting_check(self, *args, **kwargs):
+        nonlocal checks
+        checks += 1
+        return await check(self, *args, **kwargs)
+
+    HandlerObject.check = counting_check
+    try:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for event in events:
+                await root.propagate_event(update_type="callback_query", event=event, bot=bot)
+        elapsed = time.perf_counter() - started
+    finally:
+        HandlerObject.check = check
+        await bot.session.close()
+    dispatched = rounds * len(events)
+    return elapsed / dispatched * 1_000_000, checks / dispatched
+
+
+async def run(rounds: int) -> str:
+    rows = []
+    for copies in (1, 3):
+        for filtered in (False, True):
+            root, callback_data = _tree(copies)
+            if filtered:
+                install_callback_prefix_filters(root)
+            data = [_sample_data(cls) for cls in callback_data]
+            us, checks = await _measure(root, data, rounds)
+            rows.append([f"{copies}x", len(data), 'prefix filters' if filtered else 'linear', f"{checks:.1f}", f"{us:.1f}"])
+    return tabulate(rows, headers=['tree', 'prefixes', 'dispatch', 'handler checks / callback', 'us / callback'], tablefmt='grid')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+    print(asyncio.run(run(args.rounds)))
+
+
+if __name__ == '__main__':
+    main()
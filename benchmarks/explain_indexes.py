@@ -0,0 +1,177 @@
+"""
+Captures `EXPLAIN (ANALYZE, BUFFERS)` of the repository queries behind the hot lookup indexes, without and with them.
+
+    python -m benchmarks.explain_indexes [--users N] [--output DIR]
+
+Fills the tables with a synthetic dataset scaled on N users in a transaction that is rolled back at
+the end, drops the indexes of the `add indexes for hot lookups` migration inside it for the `before`
+plans and creates them again for the `after` ones. The repository functions run on sessions joined
+to that transaction (their commits only release savepoints); their statements are recorded from the
+engine events and explained with the same parameters. The plans are written to DIR.
+Locks the tables while it runs, point DATABASE_URL at a copy of the database.
+"""
+import argparse
+import asyncio
+import datetime
+import pathlib
+import random
+import re
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import event, insert, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.schema import AddConstraint, CreateIndex
+from tabulate import tabulate
+
+from database import Base, engine, now, User, Task, TaskType, TaskDoneHistory, Transaction, TransactionType, TransactionOperation, \
+    TransactionStatus, TransactionInitiatorType, CurrencyType, Mailing, MailingStatus, MailingMessage, MailingMessageStatus, \
+    UserActivityStatistic, get_user_referrals_count, get_users_referrals_count, get_top_users_by_referrals, \
+    get_top_users_by_referrals_with_start_date, get_mailing_statistic, update_mailing_message_statuses_by_mailing_id, get_activity_statistic
+from database.done_tasks import load_done_task_ids
+from transaction_manager.manager import select_transactions_sum_amount
+
+_BASE_ID = 9_000_000_000_000  # far from real telegram ids
+_TASKS = 200
+_MAILINGS = 10
+
+_INDEXES = ('ix_users_referred_by_id', 'ix_tasks_done_history_user_id_task_id', 'ix_transactions_source_id_type',
+            'ix_mailing_messages_mailing_id_status', 'ix_user_activity_statistics_datetime')
+_TASK_DONE_ONCE = 'uq_tasks_done_history_task_id_user_id'
+_TABLES = ('users', 'tasks', 'tasks_done_history', 'transactions', 'mailings', 'mailing_messages', 'user_activity_statistics')
+
+
+def _session(conn: AsyncConnection) -> AsyncSession:
+    return AsyncSession(bind=conn, join_transaction_mode='create_savepoint', expire_on_commit=False)
+
+
+async def _fill(conn: AsyncConnection, users: int) -> dict[str, Any]:
+    started = now()
+    user_ids = [_BASE_ID + i for i in range(1, users + 1)]
+    async with _session(conn) as s:
+        # half of the users are referred, mostly by the oldest users
+        await s.execute(insert(User), [
+            {'telegram_id': user_id, 'created_at': started - datetime.timedelta(days=random.random() * 365),
+             'referred_by_id': user_ids[int(random.random() ** 3 * i)] if i and i % 2 == 0 else None}
+            for i, user_id in enumerate(user_ids)])
+        task_ids = list((await s.execute(insert(Task).returning(Task.id), [
+            {'type': TaskType.BONUS, 'title': f"benchmark {i}", 'coin_type': CurrencyType.GMEME, 'done_reward': 1,
+             'markup': {'inline_keyboard': []}, 'created_by_id': user_ids[0]}
+            for i in range(_TASKS)])).scalars())
+        await s.execute(insert(TaskDoneHistory), [
+            {'reward': 1, 'user_id': user_ids[pair // _TASKS], 'task_id': task_ids[pair % _TASKS]}
+            for pair in random.sample(range(users * _TASKS), users * 2)])
+        await s.execute(insert(Transaction), [
+            {'operation': TransactionOperation.INCREMENT, 'type': random.choice(list(TransactionType)), 'amount': random.randint(1, 1000),
+             'currency_type': CurrencyType.GMEME, 'destination_balance_before': 0, 'destination_balance_after': 0, 'source_balance_before': 0,
+             'source_balance_after': 0, 'status': TransactionStatus.COMPLETED, 'initiator_type': TransactionInitiatorType.SYSTEM,
+             'description': "benchmark", 'source_id': random.choice(user_ids), 'destination_id': random.choice(user_ids)}
+            for _ in range(users * 4)])
+        mailing_ids = list((await s.execute(insert(Mailing).returning(Mailing.id), [
+            {'text': "benchmark", 'status': MailingStatus.COMPLETED, 'created_by_id': user_ids[0]} for _ in range(_MAILINGS)])).scalars())
+        await s.execute(insert(MailingMessage), [
+            {'text': "benchmark", 'status': random.choice(list(MailingMessageStatus)), 'destination_id': user_id,
+             'mailing_id': random.choice(mailing_ids)}
+            for user_id in user_ids])
+        await s.execute(insert(UserActivityStatistic), [
+            {'user_id': random.choice(user_ids), 'datetime_': started - datetime.timedelta(seconds=i * 7)}
+            for i in range(users * 4)])
+        await s.commit()
+    await conn.execute(text(f"ANALYZE {', '.join(_TABLES)}"))
+    return {'user_id': user_ids[1], 'referrer_id': user_ids[0], 'user_ids': user_ids[:50], 'mailing_id': mailing_ids[0]}
+
+
+def _queries(ids: dict[str, Any]) -> dict[str, Callable[[AsyncSession], Awaitable[Any]]]:
+    return {
+        'get_user_referrals_count': lambda s: get_user_referrals_count.__wrapped__(ids['referrer_id'], s=s),
+        'get_users_referrals_count': lambda s: get_users_referrals_count(ids['user_ids'], s=s),
+        'get_top_users_by_referrals': lambda s: get_top_users_by_referrals(s=s),
+        'get_top_users_by_referrals_with_start_date': lambda s: get_top_users_by_referrals_with_start_date(now() - datetime.timedelta(days=30), s=s),
+        'load_done_task_ids': lambda s: load_done_task_ids(ids['user_id'], s=s),
+        'select_transactions_sum_amount': lambda s: select_transactions_sum_amount(ids['user_id'], TransactionType.WITHDRAW, s=s),
+        'get_mailing_statistic': lambda s: get_mailing_statistic(ids['mailing_id'], s=s),
+        'update_mailing_message_statuses_by_mailing_id': lambda s: update_mailing_message_statuses_by_mailing_id(ids['mailing_id'], MailingMessageStatus.CANCELED, s=s),
+        'get_activity_statistic': lambda s: get_activity_statistic.__wrapped__(s=s),
+    }
+
+
+async def _explain(conn: AsyncConnection, call: Callable[[AsyncSession], Awaitable[Any]]) -> list[str]:
+    statements = []
+
+    def on_execute(_conn, _cursor, statement, parameters, _context, _executemany):
+        if not statement.lstrip().upper().startswith(('SAVEPOINT', 'RELEASE', 'ROLLBACK')):
+            statements.append((statement, parameters))
+
+    event.listen(conn.sync_connection, 'before_cursor_execute', on_execute)
+    try:
+        async with _session(conn) as s:
+            await call(s)
+    finally:
+        event.remove(conn.sync_connection, 'before_cursor_execute', on_execute)
+    if not statements:
+        raise RuntimeError("the function executed no statement")
+
+    plans = []
+    for statement, parameters in statements:
+        result = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+        plans.append('\n'.join(result.scalars()))
+    return plans
+
+
+def _summary(plan: str) -> tuple[str, int]:
+    execution = re.search(r"Execution Time: ([\d.]+) ms", plan)
+    # the first Buffers line is the one of the root node, which includes its children
+    buffers = re.search(r"Buffers: shared((?: \w+=\d+)+)", plan)
+    pages = sum(int(n) for n in re.findall(r"=(\d+)", buffers.group(1))) if buffers else 0
+    return execution.group(1) if execution else '?', pages
+
+
+async def _drop_indexes(conn: AsyncConnection) -> None:
+    await conn.execute(text(f"ALTER TABLE tasks_done_history DROP CONSTRAINT IF EXISTS {_TASK_DONE_ONCE}"))
+    for name in _INDEXES:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+async def _create_indexes(conn: AsyncConnection) -> None:
+    # the definitions of the entities, which the migration creates concurrently
+    indexes = {index.name: index for table in Base.metadata.tables.values() for index in table.indexes}
+    for name in _INDEXES:
+        await conn.execute(CreateIndex(indexes[name]))
+    await conn.execute(AddConstraint(next(c for c in TaskDoneHistory.__table__.constraints if c.name == _TASK_DONE_ONCE)))
+
+
+async def run(users: int, output: pathlib.Path) -> str:
+    output.mkdir(parents=True, exist_ok=True)
+    rows = []
+    async with engine.connect() as conn:
+        await conn.begin()
+        try:
+            await _drop_indexes(conn)
+            queries = _queries(await _fill(conn, users))
+            plans = {name: [await _explain(conn, call)] for name, call in queries.items()}
+            await _create_indexes(conn)
+            for name, call in queries.items():
+                plans[name].append(await _explain(conn, call))
+        finally:
+            await conn.rollback()
+
+    for name, (before, after) in plans.items():
+        for label, statement_plans in (('before', before), ('after', after)):
+            (output / f"{name}.{label}.txt").write_text('\n\n'.join(statement_plans) + '\n')
+        for i, (plan_before, plan_after) in enumerate(zip(before, after)):
+            (ms_before, pages_before), (ms_after, pages_after) = _summary(plan_before), _summary(plan_after)
+            rows.append([name if i == 0 else '', ms_before, ms_after, pages_before, pages_after])
+
+    await engine.dispose()
+    return tabulate(rows, headers=['function', 'before ms', 'after ms', 'before buffers', 'after buffers'], tablefmt='grid')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--output', type=pathlib.Path, default=pathlib.Path('explain_plans'))
+    args = parser.parse_args()
+    print(asyncio.run(run(args.users, args.output)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares `with_session` and `with_session(readonly=True)` on the hot read-only lookups.
+
+    python -m benchmarks.readonly_session [--calls N] [--user-id ID]
+
+Round trips are counted per call from the engine events: the pre-ping of
+every checkout (the engine uses pool_pre_ping), each statement, and
+BEGIN/COMMIT/ROLLBACK unless the connection is in autocommit mode (the
+driver sends none of them then).
+Runs read-only queries against DATABASE_URL.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Callable, Awaitable, Any
+
+from sqlalchemy import event
+from tabulate import tabulate
+
+from database import engine, with_session, get_user_balance, get_user_language, get_user_by_tg
+
+
+def _modes(f: Callable) -> dict[str, Callable[..., Awaitable[Any]]]:
+    raw = f.__wrapped__
+    return {'with_session': with_session(raw), 'readonly': with_session(readonly=True)(raw)}
+
+
+def _autocommit(conn) -> bool:
+    return conn.get_execution_options().get('isolation_level') == 'AUTOCOMMIT'
+
+
+async def run(calls: int, user_id: int) -> str:
+    round_trips = 0
+
+    def on_round_trip(*_):
+        nonlocal round_trips
+        round_trips += 1
+
+    def on_transaction_statement(conn, *_):
+        if not _autocommit(conn):
+            on_round_trip()
+
+    event.listen(engine.sync_engine.pool, 'checkout', on_round_trip)
+    event.listen(engine.sync_engine, 'before_cursor_execute', on_round_trip)
+    for name in ('begin', 'commit', 'rollback'):
+        event.listen(engine.sync_engine, name, on_transaction_statement)
+
+    rows = []
+    for f in (get_user_balance, get_user_language, get_user_by_tg):
+        for mode, call in _modes(f).items():
+            await call(user_id)  # warm up the statement cache
+            round_trips = 0
+            latencies = []
+            for _ in range(calls):
+                started = time.perf_counter()
+                await call(user_id)
+                latencies.append((time.perf_counter() - started) * 1000)
+            p99 = statistics.quantiles(latencies, n=100)[98]
+            rows.append([f.__name__, mode, round_trips / calls, f"{statistics.median(latencies):.3f}", f"{p99:.3f}"])
+
+    await engine.dispose()
+    return tabulate(rows, headers=['function', 'mode', 'round trips / call', 'p50 ms', 'p99 ms'], tablefmt='grid')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=1000)
+    parser.add_argument('--user-id', type=int, default=1)
+    args = parser.parse_args()
+    print(asyncio.run(run(args.calls, args.user_id)))
+
+
+if __name__ == '__main__':
+    main()
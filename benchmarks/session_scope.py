@@ -0,0 +1,70 @@
+"""
+Counts pool checkouts and commits of one bot update with and without `session_scope`.
+
+    python -m benchmarks.session_scope [--updates N] [--user-id ID]
+
+The update is the cold-cache database path of a typical callback: the user
+filters, the language middleware and a handler reading the user. Cached
+functions are called through `__wrapped__`, so Redis is not needed.
+Runs read-only queries against DATABASE_URL.
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import event
+from tabulate import tabulate
+
+from database import engine, session_scope, get_user_by_tg, get_user_balance, get_user_language, \
+    is_user_exists_by_tg, is_good_user_by_tg, has_premium
+
+
+async def _update(user_id: int) -> None:
+    await is_user_exists_by_tg.__wrapped__(user_id)
+    await is_good_user_by_tg.__wrapped__(user_id)
+    await get_user_language(user_id)
+    await has_premium.__wrapped__(user_id)
+    await get_user_by_tg(user_id)
+    await get_user_balance(user_id)
+
+
+async def _scoped_update(user_id: int) -> None:
+    async with session_scope():
+        await _update(user_id)
+
+
+async def run(updates: int, user_id: int) -> str:
+    counters = {'checkouts': 0, 'commits': 0}
+
+    def on_checkout(*_):
+        counters['checkouts'] += 1
+
+    def on_commit(*_):
+        counters['commits'] += 1
+
+    event.listen(engine.sync_engine.pool, 'checkout', on_checkout)
+    event.listen(engine.sync_engine, 'commit', on_commit)
+
+    rows = []
+    for name, update in (('with_session per call', _update), ('session_scope', _scoped_update)):
+        counters.update(checkouts=0, commits=0)
+        started = time.perf_counter()
+        for _ in range(updates):
+            await update(user_id)
+        elapsed = time.perf_counter() - started
+        rows.append([name, counters['checkouts'] / updates, counters['commits'] / updates, f"{elapsed / updates * 1000:.2f}"])
+
+    await engine.dispose()
+    return tabulate(rows, headers=['mode', 'checkouts / update', 'commits / update', 'ms / update'], tablefmt='grid')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', type=int, default=200)
+    parser.add_argument('--user-id', type=int, default=1)
+    args = parser.parse_args()
+    print(asyncio.run(run(args.updates, args.user_id)))
+
+
+if __name__ == '__main__':
+    main()
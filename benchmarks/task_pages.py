@@ -0,0 +1,117 @@
+"""
+Compares the latency of a task catalog page at the first and at deep pages.
+
+    python -m benchmarks.task_pages [--tasks N] [--limit N] [--rounds N]
+
+`sql` is what a page flip did before: the per-user `GROUP BY` over
+`tasks_done_history`, `count(*)` over the filtered join, then
+`LIMIT/OFFSET`. `catalog` is `get_active_tasks_page` with the cursor of the
+previous page: the user's completed task ids from REDIS, then the
+in-process `task_catalog` filtered in memory.
+Inserts N bonus tasks into DATABASE_URL in a transaction that is rolled
+back at the end (the catalog is built from that transaction), and drops
+the Redis keys it wrote.
+"""
+import argparse
+import asyncio
+import datetime
+import statistics
+import time
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.orm import aliased
+from tabulate import tabulate
+
+import database.task_catalog
+from database import engines, get_session, User, Task, TaskType, TaskDoneHistory, CurrencyType, now, get_active_tasks_page, \
+    done_based_task_available, pool_based_task_available
+from database.done_tasks import done_tasks_key
+from database.task_catalog import load_catalog_tasks
+from variables import redis
+
+_USER_ID = 0  # a user without completions
+
+
+async def _sql_page(s, page: int, limit: int) -> list[Task]:
+    user_done_history = aliased(TaskDoneHistory)
+    user_done_subquery = (
+        select(user_done_history.task_id.label('task_id'), func.count(user_done_history.id).label('user_done_count'))
+        .filter(user_done_history.user_id.__eq__(_USER_ID))
+        .group_by(user_done_history.task_id)
+        .subquery()
+    )
+    stmt = (
+        select(Task)
+        .outerjoin(user_done_subquery, Task.id == user_done_subquery.c.task_id)
+        .filter(and_(Task.deleted_at.is_(None),
+                     or_(and_(Task.type == TaskType.TIME_BASED, or_(Task.expires_at.is_(None), Task.expires_at > now(native=True))),
+                         done_based_task_available(), pool_based_task_available(), Task.type == TaskType.BONUS),
+                     or_(user_done_subquery.c.user_done_count.is_(None), user_done_subquery.c.user_done_count == 0)))
+        .filter(Task.type.__eq__(TaskType.BONUS))
+    )
+    await s.execute(stmt.with_only_columns(func.count()))
+    stmt = stmt.order_by(Task.created_at.desc()).limit(limit).offset((page - 1) * limit)
+    return list((await s.execute(stmt)).scalars())
+
+
+async def _median_ms(call: Callable[[], Awaitable[Any]], rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+async def run(tasks: int, limit: int, rounds: int) -> str:
+    rows = []
+    async with get_session() as s:
+        creator = await s.scalar(select(User.telegram_id).limit(1))
+        if creator is None:
+            raise SystemExit("DATABASE_URL has no users to create the tasks with")
+        started = now()
+        s.add_all([Task(type=TaskType.BONUS, title=f"benchmark {i}", coin_type=CurrencyType.GMEME, done_reward=1, markup={'inline_keyboard': []},
+                        created_by_id=creator, created_at=started - datetime.timedelta(seconds=i))
+                   for i in range(tasks)])
+        await s.flush()
+        # the catalog of this process only sees the benchmark's transaction
+        database.task_catalog.load_catalog_tasks = lambda: load_catalog_tasks(s=s)
+
+        last_page = (tasks + limit - 1) // limit
+        pages = sorted({p for p in (1, 2, 10, 100, 1000, last_page) if p <= last_page})
+
+        # the cursor of every page, collected by walking the catalog once
+        cursors = {1: None}
+        page, cursor = 1, None
+        while page < pages[-1]:
+            cursor = (await get_active_tasks_page(_USER_ID, page, TaskType.BONUS, limit, cursor)).next_cursor
+            page += 1
+            cursors[page] = cursor
+
+        try:
+            for page in pages:
+                sql_ms = await _median_ms(lambda: _sql_page(s, page, limit), rounds)
+                catalog_ms = await _median_ms(lambda: get_active_tasks_page(_USER_ID, page, TaskType.BONUS, limit, cursors[page]), rounds)
+                rows.append([page, f"{sql_ms:.2f}", f"{catalog_ms:.2f}"])
+        finally:
+            database.task_catalog.load_catalog_tasks = load_catalog_tasks
+            await s.rollback()
+            await redis.delete(done_tasks_key(_USER_ID))
+
+    for e in engines.values():
+        await e.dispose()
+    return tabulate(rows, headers=['page', 'sql ms', 'catalog ms'], tablefmt='grid')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', type=int, default=2_000)
+    parser.add_argument('--limit', type=int, default=4)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+    print(asyncio.run(run(args.tasks, args.limit, args.rounds)))
+
+
+if __name__ == '__main__':
+    main()
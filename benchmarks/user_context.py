@@ -0,0 +1,102 @@
+"""
+Compares the per-user lookups of the filters and middlewares with `get_user_context`.
+
+    python -m benchmarks.user_context [--users N]
+
+`legacy` is what one update did before: `is_user_exists_by_tg`,
+`is_good_user_by_tg`, `is_admin`, `is_user_admin_by_tg_id`, `has_premium`
+(each its own `@cacheable` string key) and the `lang:{id}` key of
+`get_cached_lang`. Redis round trips are counted per connection checkout
+(a pipeline is one), SQL statements from the engine events, memory with
+MEMORY USAGE over the keys of the first N users.
+Writes cache keys of those users to REDIS and reads DATABASE_URL.
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+from tabulate import tabulate
+
+from cache.local_cache import local_cache
+from database import engines, get_session, User, get_user_context, is_user_exists_by_tg, is_good_user_by_tg, is_admin, \
+    is_user_admin_by_tg_id, has_premium, get_user_language
+from database.user_context import user_context_key
+from variables import redis
+
+_LEGACY_FUNCTIONS = (is_user_exists_by_tg, is_good_user_by_tg, is_admin, is_user_admin_by_tg_id, has_premium)
+
+
+def _legacy_keys(user_id: int) -> list[str]:
+    return [f"{f.__name__}:{user_id}" for f in _LEGACY_FUNCTIONS] + [f"lang:{user_id}"]
+
+
+async def _legacy_update(user_id: int) -> None:
+    for f in _LEGACY_FUNCTIONS:
+        await f(user_id, cache_id=user_id)
+    # the former get_cached_lang
+    if await redis.get(f"lang:{user_id}") is None:
+        await redis.set(f"lang:{user_id}", (await get_user_language(user_id)).value)
+
+
+async def _context_update(user_id: int) -> None:
+    # four filters/middlewares and the language middleware
+    for _ in range(5):
+        await get_user_context(user_id)
+
+
+async def _user_ids(count: int) -> list[int]:
+    async with get_session() as s:
+        return list((await s.execute(select(User.telegram_id).limit(count))).scalars())
+
+
+async def run(users: int) -> str:
+    counters = {'round_trips': 0, 'statements': 0}
+    get_connection = redis.connection_pool.get_connection
+
+    async def counting_get_connection(*args, **kwargs):
+        counters['round_trips'] += 1
+        return await get_connection(*args, **kwargs)
+
+    def on_statement(*_):
+        counters['statements'] += 1
+
+    redis.connection_pool.get_connection = counting_get_connection
+    event.listen(Engine, 'before_cursor_execute', on_statement)
+
+    user_ids = await _user_ids(users)
+    await redis.delete(*[k for id_ in user_ids for k in (*_legacy_keys(id_), user_context_key(id_))])
+
+    rows = []
+    for name, update, keys in (('legacy', _legacy_update, _legacy_keys),
+                               ('user context', _context_update, lambda id_: [user_context_key(id_)])):
+        per_phase = []
+        # cold: nothing cached; warm: Redis filled, L1 empty (another worker, or L1 expired); hot: L1 filled
+        for phase in ('cold', 'warm', 'hot'):
+            if phase != 'hot':
+                local_cache.clear()
+            counters.update(round_trips=0, statements=0)
+            for id_ in user_ids:
+                if phase == 'warm':
+                    local_cache.clear()
+                await update(id_)
+            per_phase.append(f"{counters['round_trips'] / len(user_ids):.1f} / {counters['statements'] / len(user_ids):.1f}")
+        memory = [await redis.memory_usage(k) or 0 for id_ in user_ids for k in keys(id_)]
+        rows.append([name, *per_phase, len(keys(user_ids[0])), f"{sum(memory) / len(user_ids):.0f}"])
+
+    redis.connection_pool.get_connection = get_connection
+    for e in engines.values():
+        await e.dispose()
+    return tabulate(rows, headers=['mode', 'cold rt / sql', 'warm rt / sql', 'hot rt / sql', 'keys / user', 'bytes / user'],
+                    tablefmt='grid')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    args = parser.parse_args()
+    print(asyncio.run(run(args.users)))
+
+
+if __name__ == '__main__':
+    main()
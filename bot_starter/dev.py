@@ -1,5 +1,5 @@
 import handlers
-from bot_starter.same import crate_consumer, shutdown
+from bot_starter.same import crate_consumer, create_cache_invalidation_listener, create_task_counter_reconciler, create_statistic_rollup_job, start_task_catalog, warm_up_cache, prefilter_callback_handlers, shutdown
 from database import init_db
 from variables import bot, dp
 from .log import logger
@@ -16,8 +16,14 @@ async def dev() -> None:
     logger.info("Including routers and setting up development mode...")
     dp.include_router(handlers.base_router)
     dp.include_router(handlers.custom_router)
+    prefilter_callback_handlers()
 
     await crate_consumer()
+    await create_cache_invalidation_listener()
+    await create_task_counter_reconciler()
+    await create_statistic_rollup_job()
+    await start_task_catalog()
+    await warm_up_cache()
 
     try:
         logger.info("Starting polling...")
@@ -7,7 +7,7 @@ from starlette.middleware.cors import CORSMiddleware
 
 import api
 import handlers
-from bot_starter.same import crate_consumer, shutdown
+from bot_starter.same import crate_consumer, create_cache_invalidation_listener, create_task_counter_reconciler, create_statistic_rollup_job, start_task_catalog, warm_up_cache, prefilter_callback_handlers, shutdown
 from variables import bot, dp, WEBHOOK_SECRET, WEBHOOK_PATH, WEB_SERVER_HOST, WEB_SERVER_PORT, WEBHOOK_URL, uvicorn_logging_config
 
 logger = logging.getLogger(__name__)
@@ -26,6 +26,11 @@ app.add_middleware(
 async def on_prod_startup():
     logger.info("Running production startup sequence...")
     await crate_consumer()
+    await create_cache_invalidation_listener()
+    await create_task_counter_reconciler()
+    await create_statistic_rollup_job()
+    await start_task_catalog()
+    await warm_up_cache()
 
     logger.info(f"Setting webhook to {WEBHOOK_URL}{WEBHOOK_PATH}...")
     await bot.set_webhook(f"{WEBHOOK_URL}{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET)
@@ -71,6 +76,7 @@ def prod() -> None:
     logger.info("Including routers and setting up production mode...")
     dp.include_router(handlers.base_router)
     dp.include_router(handlers.custom_router)
+    prefilter_callback_handlers()
 
     logger.info(f"Starting web server at {WEB_SERVER_HOST}:{WEB_SERVER_PORT}...")
     import uvicorn
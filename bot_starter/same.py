@@ -1,8 +1,12 @@
 import asyncio
+import os
 
+from cache import InvalidationListener, warm_up
+from database import TaskCounterReconciler, UnlimitedTaskCounter, StatisticRollupJob, task_catalog
 from rabbit import MessageConsumerRunner
 from singleton import GlobalContext
-from variables import bot
+from utils.callback_prefix_filters import install_callback_prefix_filters
+from variables import bot, dp
 from .log import logger
 
 
@@ -13,12 +17,69 @@ async def crate_consumer():
     gb.message_consumer_runner.run()
 
 
+async def create_cache_invalidation_listener():
+    logger.info("Starting cache invalidation listener...")
+    gb = GlobalContext()
+    gb.cache_invalidation_listener = InvalidationListener()
+    gb.cache_invalidation_listener.run()
+
+
+async def create_task_counter_reconciler():
+    logger.info("Starting task counter reconciler...")
+    gb = GlobalContext()
+    gb.task_counter_reconciler = TaskCounterReconciler(interval=float(os.getenv('TASK_COUNTERS_RECONCILE_INTERVAL', 3600)))
+    gb.task_counter_reconciler.run()
+    gb.unlimited_task_counter = UnlimitedTaskCounter(interval=float(os.getenv('UNLIMITED_TASK_COUNT_INTERVAL', 60)))
+    gb.unlimited_task_counter.run()
+
+
+async def create_statistic_rollup_job():
+    logger.info("Starting statistic rollup job...")
+    gb = GlobalContext()
+    gb.statistic_rollup_job = StatisticRollupJob(interval=float(os.getenv('STATISTIC_ROLLUP_INTERVAL', 300)))
+    gb.statistic_rollup_job.run()
+
+
+async def start_task_catalog():
+    logger.info("Starting task catalog expiry timers...")
+    task_catalog.run()
+
+
+async def warm_up_cache():
+    logger.info("Warming up cache...")
+    await warm_up(budget=float(os.getenv('CACHE_WARMUP_BUDGET', 5)))
+
+
+def prefilter_callback_handlers() -> None:
+    logger.info("Pre-filtering callback query handlers by prefix...")
+    install_callback_prefix_filters(dp)
+
+
 async def shutdown() -> None:
     logger.info("Shutting down message consumer runner...")
     gb = GlobalContext()
     if gb.message_consumer_runner:
         gb.message_consumer_runner.stop()
 
+    if getattr(gb, 'cache_invalidation_listener', None):
+        logger.info("Stopping cache invalidation listener...")
+        await gb.cache_invalidation_listener.stop()
+
+    if getattr(gb, 'task_counter_reconciler', None):
+        logger.info("Stopping task counter reconciler...")
+        await gb.task_counter_reconciler.stop()
+
+    if getattr(gb, 'unlimited_task_counter', None):
+        logger.info("Stopping unlimited task counter...")
+        await gb.unlimited_task_counter.stop()
+
+    if getattr(gb, 'statistic_rollup_job', None):
+        logger.info("Stopping statistic rollup job...")
+        await gb.statistic_rollup_job.stop()
+
+    logger.info("Stopping task catalog expiry timers...")
+    await task_catalog.stop()
+
     logger.info("Removing webhook and cleaning up...")
     await bot.delete_webhook(drop_pending_updates=True)
     logger.info("Shutdown complete.")
@@ -1,2 +1,6 @@
 from cache.cache_decorators import cacheable
 from cache.cache_decorators import drop_cache
+from cache.invalidation import InvalidationListener
+from cache.tags import invalidate_tag
+from cache.codecs import Codec, CodecError, BinaryCodec, JsonCodec, DillCodec
+from cache.warmers import warmup, warm_up
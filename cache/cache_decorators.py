@@ -1,12 +1,21 @@
-import json
 import logging
+import math
+import random
+import time
 from functools import wraps
-from typing import Callable, Any
+from typing import Callable, Any, Iterable, Sequence
 
-import dill
 import humanfriendly
 from redis import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from cache.circuit_breaker import redis_breaker, log_redis_error
+from cache.codecs import Codec, CodecError, default_codec
+from cache.invalidation import publish_invalidation
+from cache.local_cache import local_cache, MISSING
+from cache.metrics import CacheMetrics
+from cache.single_flight import single_flight, distributed_single_flight, refresh_in_background
+from cache.tags import tag_version_key, parse_versions, get_tag_versions, wrap_tags, unwrap_tags
 from variables import redis
 
 
@@ -34,72 +43,368 @@ def generate_cache_key(func: Callable, args: tuple, kwargs: dict, just_function_
     return f"{func.__name__}:{str(cache_id)}"
 
 
-def cacheable(ttl: str = None, associate_none_as: Any = None, function_name_as_id: bool = False, save_as_blob: bool = False, cache_result_ignore_val: Any = None):
+def _parse_ttl(ttl: str | None) -> int | None:
+    if ttl is None:
+        return None
+    return int(humanfriendly.parse_timespan(ttl))
+
+
+def _l1_seconds_ttl(l1_ttl: str | None, seconds_ttl: int | None) -> int | None:
+    """
+    The in-process tier never outlives the Redis entry it mirrors.
+    """
+    l1_seconds = _parse_ttl(l1_ttl)
+    if l1_seconds is None or seconds_ttl is None:
+        return l1_seconds
+    return min(l1_seconds, seconds_ttl)
+
+
+def _decode(cache_key: str, cached_result: bytes, codec: Codec, metrics: CacheMetrics) -> Any:
+    started = time.perf_counter()
+    try:
+        return codec.decode(cached_result)
+    except CodecError as e:
+        metrics.codec_failures.inc()
+        logging.warning(f"Ignoring cached value that can't be decoded for key: {cache_key}: {e}")
+        return MISSING
+    finally:
+        metrics.decode_seconds.observe(time.perf_counter() - started)
+
+
+_ENVELOPE_PREFIX = b"swr:"
+
+
+def _wrap_envelope(payload: bytes, fresh_until: float, delta: float) -> bytes:
+    """
+    Prepends the soft expiry and the recompute duration needed by stale-while-revalidate.
+    """
+    return _ENVELOPE_PREFIX + f"{fresh_until:.3f}:{delta:.3f}\n".encode('ascii') + payload
+
+
+def _unwrap_envelope(cached_result: bytes) -> tuple[float, float, bytes] | None:
+    if not cached_result.startswith(_ENVELOPE_PREFIX):
+        return None
+    header, sep, payload = cached_result[len(_ENVELOPE_PREFIX):].partition(b"\n")
+    if not sep:
+        return None
+    try:
+        fresh_until, delta = (float(v) for v in header.split(b":"))
+    except ValueError:
+        return None
+    return fresh_until, delta, payload
+
+
+def _should_refresh(fresh_until: float, delta: float, beta: float | None) -> bool:
+    """
+    Stale entries are always refreshed; fresh ones are refreshed early with
+    the XFetch probability, which grows as the soft expiry approaches.
+    """
+    now = time.time()
+    if now >= fresh_until:
+        return True
+    if beta is None:
+        return False
+    return now - delta * beta * math.log(1.0 - random.random()) >= fresh_until
+
+
+def _detached(kwargs: dict) -> dict:
+    """
+    Background refreshes outlive the caller, so they must not reuse the caller's session.
+    """
+    return {k: v for k, v in kwargs.items() if not isinstance(v, AsyncSession)}
+
+
+def _log_redis_error(message: str, e: RedisError) -> None:
+    log_redis_error(logging.getLogger(), message, e)
+
+
+async def _store(cache_key: str, payload: bytes, seconds_ttl: int | None, metrics: CacheMetrics) -> None:
+    started = time.perf_counter()
+    try:
+        if seconds_ttl is not None:
+            await redis_breaker.call(lambda: redis.setex(cache_key, seconds_ttl, payload))
+        else:
+            await redis_breaker.call(lambda: redis.set(cache_key, payload))
+    except RedisError as e:
+        metrics.redis_errors.inc()
+        _log_redis_error(f"Redis error while caching call of function: {cache_key}", e)
+    finally:
+        metrics.redis_seconds.observe(time.perf_counter() - started)
+
+
+def cacheable(ttl: str = None, function_name_as_id: bool = False, codec: Codec = None, cache_result_ignore_val: Any = None,
+              l1_ttl: str = None, lock_timeout: str = None, stale_ttl: str = None, refresh_ahead: float = None,
+              tags: Sequence[str] = ()):
+    """
+    Caches the awaited result of `func` in Redis, serialized with `codec`
+    (the versioned binary codec by default).
+
+    `l1_ttl` additionally keeps the decoded result in the in-process LRU.
+    Concurrent misses on the same key are always coalesced inside a process;
+    `lock_timeout` also coalesces them across workers with a short Redis lock.
+    With `stale_ttl` the value is served for that long after `ttl` while it is
+    recomputed in the background; `refresh_ahead` is the XFetch beta that starts
+    such refreshes before `ttl` runs out (1.0 is the usual choice).
+
+    `tags` are format strings filled with the cache id, e.g. `("user:{}",)`, or with the
+    ':'-separated parts of a composite one (`{0}`, `{1}`, ...);
+    `invalidate_tag("user:42")` then evicts every entry tagged with it. Entries
+    are stamped with the tag versions, which are read in the same MGET as the value.
+
+    Redis calls go through a circuit breaker with a per-call timeout. When Redis
+    fails (or the breaker is open) the function is called directly, still
+    coalesced per key, and its result is kept only in the in-process tier.
+
+    Hits, misses, Redis/codec timings and payload sizes are recorded in the
+    `metrics` registry under the function name.
+    """
+    codec = codec or default_codec
+    seconds_ttl = _parse_ttl(ttl)
+    l1_seconds_ttl = _l1_seconds_ttl(l1_ttl, seconds_ttl)
+    lock_ms = int(humanfriendly.parse_timespan(lock_timeout) * 1000) if lock_timeout is not None else None
+    stale_seconds = _parse_ttl(stale_ttl)
+    revalidate = stale_seconds is not None or refresh_ahead is not None
+    if revalidate and seconds_ttl is None:
+        raise ValueError("stale_ttl and refresh_ahead require ttl")
+    redis_ttl = seconds_ttl + (stale_seconds or 0) if revalidate else seconds_ttl
+
     def decorator(func: Callable):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
-            cache_key = generate_cache_key(func, args, kwargs, function_name_as_id)
-            if not kwargs.pop('force', False):
-                try:
-                    cached_result = await redis.get(cache_key)
-                    if cached_result:
-                        logging.info(f"cached call of function: {cache_key}")
-                        if save_as_blob:
-                            try:
-                                # Attempt to load as binary
-                                return dill.loads(cached_result)
-                            except dill.UnpicklingError:
-                                logging.error(f"Failed to decode cached blob for key: {cache_key}")
-                                return associate_none_as
-                        else:
-                            try:
-                                # Attempt to load as JSON
-                                return json.loads(cached_result)
-                            except json.JSONDecodeError:
-                                logging.warning(f"Failed to decode cached JSON for key: {cache_key}")
-                                return associate_none_as
-                except RedisError as e:
-                    logging.error(f"Redis error while fetching cache for key: {cache_key}: {e}")
-                    return associate_none_as
+        metrics = CacheMetrics(func.__name__)
 
+        def entry_tags(cache_key: str) -> list[str]:
+            cache_id = cache_key.partition(':')[2]
+            return [tag.format(*cache_id.split(':')) for tag in tags]
+
+        def unpack(cache_key: str, cached_result: bytes | None, args: tuple, kwargs: dict, versions: tuple[int, ...] = ()) -> Any:
+            if not cached_result:
+                return MISSING
+            if tags:
+                cached_result = unwrap_tags(cached_result, versions)
+                if cached_result is None:
+                    logging.debug(f"cached call of function invalidated by tag: {cache_key}")
+                    return MISSING
+            logging.debug(f"cached call of function: {cache_key}")
+            if revalidate:
+                envelope = _unwrap_envelope(cached_result)
+                if envelope is None:
+                    logging.warning(f"Cached value has no revalidation envelope, ignoring: {cache_key}")
+                    return MISSING
+                fresh_until, delta, cached_result = envelope
+                if _should_refresh(fresh_until, delta, refresh_ahead):
+                    logging.info(f"refreshing cached call of function in background: {cache_key}")
+                    detached_kwargs = _detached(kwargs)
+                    refresh_in_background(cache_key, lambda: fill(cache_key, args, detached_kwargs))
+            result = _decode(cache_key, cached_result, codec, metrics)
+            if result is not MISSING and l1_seconds_ttl is not None:
+                local_cache.set(cache_key, result, l1_seconds_ttl, entry_tags(cache_key))
+            return result
+
+        async def load(cache_key: str, args: tuple, kwargs: dict) -> Any:
+            started = time.perf_counter()
+            try:
+                if tags:
+                    cached_result, *raw_versions = await redis_breaker.call(
+                        lambda: redis.mget([cache_key, *map(tag_version_key, entry_tags(cache_key))]))
+                    versions = parse_versions(raw_versions)
+                else:
+                    cached_result, versions = await redis_breaker.call(lambda: redis.get(cache_key)), ()
+            finally:
+                metrics.redis_seconds.observe(time.perf_counter() - started)
+            return unpack(cache_key, cached_result, args, kwargs, versions)
+
+        def pack(cache_key: str, result: Any, delta: float, versions: tuple[int, ...]) -> bytes | None:
+            """
+            The Redis entry of `result`, None if the codec can't encode it: the result is then only returned, not cached.
+            """
+            started = time.perf_counter()
             try:
-                result = await func(*args, **kwargs)
+                payload = codec.encode(result)
+            except Exception as e:
+                metrics.codec_failures.inc()
+                logging.warning(f"Not caching a value that can't be encoded for key: {cache_key}: {e}")
+                return None
+            metrics.encode_seconds.observe(time.perf_counter() - started)
+            metrics.payload_bytes.observe(len(payload))
+            if revalidate:
+                payload = _wrap_envelope(payload, time.time() + seconds_ttl, delta)
+            if tags:
+                payload = wrap_tags(payload, versions)
+            return payload
+
+        async def compute(cache_key: str, args: tuple, kwargs: dict, use_redis: bool = True) -> Any:
+            try:
+                # without the tag versions the entry could outlive an invalidation, so it is kept in-process only
+                versions = None
+                if use_redis:
+                    # read before computing, so an invalidation racing with the computation wins
+                    try:
+                        versions = await redis_breaker.call(lambda: get_tag_versions(entry_tags(cache_key))) if tags else ()
+                    except RedisError as e:
+                        metrics.redis_errors.inc()
+                        _log_redis_error(f"Redis error while reading cache tags of key: {cache_key}", e)
+                started = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception:
+                    metrics.compute_errors.inc()
+                    raise
+                delta = time.perf_counter() - started
+                metrics.compute_seconds.observe(delta)
                 if cache_result_ignore_val == result:
                     logging.info(f"caching call of function - ignored: {cache_key}")
                     return result
                 logging.info(f"caching call of function: {cache_key}")
 
-                if save_as_blob:
-                    # Save result as a binary blob
-                    blob_obj = dill.dumps(result)
-                    if ttl is not None:
-                        seconds_ttl = humanfriendly.parse_timespan(ttl)
-                        await redis.setex(cache_key, int(seconds_ttl), blob_obj)
-                    else:
-                        await redis.set(cache_key, blob_obj)
-                else:
-                    # Save result as JSON
-                    try:
-                        json_obj = json.dumps(result)
-                        if ttl is not None:
-                            seconds_ttl = humanfriendly.parse_timespan(ttl)
-                            await redis.setex(cache_key, int(seconds_ttl), json_obj)
-                        else:
-                            await redis.set(cache_key, json_obj)
-                    except (TypeError, OverflowError):
-                        # Fallback to saving as binary if JSON serialization fails
-                        blob_obj = dill.dumps(result)
-                        if ttl is not None:
-                            seconds_ttl = humanfriendly.parse_timespan(ttl)
-                            await redis.setex(cache_key, int(seconds_ttl), blob_obj)
-                        else:
-                            await redis.set(cache_key, blob_obj)
+                if versions is not None and not redis_breaker.is_open:
+                    payload = pack(cache_key, result, delta, versions)
+                    if payload is not None:
+                        await _store(cache_key, payload, redis_ttl, metrics)
+                if l1_seconds_ttl is not None:
+                    local_cache.set(cache_key, result, l1_seconds_ttl, entry_tags(cache_key))
 
                 return result
             except Exception as e:
                 logging.error(f"Error during function execution: {e}")
                 raise e
 
+        async def fill(cache_key: str, args: tuple, kwargs: dict) -> Any:
+            if lock_ms is None or redis_breaker.is_open:
+                return await compute(cache_key, args, kwargs)
+            return await distributed_single_flight(cache_key, lock_ms,
+                                                   compute=lambda: compute(cache_key, args, kwargs),
+                                                   load=lambda: load(cache_key, args, kwargs))
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_key = generate_cache_key(func, args, kwargs, function_name_as_id)
+            if kwargs.pop('force', False):
+                return await compute(cache_key, args, kwargs)
+
+            if l1_seconds_ttl is not None:
+                local_result = local_cache.get(cache_key)
+                if local_result is not MISSING:
+                    metrics.l1_hits.inc()
+                    return local_result
+
+            try:
+                cached_result = await load(cache_key, args, kwargs)
+                if cached_result is not MISSING:
+                    metrics.hits.inc()
+                    return cached_result
+            except RedisError as e:
+                metrics.redis_errors.inc()
+                metrics.bypasses.inc()
+                _log_redis_error(f"Redis error while fetching cache for key: {cache_key}", e)
+                return await single_flight(cache_key, lambda: compute(cache_key, args, kwargs, use_redis=False))
+
+            metrics.misses.inc()
+            return await single_flight(cache_key, lambda: fill(cache_key, args, kwargs))
+
+        many_loader_func: Callable | None = None
+
+        def many_loader(loader: Callable) -> Callable:
+            """
+            Registers `loader(ids, **kwargs) -> {id: result}` that computes many misses with one query.
+            """
+            nonlocal many_loader_func
+            many_loader_func = loader
+            return loader
+
+        async def many(ids: Iterable[Any], **kwargs) -> dict[Any, Any]:
+            """
+            Batch form of the cached call keyed by the first argument: one MGET for all keys,
+            one loader call for the misses and one pipeline to write them back.
+            """
+            if function_name_as_id:
+                raise TypeError(f"{func.__name__} is not keyed by an argument")
+            if many_loader_func is None:
+                raise TypeError(f"{func.__name__} has no many_loader registered")
+
+            keys = {id_: f"{func.__name__}:{id_}" for id_ in ids}
+            results = {}
+
+            pending = []
+            for id_, cache_key in keys.items():
+                local_result = local_cache.get(cache_key) if l1_seconds_ttl is not None else MISSING
+                if local_result is MISSING:
+                    pending.append(id_)
+                else:
+                    results[id_] = local_result
+            metrics.l1_hits.inc(len(results))
+
+            misses = []
+            versions = {}
+            if pending:
+                # every key is followed by the version keys of its tags
+                stride = 1 + len(tags)
+                started = time.perf_counter()
+                try:
+                    cached_results = await redis_breaker.call(
+                        lambda: redis.mget([k for id_ in pending for k in (keys[id_], *map(tag_version_key, entry_tags(keys[id_])))]))
+                except RedisError as e:
+                    metrics.redis_errors.inc()
+                    _log_redis_error(f"Redis error while fetching {len(pending)} cached calls of function: {func.__name__}", e)
+                    cached_results = None
+                metrics.redis_seconds.observe(time.perf_counter() - started)
+                if cached_results is None:
+                    metrics.bypasses.inc(len(pending))
+                    cached_results = [None] * (len(pending) * stride)
+                    versions = None
+                for i, id_ in enumerate(pending):
+                    cached_result = cached_results[i * stride]
+                    if versions is not None:
+                        versions[id_] = parse_versions(cached_results[i * stride + 1:(i + 1) * stride])
+                    result = unpack(keys[id_], cached_result, (id_,), {}, versions[id_] if versions is not None else ())
+                    if result is MISSING:
+                        misses.append(id_)
+                    else:
+                        results[id_] = result
+                metrics.hits.inc(len(pending) - len(misses))
+
+            if not misses:
+                return results
+
+            metrics.misses.inc(len(misses))
+            started = time.perf_counter()
+            try:
+                loaded = await many_loader_func(misses, **kwargs)
+            except Exception:
+                metrics.compute_errors.inc()
+                raise
+            delta = time.perf_counter() - started
+            metrics.compute_seconds.observe(delta)
+            logging.info(f"caching {len(misses)} calls of function: {func.__name__}")
+            for id_ in misses:
+                results[id_] = loaded.get(id_)
+
+            stored = [id_ for id_ in misses if cache_result_ignore_val != results[id_]]
+            if l1_seconds_ttl is not None:
+                for id_ in stored:
+                    local_cache.set(keys[id_], results[id_], l1_seconds_ttl, entry_tags(keys[id_]))
+            if versions is None or redis_breaker.is_open:
+                return results
+
+            started = time.perf_counter()
+            try:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for id_ in stored:
+                        payload = pack(keys[id_], results[id_], delta, versions[id_])
+                        if payload is None:
+                            continue
+                        if redis_ttl is not None:
+                            pipe.setex(keys[id_], redis_ttl, payload)
+                        else:
+                            pipe.set(keys[id_], payload)
+                    await redis_breaker.call(pipe.execute)
+            except RedisError as e:
+                metrics.redis_errors.inc()
+                _log_redis_error(f"Redis error while caching {len(misses)} calls of function: {func.__name__}", e)
+            metrics.redis_seconds.observe(time.perf_counter() - started)
+
+            return results
+
+        wrapper.many = many
+        wrapper.many_loader = many_loader
         return wrapper
 
     return decorator
@@ -108,4 +413,6 @@ def cacheable(ttl: str = None, associate_none_as: Any = None, function_name_as_i
 async def drop_cache(func: Callable, *args, **kwargs):
     key = generate_cache_key(func, args, kwargs)
     logging.info(f"delete cached call of function: {key}")
+    local_cache.delete(key)
     await redis.delete(key)
+    await publish_invalidation(key)
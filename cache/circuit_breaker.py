@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Awaitable, Any
+
+from redis import RedisError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+breaker_open = registry.gauge("cache_redis_breaker_open", "1 while the cache skips Redis after repeated failures.")
+breaker_trips = registry.counter("cache_redis_breaker_trips_total", "Times the cache Redis circuit breaker opened.")
+
+
+class CircuitOpenError(RedisError):
+    pass
+
+
+def log_redis_error(log: logging.Logger, message: str, e: RedisError) -> None:
+    # while the breaker is open every call fails the same way, it was logged when it opened
+    if isinstance(e, CircuitOpenError):
+        log.debug(f"{message}: {e}")
+    else:
+        log.error(f"{message}: {e}")
+
+
+class CircuitBreaker:
+    """
+    Fails Redis calls fast after `failure_threshold` consecutive errors or timeouts.
+
+    While open every call raises `CircuitOpenError` without touching Redis; after
+    `reset_timeout` seconds a single probe call is let through, and its outcome
+    closes the breaker again or keeps it open for another `reset_timeout`.
+    Errors are raised as `RedisError`s, so callers handle them as any other Redis failure.
+    """
+
+    def __init__(self, call_timeout: float, failure_threshold: int, reset_timeout: float):
+        self._call_timeout = call_timeout
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self._gauge = breaker_open.labels()
+        self._trips = breaker_trips.labels()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def _allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if self._probing or time.monotonic() - self._opened_at < self._reset_timeout:
+            return False
+        self._probing = True
+        return True
+
+    def _on_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("Redis is reachable again, closing cache circuit breaker")
+            self._gauge.set(0)
+        self._failures = 0
+        self._opened_at = None
+
+    def _on_failure(self, e: Exception) -> None:
+        self._failures += 1
+        if self._opened_at is not None:
+            # failed probe, wait another reset_timeout
+            self._opened_at = time.monotonic()
+        elif self._failures >= self._failure_threshold:
+            logger.error(f"Opening cache circuit breaker after {self._failures} Redis failures, last: {e}")
+            self._opened_at = time.monotonic()
+            self._gauge.set(1)
+            self._trips.inc()
+
+    async def call(self, operation: Callable[[], Awaitable[Any]]) -> Any:
+        if not self._allow():
+            raise CircuitOpenError("cache circuit breaker is open")
+        try:
+            result = await asyncio.wait_for(operation(), self._call_timeout)
+        except asyncio.TimeoutError:
+            e = RedisTimeoutError(f"Redis call timed out after {self._call_timeout}s")
+            self._on_failure(e)
+            raise e
+        except RedisError as e:
+            self._on_failure(e)
+            raise
+        finally:
+            self._probing = False
+        self._on_success()
+        return result
+
+
+redis_breaker = CircuitBreaker(call_timeout=float(os.getenv('CACHE_REDIS_TIMEOUT', 0.25)),
+                               failure_threshold=int(os.getenv('CACHE_BREAKER_THRESHOLD', 5)),
+                               reset_timeout=float(os.getenv('CACHE_BREAKER_RESET', 10)))
@@ -0,0 +1,151 @@
+import importlib
+import io
+import json
+import pickle
+import zlib
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any
+
+import dill
+from pydantic import BaseModel
+from sqlalchemy import Row
+from sqlalchemy import inspect as sa_inspect
+
+
+class CodecError(Exception):
+    pass
+
+
+class Codec(ABC):
+    @abstractmethod
+    def encode(self, value: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, payload: bytes) -> Any:
+        """
+        :raises CodecError: if the payload was not produced by this codec (or by another version of it)
+        """
+        pass
+
+
+class JsonCodec(Codec):
+    """Plain JSON, the format non-blob entries used before the binary codec."""
+
+    def encode(self, value: Any) -> bytes:
+        try:
+            return json.dumps(value).encode('utf-8')
+        except (TypeError, OverflowError) as e:
+            raise CodecError(f"value is not JSON serializable: {e}")
+
+    def decode(self, payload: bytes) -> Any:
+        try:
+            return json.loads(payload)
+        except json.JSONDecodeError as e:
+            raise CodecError(f"invalid JSON payload: {e}")
+
+
+class DillCodec(Codec):
+    """Whole-object dill pickles, the format `save_as_blob` entries used before the binary codec."""
+
+    def encode(self, value: Any) -> bytes:
+        return dill.dumps(value)
+
+    def decode(self, payload: bytes) -> Any:
+        try:
+            return dill.loads(payload)
+        except Exception as e:
+            raise CodecError(f"invalid dill payload: {e}")
+
+
+@lru_cache(maxsize=None)
+def _resolve(module: str, qualname: str) -> Any:
+    obj = importlib.import_module(module)
+    for part in qualname.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def _rebuild_model(module: str, qualname: str, fields: dict) -> BaseModel:
+    return _resolve(module, qualname).model_validate(fields)
+
+
+@lru_cache(maxsize=None)
+def _entity_columns(cls: type) -> frozenset[str]:
+    return frozenset(attr.key for attr in sa_inspect(cls).column_attrs)
+
+
+def _rebuild_entity(module: str, qualname: str, fields: dict) -> Any:
+    cls = _resolve(module, qualname)
+    columns = _entity_columns(cls)
+    # columns dropped from the model since the value was cached are ignored
+    return cls(**{k: v for k, v in fields.items() if k in columns})
+
+
+class _Pickler(pickle.Pickler):
+    """
+    Stores rows as plain tuples and pydantic/ORM objects as their field values,
+    so cached entries do not depend on the internal layout of those classes.
+    """
+
+    def reducer_override(self, obj):
+        if isinstance(obj, type):
+            return NotImplemented
+        if isinstance(obj, Row):
+            return tuple, (tuple(obj),)
+        if isinstance(obj, BaseModel):
+            cls = type(obj)
+            return _rebuild_model, (cls.__module__, cls.__qualname__, obj.model_dump())
+        state = getattr(obj, '_sa_instance_state', None)
+        if state is not None:
+            cls = type(obj)
+            columns = _entity_columns(cls)
+            # only already loaded values, reading the rest would trigger a lazy load
+            fields = {k: v for k, v in state.dict.items() if k in columns}
+            return _rebuild_entity, (cls.__module__, cls.__qualname__, fields)
+        return NotImplemented
+
+
+class BinaryCodec(Codec):
+    """
+    Compact binary codec: `[version][flags][pickle payload]`.
+
+    Entries written by another version (or by the legacy JSON/dill paths) are
+    rejected instead of being mis-decoded. Payloads above `compress_threshold`
+    bytes are zlib compressed.
+    """
+    VERSION = 0xB1
+    FLAG_COMPRESSED = 0x01
+    PICKLE_PROTOCOL = 5
+
+    def __init__(self, compress_threshold: int | None = 1024, compress_level: int = 1):
+        self._compress_threshold = compress_threshold
+        self._compress_level = compress_level
+
+    def encode(self, value: Any) -> bytes:
+        buffer = io.BytesIO()
+        _Pickler(buffer, protocol=self.PICKLE_PROTOCOL).dump(value)
+        payload = buffer.getvalue()
+
+        flags = 0
+        if self._compress_threshold is not None and len(payload) > self._compress_threshold:
+            payload = zlib.compress(payload, self._compress_level)
+            flags |= self.FLAG_COMPRESSED
+
+        return bytes((self.VERSION, flags)) + payload
+
+    def decode(self, payload: bytes) -> Any:
+        if len(payload) < 2 or payload[0] != self.VERSION:
+            raise CodecError("unknown codec version")
+
+        body = payload[2:]
+        try:
+            if payload[1] & self.FLAG_COMPRESSED:
+                body = zlib.decompress(body)
+            return pickle.loads(body)
+        except Exception as e:
+            raise CodecError(f"invalid binary payload: {e}")
+
+
+default_codec = BinaryCodec()
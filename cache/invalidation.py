@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+from redis import RedisError
+
+from cache.local_cache import local_cache
+from variables import redis
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+TAG_INVALIDATION_CHANNEL = "cache:invalidate-tag"
+
+
+async def publish_invalidation(key: str) -> None:
+    try:
+        await redis.publish(INVALIDATION_CHANNEL, key)
+    except RedisError as e:
+        logger.error(f"Failed to publish cache invalidation for key: {key}: {e}")
+
+
+async def publish_tag_invalidation(tag: str) -> None:
+    try:
+        await redis.publish(TAG_INVALIDATION_CHANNEL, tag)
+    except RedisError as e:
+        logger.error(f"Failed to publish cache invalidation for tag: {tag}: {e}")
+
+
+class InvalidationListener:
+    """
+    Evicts keys (or whole tags) from the in-process cache when any worker publishes an invalidation.
+    """
+
+    def __init__(self, reconnect_delay: float = 1.0):
+        self._reconnect_delay = reconnect_delay
+        self._task: asyncio.Task | None = None
+
+    def run(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL, TAG_INVALIDATION_CHANNEL)
+                # invalidations published while we were not subscribed are lost
+                local_cache.clear()
+                logger.info(f"Subscribed to cache invalidation channels: {INVALIDATION_CHANNEL}, {TAG_INVALIDATION_CHANNEL}")
+                async for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    channel, data = (v.decode('utf-8') if isinstance(v, bytes) else v for v in (message['channel'], message['data']))
+                    if channel == TAG_INVALIDATION_CHANNEL:
+                        local_cache.delete_tag(data)
+                    else:
+                        local_cache.delete(data)
+            except RedisError as e:
+                logger.error(f"Cache invalidation listener failed: {e}")
+                await asyncio.sleep(self._reconnect_delay)
+            finally:
+                await pubsub.aclose()
@@ -0,0 +1,78 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Iterable
+
+MISSING = object()
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU cache with a per-entry TTL.
+    Used as the L1 tier in front of Redis by `cacheable(l1_ttl=...)`.
+    Entries can carry tags, so that `delete_tag` evicts all of them at once.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._entries: OrderedDict[str, tuple[float, Any, tuple[str, ...]]] = OrderedDict()
+        self._tagged: dict[str, set[str]] = {}
+
+    def _untag(self, key: str, tags: tuple[str, ...]) -> None:
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._tagged[tag]
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._untag(key, entry[2])
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._pop(key)
+            return MISSING
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float, tags: Iterable[str] = ()) -> None:
+        if ttl <= 0 or self._max_size <= 0:
+            return
+
+        self._pop(key)
+        tags = tuple(tags)
+        self._entries[key] = (time.monotonic() + ttl, value, tags)
+        for tag in tags:
+            self._tagged.setdefault(tag, set()).add(key)
+        while len(self._entries) > self._max_size:
+            evicted, (_, _, evicted_tags) = self._entries.popitem(last=False)
+            self._untag(evicted, evicted_tags)
+
+    def delete(self, key: str) -> None:
+        self._pop(key)
+
+    def delete_tag(self, tag: str) -> None:
+        for key in self._tagged.pop(tag, ()):
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._untag(key, entry[2])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tagged.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+local_cache = LocalCache(max_size=int(os.getenv('CACHE_L1_MAX_SIZE', 10000)))
@@ -0,0 +1,29 @@
+from metrics import registry, SIZE_BUCKETS
+
+cache_requests = registry.counter("cache_requests_total", "Cached calls by outcome (l1_hit, hit, miss, bypass).", ("function", "result"))
+cache_errors = registry.counter("cache_errors_total", "Redis or wrapped function failures of cached calls.", ("function", "kind"))
+cache_codec_failures = registry.counter("cache_codec_failures_total", "Cached payloads that could not be encoded or decoded.", ("function",))
+cache_redis_seconds = registry.histogram("cache_redis_seconds", "Time spent in Redis by cached calls.", ("function",))
+cache_compute_seconds = registry.histogram("cache_compute_seconds", "Time spent computing missed cached calls.", ("function",))
+cache_codec_seconds = registry.histogram("cache_codec_seconds", "Time spent encoding/decoding cached payloads.", ("function", "op"))
+cache_payload_bytes = registry.histogram("cache_payload_bytes", "Size of the payloads written to Redis.", ("function",), buckets=SIZE_BUCKETS)
+
+
+class CacheMetrics:
+    """
+    Label children of one `@cacheable` function, resolved once at decoration time.
+    """
+
+    def __init__(self, function: str):
+        self.l1_hits = cache_requests.labels(function, "l1_hit")
+        self.hits = cache_requests.labels(function, "hit")
+        self.misses = cache_requests.labels(function, "miss")
+        self.bypasses = cache_requests.labels(function, "bypass")
+        self.redis_errors = cache_errors.labels(function, "redis")
+        self.compute_errors = cache_errors.labels(function, "compute")
+        self.codec_failures = cache_codec_failures.labels(function)
+        self.redis_seconds = cache_redis_seconds.labels(function)
+        self.compute_seconds = cache_compute_seconds.labels(function)
+        self.encode_seconds = cache_codec_seconds.labels(function, "encode")
+        self.decode_seconds = cache_codec_seconds.labels(function, "decode")
+        self.payload_bytes = cache_payload_bytes.labels(function)
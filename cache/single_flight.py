@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Callable, Awaitable, Any
+
+from redis import RedisError
+
+from cache.circuit_breaker import redis_breaker
+from cache.local_cache import MISSING
+from variables import redis
+
+logger = logging.getLogger(__name__)
+
+_in_flight: dict[str, asyncio.Future] = {}
+_background_refreshes: set[asyncio.Task] = set()
+
+_release_lock_script = redis.register_script("""
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+""")
+
+
+def _lock_key(cache_key: str) -> str:
+    return f"lock:{cache_key}"
+
+
+async def single_flight(cache_key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Runs `compute` once per key inside this process; concurrent callers share its result.
+    """
+    future = _in_flight.get(cache_key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[cache_key] = future
+    try:
+        result = await compute()
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # mark as retrieved, the exception is re-raised to the leader below
+        future.exception()
+        raise
+    finally:
+        del _in_flight[cache_key]
+
+
+async def distributed_single_flight(cache_key: str,
+                                    lock_ms: int,
+                                    compute: Callable[[], Awaitable[Any]],
+                                    load: Callable[[], Awaitable[Any]],
+                                    poll_interval: float = 0.05) -> Any:
+    """
+    Coalesces cache fills across workers: the lock holder computes and stores the value,
+    the rest poll the cache until it is filled or the lock is gone, then compute themselves.
+    """
+    lock_key = _lock_key(cache_key)
+    token = uuid.uuid4().hex
+    try:
+        acquired = await redis_breaker.call(lambda: redis.set(lock_key, token, nx=True, px=lock_ms))
+    except RedisError as e:
+        logger.error(f"Redis error while acquiring fill lock for key: {cache_key}: {e}")
+        return await compute()
+
+    if acquired:
+        try:
+            return await compute()
+        finally:
+            try:
+                await redis_breaker.call(lambda: _release_lock_script(keys=[lock_key], args=[token]))
+            except RedisError as e:
+                logger.error(f"Redis error while releasing fill lock for key: {cache_key}: {e}")
+
+    deadline = time.monotonic() + lock_ms / 1000
+    try:
+        while time.monotonic() < deadline:
+            await asyncio.sleep(poll_interval)
+            result = await load()
+            if result is not MISSING:
+                return result
+            if not await redis_breaker.call(lambda: redis.exists(lock_key)):
+                # the holder may have stored the value right before releasing
+                result = await load()
+                if result is not MISSING:
+                    return result
+                break
+    except RedisError as e:
+        logger.error(f"Redis error while waiting for cache fill of key: {cache_key}: {e}")
+
+    logger.warning(f"Cache fill was not observed, computing directly: {cache_key}")
+    return await compute()
+
+
+def is_in_flight(cache_key: str) -> bool:
+    return cache_key in _in_flight
+
+
+def refresh_in_background(cache_key: str, compute: Callable[[], Awaitable[Any]]) -> None:
+    """
+    Schedules a single-flight refresh of `cache_key` unless one is already running in this process.
+    """
+    if is_in_flight(cache_key):
+        return
+
+    async def refresh() -> None:
+        try:
+            await single_flight(cache_key, compute)
+        except Exception as e:
+            logger.error(f"Background refresh failed for key: {cache_key}: {e}")
+
+    task = asyncio.create_task(refresh())
+    _background_refreshes.add(task)
+    task.add_done_callback(_background_refreshes.discard)
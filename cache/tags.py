@@ -0,0 +1,70 @@
+import logging
+
+from redis import RedisError
+
+from cache.invalidation import publish_tag_invalidation
+from cache.local_cache import local_cache
+from variables import redis
+
+logger = logging.getLogger(__name__)
+
+_TAG_PREFIX = b"tags:"
+
+
+def tag_version_key(tag: str) -> str:
+    # no ttl: if a version key expired, entries stamped before it was bumped would become valid again
+    return f"tag:{tag}"
+
+
+def parse_versions(raw_versions: list[bytes | None]) -> tuple[int, ...]:
+    return tuple(int(v) if v else 0 for v in raw_versions)
+
+
+async def get_tag_versions(tags: list[str]) -> tuple[int, ...]:
+    if not tags:
+        return ()
+    return parse_versions(await redis.mget([tag_version_key(tag) for tag in tags]))
+
+
+def wrap_tags(payload: bytes, versions: tuple[int, ...]) -> bytes:
+    """
+    Stamps the payload with the versions its tags had before the value was computed.
+    """
+    return _TAG_PREFIX + ",".join(map(str, versions)).encode('ascii') + b"\n" + payload
+
+
+def unwrap_tags(cached_result: bytes, versions: tuple[int, ...]) -> bytes | None:
+    """
+    Returns the payload if it was stamped with exactly `versions`, None if any of its tags was invalidated since.
+    """
+    if not cached_result.startswith(_TAG_PREFIX):
+        return None
+    header, sep, payload = cached_result[len(_TAG_PREFIX):].partition(b"\n")
+    if not sep:
+        return None
+    try:
+        stamped = tuple(int(v) for v in header.split(b",")) if header else ()
+    except ValueError:
+        return None
+    return payload if stamped == versions else None
+
+
+async def invalidate_tag(*tags: str) -> None:
+    """
+    Logically evicts every entry cached with any of `tags` by bumping the tag versions, O(1) per tag.
+    """
+    if not tags:
+        return
+    logger.info(f"invalidate cache tags: {', '.join(tags)}")
+    for tag in tags:
+        local_cache.delete_tag(tag)
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(tag_version_key(tag))
+            await pipe.execute()
+    except RedisError as e:
+        logger.error(f"Failed to invalidate cache tags: {', '.join(tags)}: {e}")
+        return
+    for tag in tags:
+        await publish_tag_invalidation(tag)
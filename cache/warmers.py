@@ -0,0 +1,51 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Awaitable, Any
+
+logger = logging.getLogger(__name__)
+
+_warmups: dict[str, Callable[[], Awaitable[Any]]] = {}
+
+
+def warmup(func: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+    """
+    Declares a coroutine function without arguments that preloads some cached calls on startup.
+    """
+    _warmups[f"{func.__module__}.{func.__name__}"] = func
+    return func
+
+
+async def warm_up(budget: float) -> None:
+    """
+    Runs every declared warm-up in parallel. Whatever is not done within `budget`
+    seconds is cancelled, startup never waits longer than that.
+    """
+    if not _warmups:
+        return
+
+    started = time.perf_counter()
+    durations: dict[str, float] = {}
+
+    async def run(name: str, func: Callable[[], Awaitable[Any]]) -> None:
+        await func()
+        durations[name] = time.perf_counter() - started
+
+    tasks = {asyncio.create_task(run(name, func)): name for name, func in _warmups.items()}
+    done, pending = await asyncio.wait(tasks, timeout=budget)
+
+    for task in pending:
+        task.cancel()
+        logger.warning(f"Cache warm-up of {tasks[task]} did not finish within {budget}s, cancelled")
+    if pending:
+        await asyncio.wait(pending)
+
+    for task in done:
+        name = tasks[task]
+        if task.exception() is not None:
+            logger.error(f"Cache warm-up of {name} failed: {task.exception()}")
+        else:
+            logger.info(f"Cache warm-up of {name} done in {durations[name] * 1000:.0f}ms")
+
+    logger.info(f"Cache warm-up finished in {(time.perf_counter() - started) * 1000:.0f}ms: "
+                f"{len(done) - sum(task.exception() is not None for task in done)}/{len(tasks)} warmed")
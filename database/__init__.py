@@ -1,6 +1,16 @@
 from database.conf import *
+from database.active_users import ActiveUsers, track_active_user, count_active_users, OTHER_CALLBACK_PREFIX
+from database.done_tasks import get_done_task_ids, mark_task_done
 from database.entities import *
 from database.json_classes import *
+from database.instrumentation import query_function, query_unit
 from database.loader import init_db
 from database.repository import *
+from database.pools import PoolClass, pool_scope
 from database.session_privider import get_session
+from database.session_scope import session_scope, session_scope_dependency, release_scoped_connection
+from database.statistic_rollup import roll_up_statistics, StatisticRollupJob
+from database.task_catalog import ActiveTask, task_catalog
+from database.task_counters import reconcile_task_counters, TaskCounterReconciler, UnlimitedTaskCounter
+from database.task_slots import TaskSlot
+from database.user_context import UserContext, get_user_context
@@ -0,0 +1,81 @@
+import logging
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+from redis import RedisError
+
+from cache.circuit_breaker import redis_breaker, log_redis_error
+from variables import redis
+from .entities import now
+
+logger = logging.getLogger(__name__)
+
+# the day keys cover the longest window counted (30 days), the hour keys the current and the previous day
+DAY_KEY_TTL = 32 * 24 * 3600
+HOUR_KEY_TTL = 48 * 3600
+
+# counts the callbacks without a registered prefix, which clients could otherwise turn into any number of keys
+OTHER_CALLBACK_PREFIX = "other"
+
+
+class ActiveUsers(NamedTuple):
+    hour: int
+    day: int
+    week: int
+    month: int
+
+
+def active_users_day_key(day: date, callback_query_prefix: str | None = None) -> str:
+    key = f"active_users:{day.isoformat()}"
+    return key if callback_query_prefix is None else f"{key}:{callback_query_prefix}"
+
+
+def active_users_hour_key(at: datetime, callback_query_prefix: str | None = None) -> str:
+    key = f"active_users:{at:%Y-%m-%dT%H}"
+    return key if callback_query_prefix is None else f"{key}:{callback_query_prefix}"
+
+
+async def track_active_user(tg_user_id: int, callback_query_prefix: str | None = None) -> None:
+    """
+    Adds the user to the HyperLogLogs of the current UTC day and hour, overall and of `callback_query_prefix`,
+    which must be a registered one or `OTHER_CALLBACK_PREFIX`.
+    A HyperLogLog takes at most 12 KB however many users it counts, with a standard error of 0.81%.
+    """
+    at = now()
+    keys = {active_users_day_key(at.date()): DAY_KEY_TTL, active_users_hour_key(at): HOUR_KEY_TTL}
+    if callback_query_prefix:
+        keys[active_users_day_key(at.date(), callback_query_prefix)] = DAY_KEY_TTL
+        keys[active_users_hour_key(at, callback_query_prefix)] = HOUR_KEY_TTL
+
+    async def operation():
+        async with redis.pipeline(transaction=True) as pipe:
+            for key, ttl in keys.items():
+                pipe.pfadd(key, tg_user_id)
+                pipe.expire(key, ttl)
+            return await pipe.execute()
+
+    try:
+        await redis_breaker.call(operation)
+    except RedisError as e:
+        log_redis_error(logger, f"Redis error while tracking active user {tg_user_id}", e)
+
+
+async def count_active_users(callback_query_prefix: str | None = None) -> ActiveUsers:
+    """
+    Distinct users active in the current UTC hour, today, and the last 7 and 30 days including today,
+    overall or with `callback_query_prefix`. One round trip: PFCOUNT merges the day keys of a window itself.
+
+    :raises RedisError: if Redis is unavailable
+    """
+    at = now()
+    days = [active_users_day_key(at.date() - timedelta(days=i), callback_query_prefix) for i in range(30)]
+
+    async def operation():
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.pfcount(active_users_hour_key(at, callback_query_prefix))
+            pipe.pfcount(days[0])
+            pipe.pfcount(*days[:7])
+            pipe.pfcount(*days)
+            return await pipe.execute()
+
+    return ActiveUsers(*await redis_breaker.call(operation))
@@ -1,21 +1,61 @@
 import os
 
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.ext.declarative import declarative_base
 
+from database.pools import PoolClass, instrumented_pool, current_pool_class
+
 load_dotenv()
 
-engine = create_async_engine(os.getenv('DATABASE_URL'),
-                             pool_size=int(os.getenv('DB_ENGINE_POOL_SIZE')),
-                             max_overflow=int(os.getenv('DB_ENGINE_MAX_OVERFLOW')),
-                             pool_pre_ping=True,
-                             pool_recycle=1800,
-                             echo=bool(int(os.getenv('DB_ENGINE_ECHO'))))
-AsyncSessionFactory = async_sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+
+def _create_engine(url: str, pool_name: str, pool_size: int, max_overflow: int, **kwargs) -> AsyncEngine:
+    return create_async_engine(url,
+                               poolclass=instrumented_pool(pool_name),
+                               pool_size=pool_size,
+                               max_overflow=max_overflow,
+                               pool_pre_ping=True,
+                               pool_recycle=1800,
+                               echo=bool(int(os.getenv('DB_ENGINE_ECHO'))),
+                               **kwargs)
+
+
+# one pool per workload, so a mass mailing or a heavy report can't exhaust the connections of live users
+engines: dict[PoolClass, AsyncEngine] = {
+    PoolClass.INTERACTIVE: _create_engine(os.getenv('DATABASE_URL'), PoolClass.INTERACTIVE.value,
+                                          pool_size=int(os.getenv('DB_ENGINE_POOL_SIZE')),
+                                          max_overflow=int(os.getenv('DB_ENGINE_MAX_OVERFLOW'))),
+    PoolClass.BACKGROUND: _create_engine(os.getenv('DATABASE_URL'), PoolClass.BACKGROUND.value,
+                                         pool_size=int(os.getenv('DB_BACKGROUND_ENGINE_POOL_SIZE', 5)),
+                                         max_overflow=int(os.getenv('DB_BACKGROUND_ENGINE_MAX_OVERFLOW', 5))),
+    PoolClass.ANALYTICS: _create_engine(os.getenv('DATABASE_URL'), PoolClass.ANALYTICS.value,
+                                        pool_size=int(os.getenv('DB_ANALYTICS_ENGINE_POOL_SIZE', 3)),
+                                        max_overflow=int(os.getenv('DB_ANALYTICS_ENGINE_MAX_OVERFLOW', 2))),
+}
+engine = engines[PoolClass.INTERACTIVE]
+_session_factories = {pool_class: async_sessionmaker(bind=e, autocommit=False, autoflush=False, expire_on_commit=False)
+                      for pool_class, e in engines.items()}
+# same pools, but the connections run in autocommit mode: reads send no BEGIN/COMMIT
+_readonly_session_factories = {pool_class: async_sessionmaker(bind=e.execution_options(isolation_level="AUTOCOMMIT"), autoflush=False, expire_on_commit=False)
+                               for pool_class, e in engines.items()}
+
+# optional streaming replica for analytics and large listings, see database.replica
+replica_engine = _create_engine(os.getenv('DATABASE_REPLICA_URL'), 'replica',
+                                pool_size=int(os.getenv('DB_REPLICA_ENGINE_POOL_SIZE', 5)),
+                                max_overflow=int(os.getenv('DB_REPLICA_ENGINE_MAX_OVERFLOW', 5)),
+                                isolation_level="AUTOCOMMIT") if os.getenv('DATABASE_REPLICA_URL') else None
+ReplicaSessionFactory = async_sessionmaker(bind=replica_engine, autoflush=False, expire_on_commit=False) if replica_engine is not None else None
 # ScopedSession = scoped_session(AsyncSessionFactory)
 Base = declarative_base()
 
 
-def get_db_session() -> AsyncSession:
-    return AsyncSessionFactory()
+def get_db_session(pool_class: PoolClass | None = None) -> AsyncSession:
+    return _session_factories[pool_class or current_pool_class()]()
+
+
+def get_db_readonly_session(pool_class: PoolClass | None = None) -> AsyncSession:
+    return _readonly_session_factories[pool_class or current_pool_class()]()
+
+
+def get_db_replica_session() -> AsyncSession:
+    return ReplicaSessionFactory()
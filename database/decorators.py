@@ -1,17 +1,80 @@
+import logging
 from functools import wraps
 from typing import Callable, Optional
 
+from database.instrumentation import query_function
+from database.pools import PoolClass, current_pool_class
 
-def with_session(func: Optional[Callable] = None, *, transaction: bool = False, override_name: str = "s"):
-    from database.session_privider import get_session
+logger = logging.getLogger(__name__)
+
+
+def with_session(func: Optional[Callable] = None, *, transaction: bool = False, readonly: bool = False, replica: bool = False,
+                 pool: PoolClass | None = None, override_name: str = "s"):
+    """
+    Passes a session as `override_name` unless the caller passed one.
+
+    `readonly` functions run on an autocommit connection: no BEGIN/COMMIT/ROLLBACK
+    round trips, and the connection goes back to the pool as soon as the function
+    returns. They must only read and return already materialized results.
+
+    `replica` functions are readonly functions that may see slightly stale data:
+    they run on the replica while it is healthy and within the allowed lag,
+    otherwise (or if it fails mid-call) on the primary's analytics pool.
+
+    `pool` picks the connection pool; by default it is the one of the calling
+    context (see `pool_scope`), interactive outside of any. Inside a `session_scope`,
+    interactive calls share the scope's session; calls for another pool open their own.
+
+    Statements executed by the function are attributed to it in the query metrics.
+    """
+    from database.session_privider import get_session, get_readonly_session, get_replica_session
+    from database.replica import replica_router, REPLICA_UNAVAILABLE_ERRORS
+    from database.session_scope import get_scoped_session
+
+    if (readonly or replica) and transaction:
+        raise ValueError("a readonly session can't be transactional")
+    if replica and pool is None:
+        pool = PoolClass.ANALYTICS
 
     def decorator(f: Callable):
+        function_name = f"{f.__module__}.{f.__qualname__}"
+
         @wraps(f)
         async def wrapper(*args, **kwargs):
+            with query_function(function_name):
+                return await call(*args, **kwargs)
+
+        async def call(*args, **kwargs):
             if kwargs.get(override_name) is not None:
                 return await f(*args, **kwargs)
 
-            session = get_session()
+            if replica and await replica_router.available():
+                session = get_replica_session()
+                try:
+                    kwargs[override_name] = session
+                    return await f(*args, **kwargs)
+                except REPLICA_UNAVAILABLE_ERRORS as e:
+                    logger.warning(f"Replica failed during {f.__name__}, retrying on the primary: {e}")
+                    replica_router.mark_down()
+                finally:
+                    await session.close()
+
+            # inside a session_scope the scope owns the session, commits and closes it.
+            # The scoped session is an interactive one, calls asking for another pool get their own session
+            scoped_session = get_scoped_session(readonly) if (pool or current_pool_class()) is PoolClass.INTERACTIVE else None
+            if scoped_session is not None:
+                kwargs[override_name] = scoped_session
+                return await f(*args, **kwargs)
+
+            if readonly or replica:
+                session = get_readonly_session(pool)
+                try:
+                    kwargs[override_name] = session
+                    return await f(*args, **kwargs)
+                finally:
+                    await session.close()
+
+            session = get_session(pool)
             if transaction:
                 await session.begin()
 
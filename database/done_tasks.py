@@ -0,0 +1,108 @@
+import logging
+import time
+
+from redis import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache.circuit_breaker import redis_breaker, log_redis_error
+from cache.metrics import CacheMetrics
+from cache.single_flight import single_flight
+from variables import redis
+from .decorators import with_session
+from .entities import TaskDoneHistory
+
+logger = logging.getLogger(__name__)
+
+DONE_TASKS_TTL = 24 * 3600
+
+# task ids start at 1: a set holding 0 was loaded from tasks_done_history, otherwise it only has the latest completions
+_LOADED = 0
+
+_metrics = CacheMetrics("get_done_task_ids")
+
+
+def done_tasks_key(tg_user_id: int) -> str:
+    return f"tasks_done:{tg_user_id}"
+
+
+@with_session(readonly=True)
+async def load_done_task_ids(tg_user_id: int, s: AsyncSession = None) -> frozenset[int]:
+    stmt = select(TaskDoneHistory.task_id).where(TaskDoneHistory.user_id.__eq__(tg_user_id))
+    return frozenset((await s.execute(stmt)).scalars())
+
+
+async def _store(key: str, task_ids: frozenset[int]) -> None:
+    async def operation():
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(key, _LOADED, *task_ids)
+            pipe.expire(key, DONE_TASKS_TTL)
+            return await pipe.execute()
+
+    try:
+        await redis_breaker.call(operation)
+    except RedisError as e:
+        _metrics.redis_errors.inc()
+        log_redis_error(logger, f"Redis error while caching done tasks: {key}", e)
+
+
+async def get_done_task_ids(tg_user_id: int) -> frozenset[int]:
+    """
+    Ids of the tasks the user has completed, kept as one Redis set of integers (an intset, a few bytes per task).
+    The set is loaded from `tasks_done_history` once and then only grows through `mark_task_done`.
+    """
+    key = done_tasks_key(tg_user_id)
+
+    async def compute() -> frozenset[int]:
+        started = time.perf_counter()
+        try:
+            members = await redis_breaker.call(lambda: redis.smembers(key))
+        except RedisError as e:
+            _metrics.redis_errors.inc()
+            _metrics.bypasses.inc()
+            log_redis_error(logger, f"Redis error while reading done tasks: {key}", e)
+            return await load_done_task_ids(tg_user_id)
+        finally:
+            _metrics.redis_seconds.observe(time.perf_counter() - started)
+
+        task_ids = {int(m) for m in members}
+        if _LOADED in task_ids:
+            _metrics.hits.inc()
+            task_ids.discard(_LOADED)
+            return frozenset(task_ids)
+        _metrics.misses.inc()
+
+        started = time.perf_counter()
+        try:
+            loaded = await load_done_task_ids(tg_user_id)
+        except Exception:
+            _metrics.compute_errors.inc()
+            raise
+        finally:
+            _metrics.compute_seconds.observe(time.perf_counter() - started)
+        # adding to the set keeps the completions marked while the history was read
+        await _store(key, loaded)
+        return loaded | task_ids
+
+    return await single_flight(key, compute)
+
+
+async def mark_task_done(tg_user_id: int, task_id: int) -> None:
+    """
+    Adds a completion to the user's set. Called once the `tasks_done_history` insert is committed,
+    so a rolled back completion never hides the task; the unique (task_id, user_id) constraint
+    still stops a second completion checked in between.
+    """
+    key = done_tasks_key(tg_user_id)
+
+    async def operation():
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(key, task_id)
+            pipe.expire(key, DONE_TASKS_TTL)
+            return await pipe.execute()
+
+    try:
+        await redis_breaker.call(operation)
+    except RedisError as e:
+        _metrics.redis_errors.inc()
+        log_redis_error(logger, f"Redis error while marking task {task_id} done: {key}", e)
@@ -2,7 +2,7 @@ import datetime
 import uuid
 from typing import Optional
 
-from sqlalchemy import Column, DateTime, ForeignKey, BigInteger, Enum as SQLEnum, Text, func, PrimaryKeyConstraint, Index
+from sqlalchemy import Column, Date, DateTime, ForeignKey, BigInteger, Enum as SQLEnum, Text, func, PrimaryKeyConstraint, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -26,7 +26,7 @@ class User(Base):
     telegram_id: Mapped[int] = mapped_column(type_=BigInteger, primary_key=True)
     balance: Mapped[int] = mapped_column(type_=BigInteger, default=0)
     bmeme_balance: Mapped[int] = mapped_column(type_=BigInteger, default=0)
-    referred_by_id: Mapped[Optional[int]] = mapped_column(ForeignKey('users.telegram_id'), type_=BigInteger)
+    referred_by_id: Mapped[Optional[int]] = mapped_column(ForeignKey('users.telegram_id'), type_=BigInteger, index=True)
     blocked: Mapped[bool] = mapped_column(default=False)
     language: Mapped[Lang] = mapped_column(SQLEnum(Lang), default=Lang.EN)
     is_admin: Mapped[bool] = mapped_column(default=False, nullable=False)
@@ -38,6 +38,10 @@ class User(Base):
 class Transaction(Base):
     __tablename__ = 'transactions'
 
+    __table_args__ = (
+        Index('ix_transactions_source_id_type', 'source_id', 'type'),
+    )
+
     id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     operation: Mapped[TransactionOperation] = mapped_column(SQLEnum(TransactionOperation), nullable=False)
     type: Mapped[TransactionType] = mapped_column(SQLEnum(TransactionType), nullable=False)
@@ -86,6 +90,10 @@ class Mailing(Base):
 class MailingMessage(Base):
     __tablename__ = 'mailing_messages'
 
+    __table_args__ = (
+        Index('ix_mailing_messages_mailing_id_status', 'mailing_id', 'status'),
+    )
+
     id: Mapped[uuid.UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     text: Mapped[str] = mapped_column(type_=Text, nullable=True)
     status: Mapped[MailingMessageStatus] = mapped_column(SQLEnum(MailingMessageStatus))
@@ -130,6 +138,12 @@ class Task(Base):
     coin_pool: Mapped[int] = mapped_column(type_=BigInteger, nullable=True)
     done_reward: Mapped[int] = mapped_column(type_=BigInteger, nullable=True)
 
+    # maintained by `add_task_done` for limited tasks and by `count_unlimited_task_completions` for the rest, see `reconcile_task_counters`
+    done_count: Mapped[int] = mapped_column(type_=BigInteger, nullable=False, default=0, server_default='0',
+                                            comment="number of tasks_done_history and tasks_done_history_duplicates rows")
+    rewarded_amount: Mapped[int] = mapped_column(type_=BigInteger, nullable=False, default=0, server_default='0',
+                                                 comment="sum of tasks_done_history and tasks_done_history_duplicates rewards")
+
     created_by_id: Mapped[int] = mapped_column(ForeignKey('users.telegram_id'), type_=BigInteger, nullable=False)
     created_by: Mapped[User] = relationship("User", foreign_keys=[created_by_id])
 
@@ -146,6 +160,11 @@ class Task(Base):
 class TaskDoneHistory(Base):
     __tablename__ = 'tasks_done_history'
 
+    __table_args__ = (
+        UniqueConstraint('task_id', 'user_id', name='uq_tasks_done_history_task_id_user_id'),
+        Index('ix_tasks_done_history_user_id_task_id', 'user_id', 'task_id'),
+    )
+
     id: Mapped[int] = mapped_column(type_=BigInteger, primary_key=True, autoincrement=True)
     reward: Mapped[int] = mapped_column(type_=BigInteger, nullable=True)
 
@@ -157,11 +176,29 @@ class TaskDoneHistory(Base):
     created_at: Mapped[datetime.datetime] = mapped_column("created_at", DateTime(timezone=True), default=now)
 
 
+# completions repeated before the unique (task_id, user_id) constraint existed: they were paid, so the task counters still count them
+class TaskDoneHistoryDuplicate(Base):
+    __tablename__ = 'tasks_done_history_duplicates'
+
+    __table_args__ = (
+        Index('ix_tasks_done_history_duplicates_task_id', 'task_id'),
+        {'comment': 'completions repeated before the unique (task_id, user_id) constraint existed'},
+    )
+
+    id: Mapped[int] = mapped_column(type_=BigInteger, primary_key=True, autoincrement=False)
+    reward: Mapped[int] = mapped_column(type_=BigInteger, nullable=True)
+    user_id: Mapped[int] = mapped_column(type_=BigInteger, nullable=False)
+    task_id: Mapped[int] = mapped_column(type_=BigInteger, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column("created_at", DateTime(timezone=True), nullable=True)
+    archived_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
 class UserActivityStatistic(Base):
     __tablename__ = 'user_activity_statistics'
 
     __table_args__ = (
         PrimaryKeyConstraint('user_id', 'datetime', name='user_activity_statistics_pk'),
+        Index('ix_user_activity_statistics_datetime', 'datetime'),
     )
 
     user_id: Mapped[int] = mapped_column(ForeignKey('users.telegram_id'), type_=BigInteger, nullable=False)
@@ -169,6 +206,30 @@ class UserActivityStatistic(Base):
     datetime_: Mapped[datetime.datetime] = mapped_column("datetime", DateTime(timezone=True), default=now)
 
 
+class DailyUserStatistic(Base):
+    __tablename__ = 'daily_user_statistics'
+
+    # maintained by `roll_up_statistics`, a day is final once it was rolled up after it ended
+    date: Mapped[datetime.date] = mapped_column(Date, primary_key=True)
+    joined: Mapped[int] = mapped_column(type_=BigInteger, nullable=False, default=0, comment="users created that day")
+    clean_joined: Mapped[int] = mapped_column(type_=BigInteger, nullable=False, default=0, comment="users created that day, not blocked or deleted when rolled up")
+    active_users: Mapped[int] = mapped_column(type_=BigInteger, nullable=False, default=0, comment="distinct users of user_activity_statistics that day")
+    rolled_up_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=now)
+
+
+class DailyCallbackStatistic(Base):
+    __tablename__ = 'daily_callback_statistics'
+
+    __table_args__ = (
+        PrimaryKeyConstraint('date', 'callback_query_prefix', name='daily_callback_statistics_pk'),
+    )
+
+    date: Mapped[datetime.date] = mapped_column(Date, nullable=False)
+    callback_query_prefix: Mapped[str] = mapped_column(type_=Text, nullable=False, comment="empty for activities without one")
+    activities: Mapped[int] = mapped_column(type_=BigInteger, nullable=False, default=0)
+    active_users: Mapped[int] = mapped_column(type_=BigInteger, nullable=False, default=0)
+
+
 class CustomClientToken(Base):
     __tablename__ = 'custom_client_tokens'
 
@@ -57,6 +57,12 @@ class TaskType(Enum):
     BONUS = 3
 
 
+class TaskDoneResult(Enum):
+    DONE = 0
+    ALREADY_DONE = 1
+    USED_UP = 2
+
+
 class CurrencyType(Enum):
     GMEME = 0
     BMEME = 1
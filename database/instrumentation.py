@@ -0,0 +1,132 @@
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from metrics import registry, LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+QUERIES_PER_UNIT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+query_seconds = registry.histogram("db_query_seconds", "Statement execution time by calling function.", ("function",),
+                                   buckets=LATENCY_BUCKETS)
+query_rows = registry.histogram("db_query_rows", "Rows returned or affected by a statement.", ("function",),
+                                buckets=ROW_BUCKETS)
+slow_queries = registry.counter("db_slow_queries_total", "Statements slower than DB_SLOW_QUERY_MS.", ("function",))
+queries_per_unit = registry.histogram("db_queries_per_unit", "Statements executed per bot update or API request.", ("unit",),
+                                      buckets=QUERIES_PER_UNIT_BUCKETS)
+
+SLOW_QUERY_SECONDS = float(os.getenv('DB_SLOW_QUERY_MS', 200)) / 1000
+# the same (normalized) statement is logged as slow at most once per interval
+SLOW_QUERY_LOG_INTERVAL = float(os.getenv('DB_SLOW_QUERY_LOG_INTERVAL', 60))
+# units running more statements are logged with their per-function breakdown
+QUERIES_PER_UNIT_WARNING = int(os.getenv('DB_QUERIES_PER_UNIT_WARNING', 20))
+
+_OTHER = 'other'
+
+_current_function: ContextVar[str] = ContextVar('db_function', default=_OTHER)
+_current_unit: ContextVar[Counter | None] = ContextVar('db_unit', default=None)
+
+_slow_logged_at: dict[str, float] = {}
+_slow_suppressed: Counter = Counter()
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![$\w])\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|\$\d+|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|\$\d+|%\(\w+\)s|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    The statement with literals replaced by `?` and IN lists collapsed, so repetitions group together.
+    """
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    statement = _PLACEHOLDER_LIST.sub('(...)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+@contextmanager
+def query_function(name: str) -> Iterator[None]:
+    """
+    Statements executed inside are attributed to `name`.
+    """
+    token = _current_function.set(name)
+    try:
+        yield
+    finally:
+        _current_function.reset(token)
+
+
+@contextmanager
+def query_unit(unit: str) -> Iterator[None]:
+    """
+    Counts the statements executed inside (a bot update, an API request) into `db_queries_per_unit`.
+    A nested unit is counted as part of the outer one.
+    """
+    if _current_unit.get() is not None:
+        yield
+        return
+
+    counts = Counter()
+    token = _current_unit.set(counts)
+    try:
+        yield
+    finally:
+        _current_unit.reset(token)
+        total = sum(counts.values())
+        queries_per_unit.labels(unit).observe(total)
+        if total > QUERIES_PER_UNIT_WARNING:
+            breakdown = ', '.join(f"{name}={count}" for name, count in counts.most_common())
+            logger.warning(f"{total} statements in one {unit}: {breakdown}")
+
+
+def _log_slow(function: str, statement: str, elapsed: float) -> None:
+    slow_queries.labels(function).inc()
+    normalized = normalize_sql(statement)
+    now = time.monotonic()
+    logged_at = _slow_logged_at.get(normalized)
+    if logged_at is not None and now - logged_at < SLOW_QUERY_LOG_INTERVAL:
+        _slow_suppressed[normalized] += 1
+        return
+    _slow_logged_at[normalized] = now
+    suppressed = _slow_suppressed.pop(normalized, 0)
+    logger.warning(f"Slow query in {function} ({elapsed * 1000:.1f}ms"
+                   f"{f', {suppressed} more since last report' if suppressed else ''}): {normalized}")
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    # the greenlet running the driver shares the context of the calling task
+    function = _current_function.get()
+    query_seconds.labels(function).observe(elapsed)
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        query_rows.labels(function).observe(cursor.rowcount)
+    counts = _current_unit.get()
+    if counts is not None:
+        counts[function] += 1
+    if elapsed >= SLOW_QUERY_SECONDS:
+        _log_slow(function, statement, elapsed)
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    # a failed statement never reaches after_cursor_execute
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
@@ -0,0 +1,75 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from typing import Iterator
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from metrics import registry
+
+checkout_wait_seconds = registry.histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", ("pool",))
+checkout_timeouts = registry.counter("db_pool_checkout_timeouts_total", "Checkouts that gave up after pool_timeout.", ("pool",))
+checked_out = registry.gauge("db_pool_checked_out", "Connections currently checked out.", ("pool",))
+
+
+class PoolClass(Enum):
+    """
+    Workloads that get their own connection pool, so one can't starve the others.
+    """
+    INTERACTIVE = 'interactive'
+    BACKGROUND = 'background'
+    ANALYTICS = 'analytics'
+
+
+_current_pool_class: ContextVar[PoolClass] = ContextVar('pool_class', default=PoolClass.INTERACTIVE)
+
+
+def current_pool_class() -> PoolClass:
+    return _current_pool_class.get()
+
+
+@contextmanager
+def pool_scope(pool_class: PoolClass) -> Iterator[None]:
+    """
+    Sessions opened inside (without an explicit pool) come from `pool_class`.
+    """
+    token = _current_pool_class.set(pool_class)
+    try:
+        yield
+    finally:
+        _current_pool_class.reset(token)
+
+
+def instrumented_pool(name: str) -> type[AsyncAdaptedQueuePool]:
+    """
+    An `AsyncAdaptedQueuePool` exporting its checkout waits under the `pool` label `name`.
+    A class rather than an instance hook, because the engine recreates its pool on dispose.
+    """
+    wait = checkout_wait_seconds.labels(name)
+    timeouts = checkout_timeouts.labels(name)
+    in_use = checked_out.labels(name)
+
+    class InstrumentedPool(AsyncAdaptedQueuePool):
+        # log under "sqlalchemy", whose level sqlalchemy keeps at WARN
+        _sqla_logger_namespace = f"sqlalchemy.pool.{name}"
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                timeouts.inc()
+                raise
+            finally:
+                wait.observe(time.perf_counter() - started)
+            in_use.set(self.checkedout())
+            return connection
+
+        def _do_return_conn(self, record) -> None:
+            super()._do_return_conn(record)
+            in_use.set(self.checkedout())
+
+    InstrumentedPool.__name__ = InstrumentedPool.__qualname__ = f"{name.title()}Pool"
+    return InstrumentedPool
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, InterfaceError
+
+from database.conf import replica_engine
+
+logger = logging.getLogger(__name__)
+
+# errors after which the replica is considered down and the call is retried on the primary
+REPLICA_UNAVAILABLE_ERRORS = (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)
+
+# a caught-up replica reports 0, even if the primary has been idle for a while
+_LAG_QUERY = text("""
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+""")
+
+
+class ReplicaRouter:
+    """
+    Decides whether `with_session(replica=True)` calls may use the replica.
+
+    The replication lag is checked at most every `check_interval` seconds;
+    a replica lagging more than `max_lag` seconds, or failing, is skipped
+    in favour of the primary until the next check.
+    """
+
+    def __init__(self, max_lag: float, check_interval: float):
+        self._max_lag = max_lag
+        self._check_interval = check_interval
+        self._available = False
+        self._checked_at: float | None = None
+        self._checking = False
+
+    async def available(self) -> bool:
+        if replica_engine is None:
+            return False
+        # one caller runs a due check, the others go on with the last known state meanwhile
+        if self._checking or (self._checked_at is not None and time.monotonic() - self._checked_at < self._check_interval):
+            return self._available
+        self._checking = True
+        try:
+            self._set_available(await self._check())
+        finally:
+            self._checking = False
+        return self._available
+
+    def mark_down(self) -> None:
+        self._set_available(False)
+
+    def _set_available(self, available: bool) -> None:
+        if available != self._available:
+            logger.info(f"Routing replica reads to the {'replica' if available else 'primary'}")
+        self._available = available
+        self._checked_at = time.monotonic()
+
+    async def _check(self) -> bool:
+        try:
+            lag = float(await asyncio.wait_for(self._lag(), self._check_interval))
+        except REPLICA_UNAVAILABLE_ERRORS as e:
+            logger.warning(f"Replica is unavailable: {e!r}")
+            return False
+        if lag > self._max_lag:
+            logger.warning(f"Replica lags {lag:.1f}s behind the primary, allowed {self._max_lag}s")
+            return False
+        return True
+
+    @staticmethod
+    async def _lag() -> float:
+        # connecting is bounded by the check timeout too, an unreachable host may not refuse right away
+        async with replica_engine.connect() as conn:
+            return await conn.scalar(_LAG_QUERY)
+
+replica_router = ReplicaRouter(max_lag=float(os.getenv('DB_REPLICA_MAX_LAG', 30)),
+                               check_interval=float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 5)))
@@ -1,116 +1,143 @@
+import asyncio
 import logging
 import uuid
 from datetime import datetime, date
 from typing import Any, Sequence, Union
 
-from sqlalchemy import and_, or_, func, union, text
-from sqlalchemy import select, desc, Row, update, ScalarResult
+from sqlalchemy import and_, or_, func, any_, literal, BigInteger
+from sqlalchemy import select, desc, Row, update, delete, ScalarResult
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased
 from sqlalchemy.sql.functions import coalesce
 
 import cache
 from lang.lang_based_provider import Lang
-from utils.pagination import Pagination
+from utils.pagination import Pagination, Cursor
 from .decorators import with_session
+from .enums import TaskDoneResult
+from .done_tasks import get_done_task_ids
+from .task_catalog import task_catalog, ActiveTask
+from .task_slots import remaining_slots
 from .entities import User, Setting, SettingsKey, MailingMessageStatus, MailingMessage, Mailing, now, MailingStatus, Task, TaskType, TaskDoneHistory, UserActivityStatistic, CustomClientToken, UserActivityContext, CustomClientTokenType, EventBonus, \
-    EventBonusActivation
+    EventBonusActivation, DailyUserStatistic, DailyCallbackStatistic
 
 logger = logging.getLogger(__name__)
 
 
-@with_session
+def any_of_ids(ids: list[int]):
+    """
+    `= ANY(:ids)` with a single array parameter, so the statement stays the same for any number of ids.
+    """
+    return any_(literal(ids, type_=ARRAY(BigInteger)))
+
+
+@with_session(readonly=True)
 async def get_user_by_tg(tg_user_id: int, s: AsyncSession = None) -> User:
     stmt = select(User).where(User.telegram_id.__eq__(tg_user_id))
     return await s.scalar(stmt)
 
 
-@cache.cacheable(ttl="10m", save_as_blob=True, function_name_as_id=True)
-@with_session
+# the statistics read the daily rollups kept by `roll_up_statistics`, which lag behind by up to its interval
+@cache.cacheable(ttl="5m", function_name_as_id=True, lock_timeout="30s", stale_ttl="30m", refresh_ahead=1.0)
+@with_session(replica=True)
 async def get_users_statistic(s: AsyncSession = None):
-    start_of_day = datetime.combine(date.today(), datetime.min.time())
-    end_of_day = datetime.combine(date.today(), datetime.max.time())
-
-    today_join_stmt = (select(func.count(User.telegram_id))
-                       .where(User.created_at.between(start_of_day, end_of_day)))
-    total_user_count = (select(func.count(User.telegram_id)))
-
-    union_stmt = union(today_join_stmt, total_user_count)
-    join_count, total_count = (await s.execute(union_stmt)).scalars()
+    # the total is counted: the rollups miss the days not backfilled yet and keep counting hard deleted users
+    stmt = select(
+        coalesce(func.sum(DailyUserStatistic.joined).filter(DailyUserStatistic.date == func.current_date()), 0),
+        select(func.count(User.telegram_id)).scalar_subquery()
+    )
+    join_count, total_count = (await s.execute(stmt)).one()
 
     return join_count, total_count
 
 
-@cache.cacheable(ttl="1h", save_as_blob=True, function_name_as_id=True)
-@with_session
+@cache.cacheable(ttl="5m", function_name_as_id=True, lock_timeout="30s", stale_ttl="1h", refresh_ahead=1.0, cache_result_ignore_val=[])
+@with_session(replica=True)
 async def get_activity_statistic(s: AsyncSession = None):
     stmt = (
-        select(
-            func.date(UserActivityStatistic.datetime_).label('activity_date'),
-            func.count(func.distinct(UserActivityStatistic.user_id))
-        )
-        .group_by(text('activity_date'))
-        .order_by(text('activity_date DESC'))
+        select(DailyUserStatistic.date, DailyUserStatistic.active_users)
+        .where(DailyUserStatistic.active_users > 0)
+        .order_by(DailyUserStatistic.date)
     )
     result = await s.execute(stmt)
-    return reversed(result.all())
+    return result.all()
 
 
-@cache.cacheable(ttl="10m", save_as_blob=True, function_name_as_id=True)
-@with_session
-async def get_dirty_incoming_statistic(s: AsyncSession = None):
+# days shown by the incoming statistics, the last ones with joins
+JOIN_STATISTIC_DAYS = 30
+
+
+async def _last_joins(joined, s: AsyncSession):
     stmt = (
-        select(
-            func.date(User.created_at).label('joined_date'),
-            func.count(User.telegram_id)
-        )
-        .group_by(text('joined_date'))
-        .order_by(text('joined_date DESC'))
-        .limit(30)
+        select(DailyUserStatistic.date, joined)
+        .where(joined > 0)
+        .order_by(DailyUserStatistic.date.desc())
+        .limit(JOIN_STATISTIC_DAYS)
     )
     result = await s.execute(stmt)
-    return reversed(result.all())
+    return list(reversed(result.all()))
 
 
-@cache.cacheable(ttl="10m", save_as_blob=True, function_name_as_id=True)
-@with_session
+@cache.cacheable(ttl="5m", function_name_as_id=True, lock_timeout="30s", stale_ttl="30m", refresh_ahead=1.0, cache_result_ignore_val=[])
+@with_session(replica=True)
+async def get_dirty_incoming_statistic(s: AsyncSession = None):
+    return await _last_joins(DailyUserStatistic.joined, s)
+
+
+@cache.cacheable(ttl="5m", function_name_as_id=True, lock_timeout="30s", stale_ttl="30m", refresh_ahead=1.0, cache_result_ignore_val=[])
+@with_session(replica=True)
 async def get_incoming_statistic(s: AsyncSession = None):
+    """
+    Like `get_dirty_incoming_statistic`, without the users that were blocked or deleted.
+    """
+    return await _last_joins(DailyUserStatistic.clean_joined, s)
+
+
+@with_session(replica=True)
+async def get_callback_activity_statistic(since: date, s: AsyncSession = None) -> Sequence[Row[tuple[date, str, int, int]]]:
+    """
+    Activities and distinct active users per callback query prefix and day, from `since` on.
+    """
     stmt = (
-        select(
-            func.date(User.created_at).label('joined_date'),
-            func.count(User.telegram_id)
-        )
-        .group_by(text('joined_date'))
-        .order_by(text('joined_date DESC'))
-        .limit(30)
+        select(DailyCallbackStatistic.date, DailyCallbackStatistic.callback_query_prefix,
+               DailyCallbackStatistic.activities, DailyCallbackStatistic.active_users)
+        .where(DailyCallbackStatistic.date >= since)
+        .order_by(DailyCallbackStatistic.date, DailyCallbackStatistic.activities.desc())
     )
-    result = await s.execute(stmt)
-    return reversed(result.all())
+    return (await s.execute(stmt)).all()
 
 
-@with_session
+@with_session(readonly=True)
 async def get_user_balance(tg_user_id: int, s: AsyncSession = None) -> int:
     stmt = select(User.balance).where(User.telegram_id.__eq__(tg_user_id))
     return await s.scalar(stmt)
 
 
-@cache.cacheable(ttl="10m", cache_result_ignore_val=False)
-@with_session
+@cache.cacheable(ttl="10m", cache_result_ignore_val=False, l1_ttl="1m", tags=("user:{}",))
+@with_session(readonly=True)
 async def is_user_exists_by_tg(tg_user_id: int, s: AsyncSession = None) -> bool:
     stmt = select(User).where(User.telegram_id.__eq__(tg_user_id)).exists().select()
     return await s.scalar(stmt)
 
 
-@cache.cacheable(ttl="10m")
-@with_session
+@is_user_exists_by_tg.many_loader
+@with_session(readonly=True)
+async def get_existing_users_by_tg(tg_user_ids: list[int], s: AsyncSession = None) -> dict[int, bool]:
+    stmt = select(User.telegram_id).where(User.telegram_id.__eq__(any_of_ids(tg_user_ids)))
+    existing = set((await s.execute(stmt)).scalars())
+    return {id_: id_ in existing for id_ in tg_user_ids}
+
+
+@cache.cacheable(ttl="10m", tags=("user:{}",))
+@with_session(readonly=True)
 async def has_premium(tg_user_id: int, s: AsyncSession = None) -> bool:
     stmt = select(User.is_premium).where(User.telegram_id.__eq__(tg_user_id))
     result = await s.execute(stmt)
     return result.scalar()
 
 
-@cache.cacheable(ttl="1m")
-@with_session
+@cache.cacheable(ttl="1m", tags=("user:{}",))
+@with_session(readonly=True)
 async def is_good_user_by_tg(tg_user_id: int, s: AsyncSession = None) -> bool:
     ext = select(User) \
         .where(User.telegram_id.__eq__(tg_user_id)) \
@@ -122,8 +149,19 @@ async def is_good_user_by_tg(tg_user_id: int, s: AsyncSession = None) -> bool:
     return result.scalar()
 
 
-@cache.cacheable(ttl="1h")
-@with_session
+@is_good_user_by_tg.many_loader
+@with_session(readonly=True)
+async def get_good_users_by_tg(tg_user_ids: list[int], s: AsyncSession = None) -> dict[int, bool]:
+    stmt = (select(User.telegram_id)
+            .where(User.telegram_id.__eq__(any_of_ids(tg_user_ids)))
+            .where(User.blocked.__eq__(False))
+            .where(User.deleted_at.__eq__(None)))
+    good = set((await s.execute(stmt)).scalars())
+    return {id_: id_ in good for id_ in tg_user_ids}
+
+
+@cache.cacheable(ttl="1h", l1_ttl="5m", tags=("user:{}",))
+@with_session(readonly=True)
 async def is_admin(tg_user_id: int, s: AsyncSession = None) -> bool:
     ext = (select(User)
            .where(User.telegram_id.__eq__(tg_user_id))
@@ -138,25 +176,27 @@ async def is_admin(tg_user_id: int, s: AsyncSession = None) -> bool:
 async def save_user(user: User, s: AsyncSession = None) -> None:
     s.add(user)
     await s.commit()
+    # the referrer's referral count changes too
+    await cache.invalidate_tag(*(f"user:{id_}" for id_ in (user.telegram_id, user.referred_by_id) if id_ is not None))
 
 
 @with_session
 async def update_user_language(tg_user_id: int, lang: Lang, s: AsyncSession = None) -> None:
-    await s.begin()
     user = await get_user_by_tg(tg_user_id, s=s)
     user.language = lang
     await s.commit()
+    await cache.invalidate_tag(f"user:{tg_user_id}")
 
 
-@cache.cacheable(associate_none_as=False)
-@with_session
+@cache.cacheable(l1_ttl="5m", tags=("user:{}",))
+@with_session(readonly=True)
 async def is_user_admin_by_tg_id(tg_user_id: int, s: AsyncSession = None) -> bool:
     stmt = select(User.is_admin).where(User.telegram_id.__eq__(tg_user_id))
     result = await s.execute(stmt)
     return result.scalar()
 
 
-@with_session
+@with_session(readonly=True)
 async def get_user_language(tg_user_id: int, s: AsyncSession = None) -> Lang:
     stmt = select(User.language).where(User.telegram_id.__eq__(tg_user_id))
     result = await s.execute(stmt)
@@ -172,22 +212,32 @@ async def update_user_is_bot_start_completed_by_tg_id(tg_user_id: int, val: bool
     pass
 
 
-@with_session
+@with_session(readonly=True)
 async def get_setting_by_id(key: SettingsKey, s: AsyncSession = None) -> Setting:
     stmt = select(Setting).where(Setting.id.__eq__(key))
     result = await s.execute(stmt)
     return result.scalar()
 
 
-@cache.cacheable(ttl="20m")
-@with_session
+@cache.cacheable(ttl="20m", tags=("user:{}",))
+@with_session(readonly=True)
 async def get_user_referrals_count(tg_user_id: int, s: AsyncSession = None) -> int:
     stmt = select(func.count(User.telegram_id)).where(User.referred_by_id.__eq__(tg_user_id))
     result = await s.execute(stmt)
     return result.scalar()
 
 
-@with_session
+@get_user_referrals_count.many_loader
+@with_session(readonly=True)
+async def get_users_referrals_count(tg_user_ids: list[int], s: AsyncSession = None) -> dict[int, int]:
+    stmt = (select(User.referred_by_id, func.count(User.telegram_id))
+            .where(User.referred_by_id.__eq__(any_of_ids(tg_user_ids)))
+            .group_by(User.referred_by_id))
+    counts = dict((await s.execute(stmt)).all())
+    return {id_: counts.get(id_, 0) for id_ in tg_user_ids}
+
+
+@with_session(readonly=True)
 async def is_premium_user(tg_user_id: int, s: AsyncSession = None) -> bool:
     stmt = select(User.is_premium).where(User.telegram_id.__eq__(tg_user_id))
     result = await s.execute(stmt)
@@ -196,14 +246,14 @@ async def is_premium_user(tg_user_id: int, s: AsyncSession = None) -> bool:
 
 @with_session
 async def update_user_premium(tg_user_id: int, premium: bool, s: AsyncSession = None) -> None:
-    await s.begin()
     user = await get_user_by_tg(tg_user_id, s=s)
     user.is_premium = premium
     await s.commit()
+    await cache.invalidate_tag(f"user:{tg_user_id}")
 
 
-@cache.cacheable(ttl="6h", function_name_as_id=True)
-@with_session
+@cache.cacheable(ttl="6h", function_name_as_id=True, lock_timeout="30s", stale_ttl="6h", refresh_ahead=1.0)
+@with_session(replica=True)
 async def get_verified_user_count(s: AsyncSession = None) -> int:
     stmt = (select(func.count())
             .where(User.deleted_at.__eq__(None))
@@ -211,7 +261,7 @@ async def get_verified_user_count(s: AsyncSession = None) -> int:
     return await s.scalar(stmt)
 
 
-@with_session
+@with_session(replica=True)
 async def get_top_users_by_referrals(limit: int = 10, s: AsyncSession = None) -> Sequence[Row[tuple[Any, Any]]]:
     referred_user_alias = User.__table__.alias("referred_user")
 
@@ -230,7 +280,7 @@ async def get_top_users_by_referrals(limit: int = 10, s: AsyncSession = None) ->
     return result
 
 
-@with_session
+@with_session(replica=True)
 async def get_top_users_by_referrals_with_start_date(start_date: datetime, limit: int = 10, s: AsyncSession = None) -> Sequence[Row[tuple[Any, Any]]]:
     referred_user_alias = User.__table__.alias("referred_user")
 
@@ -254,7 +304,6 @@ async def get_top_users_by_referrals_with_start_date(start_date: datetime, limit
 @with_session
 async def update_mailing_message_status(id_: uuid.UUID, status: MailingMessageStatus, s: AsyncSession = None) -> bool:
     try:
-        await s.begin()
         stmt = (
             update(MailingMessage)
             .where(MailingMessage.id.__eq__(id_))
@@ -264,16 +313,14 @@ async def update_mailing_message_status(id_: uuid.UUID, status: MailingMessageSt
         await s.commit()
         return True
     except Exception as e:
+        await s.rollback()
         logger.error(f"Failed to update status for MailingMessage with ID {id_}: {e}")
         return False
-    finally:
-        await s.close()
 
 
 @with_session
 async def update_mailing_message_statuses_by_mailing_id(mailing_id: int, status: MailingMessageStatus, s: AsyncSession = None) -> bool:
     try:
-        await s.begin()
         stmt = (
             update(MailingMessage)
             .where(MailingMessage.mailing_id.__eq__(mailing_id))
@@ -283,13 +330,12 @@ async def update_mailing_message_statuses_by_mailing_id(mailing_id: int, status:
         await s.commit()
         return True
     except Exception as e:
+        await s.rollback()
         logger.error(f"Failed to update statuses for MailingMessage with mailing_id {mailing_id}: {e}")
         return False
-    finally:
-        await s.close()
 
 
-@with_session
+@with_session(readonly=True)
 async def get_mailing_message(id_: uuid.UUID, s: AsyncSession = None) -> MailingMessage:
     stmt = (select(MailingMessage)
             .where(MailingMessage.id.__eq__(id_)))
@@ -297,7 +343,7 @@ async def get_mailing_message(id_: uuid.UUID, s: AsyncSession = None) -> Mailing
     return result.scalar()
 
 
-@with_session
+@with_session(readonly=True)
 async def get_mailing(id_: int, s: AsyncSession = None) -> Mailing:
     stmt = (
         select(Mailing)
@@ -307,7 +353,7 @@ async def get_mailing(id_: int, s: AsyncSession = None) -> Mailing:
     return result.scalar()
 
 
-@with_session
+@with_session(readonly=True)
 async def get_mailing_messages_by_mailing_id(mailing_id: int, s: AsyncSession = None) -> Sequence[MailingMessage]:
     stmt = (
         select(MailingMessage)
@@ -317,7 +363,7 @@ async def get_mailing_messages_by_mailing_id(mailing_id: int, s: AsyncSession =
     return result.scalars().all()
 
 
-@with_session
+@with_session(replica=True)
 async def get_mailing_statistic(mailing_id: int, s: AsyncSession = None) -> dict["MailingMessageStatus", int]:
     stmt = (
         select(
@@ -345,7 +391,7 @@ async def finish_mailing(mailing_id: int, s: AsyncSession = None) -> None:
         logger.error(f"Failed to finish mailing by id: {mailing_id}: {e}")
 
 
-@with_session
+@with_session(readonly=True)
 async def get_admin_ids(s: AsyncSession = None) -> ScalarResult[Any]:
     stmt = (select(User.telegram_id)
             .where(User.is_admin.__eq__(True)))
@@ -356,40 +402,85 @@ async def get_admin_ids(s: AsyncSession = None) -> ScalarResult[Any]:
 @with_session
 async def save_task(task: Task, s: AsyncSession = None) -> None:
     s.add(task)
+    await s.commit()
+    await task_catalog.invalidate()
 
 
-@with_session(override_name='session')
-async def get_active_tasks(session: AsyncSession = None):
-    # Subquery to count the number of times each DONE_BASED task has been completed
-    done_subquery = (
-        select(
-            TaskDoneHistory.task_id,
-            func.count(TaskDoneHistory.id).label('done_count')
-        )
-        .group_by(TaskDoneHistory.task_id)
-        .subquery()
+def done_based_task_available():
+    # Subscription-based tasks: done_limit is greater than the count of completed tasks
+    return and_(
+        Task.type == TaskType.DONE_BASED,
+        or_(Task.done_limit.is_(None), Task.done_limit > Task.done_count)
     )
 
-    # Join the Task table with both subqueries
-    stmt = select(Task).outerjoin(
-        done_subquery, Task.id == done_subquery.c.task_id
-    ).filter(
+
+def pool_based_task_available():
+    # Pool-based tasks: what is left of coin_pool still pays one more reward
+    return and_(
+        Task.type == TaskType.POOL_BASED,
+        or_(Task.coin_pool.is_(None), Task.coin_pool - Task.rewarded_amount >= coalesce(Task.done_reward, 0))
+    )
+
+
+def unlimited_task():
+    # the completions of these tasks are counted later, see `count_unlimited_task_completions`
+    return or_(
+        Task.type.not_in((TaskType.DONE_BASED, TaskType.POOL_BASED)),
+        and_(Task.type == TaskType.DONE_BASED, Task.done_limit.is_(None)),
+        and_(Task.type == TaskType.POOL_BASED, or_(Task.coin_pool.is_(None), coalesce(Task.done_reward, 0) == 0))
+    )
+
+
+@with_session
+async def add_task_done(task: Task | ActiveTask, user_id: int, s: AsyncSession = None) -> TaskDoneResult:
+    """
+    Records that `user_id` completed `task`, in the caller's transaction; once it is committed, the caller
+    passes a `DONE` on to `mark_task_done`. Records nothing if the user already completed the task
+    (`ALREADY_DONE`) or it has no completion left to pay for (`USED_UP`, see `TaskSlot`).
+
+    Only a limited task's counters are bumped here, as the final check of its limit: that locks
+    the task row until the caller commits. Unlimited tasks are counted later, without the lock.
+    """
+    # the unique (task_id, user_id) constraint makes a concurrent second completion wait for the first, then skip
+    history_id = (await s.execute(
+        insert(TaskDoneHistory)
+        .values(reward=task.done_reward, user_id=user_id, task_id=task.id)
+        .on_conflict_do_nothing(constraint='uq_tasks_done_history_task_id_user_id')
+        .returning(TaskDoneHistory.id)
+    )).scalar_one_or_none()
+    if history_id is None:
+        return TaskDoneResult.ALREADY_DONE
+    if remaining_slots(task) is None:
+        return TaskDoneResult.DONE
+
+    available = or_(Task.type.not_in((TaskType.DONE_BASED, TaskType.POOL_BASED)), done_based_task_available(), pool_based_task_available())
+    still_available = (await s.execute(
+        update(Task)
+        .where(Task.id.__eq__(task.id))
+        .where(available)
+        .values(done_count=Task.done_count + 1, rewarded_amount=Task.rewarded_amount + (task.done_reward or 0))
+        .returning(available)
+    )).scalar_one_or_none()
+    if still_available is None:
+        await s.execute(delete(TaskDoneHistory).where(TaskDoneHistory.id.__eq__(history_id)))
+        return TaskDoneResult.USED_UP
+    if not still_available:
+        # this completion used the task up, the catalogs must stop listing it
+        await task_catalog.invalidate()
+    return TaskDoneResult.DONE
+
+
+@with_session(readonly=True, override_name='session')
+async def get_active_tasks(session: AsyncSession = None):
+    stmt = select(Task).filter(
         or_(
             # Time-based tasks: Not expired or no expiration time set
             and_(
                 Task.type == TaskType.TIME_BASED,
                 or_(Task.expires_at.is_(None), Task.expires_at > now(native=True))
             ),
-            # Subscription-based tasks: done_limit is greater than the count of completed tasks
-            and_(
-                Task.type == TaskType.DONE_BASED,
-                or_(Task.done_limit.is_(None), Task.done_limit > done_subquery.c.done_count)
-            ),
-            # Pool-based tasks: coin_pool is greater than the sum of distributed rewards
-            and_(
-                Task.type == TaskType.POOL_BASED,
-                or_(Task.coin_pool.is_(None), Task.done_limit > done_subquery.c.done_count)
-            )
+            done_based_task_available(),
+            pool_based_task_available()
         )
     )
 
@@ -399,22 +490,9 @@ async def get_active_tasks(session: AsyncSession = None):
     return active_tasks
 
 
-@with_session(override_name='session')
+@with_session(readonly=True, override_name='session')
 async def get_active_task_by_id(id_: int, session: AsyncSession = None) -> Union[Task, None]:
-    # Subquery to count the number of times each DONE_BASED task has been completed
-    done_subquery = (
-        select(
-            TaskDoneHistory.task_id,
-            func.count(TaskDoneHistory.id).label('done_count')
-        )
-        .group_by(TaskDoneHistory.task_id)
-        .subquery()
-    )
-
-    # Join the Task table with both subqueries
-    stmt = select(Task).outerjoin(
-        done_subquery, Task.id == done_subquery.c.task_id
-    ).filter(
+    stmt = select(Task).filter(
         and_(
             Task.id.__eq__(id_),
             Task.deleted_at.__eq__(None),
@@ -424,16 +502,8 @@ async def get_active_task_by_id(id_: int, session: AsyncSession = None) -> Union
                     Task.type == TaskType.TIME_BASED,
                     or_(Task.expires_at.is_(None), Task.expires_at > now(native=True))
                 ),
-                # Subscription-based tasks: done_limit is greater than the count of completed tasks
-                and_(
-                    Task.type == TaskType.DONE_BASED,
-                    or_(Task.done_limit.is_(None), Task.done_limit > done_subquery.c.done_count)
-                ),
-                # Pool-based tasks: coin_pool is greater than the sum of distributed rewards
-                and_(
-                    Task.type == TaskType.POOL_BASED,
-                    or_(Task.coin_pool.is_(None), Task.done_limit > done_subquery.c.done_count)
-                ),
+                done_based_task_available(),
+                pool_based_task_available(),
                 Task.type == TaskType.BONUS
             )
         )
@@ -454,180 +524,74 @@ async def delete_task_by_id(task_id: int, deleted_by_id: int, s: AsyncSession =
     )
     await s.execute(stmt)
     await s.commit()
-    await s.close()
+    await task_catalog.invalidate()
 
 
-@with_session(override_name='session')
 async def get_active_tasks_page(user_id: int,
                                 page: int = 1,
                                 task_type: TaskType = None,
                                 limit: int = 1,
-                                session: AsyncSession = None
-                                ):
-    # Aliasing TaskDoneHistory to join it twice for different purposes
-    user_done_history = aliased(TaskDoneHistory)
-
-    # Subquery to count the number of times each DONE_BASED task has been completed
-    done_subquery = (
-        select(
-            TaskDoneHistory.task_id,
-            func.count(TaskDoneHistory.id).label('done_count')
-        )
-        .group_by(TaskDoneHistory.task_id)
-        .subquery()
-    )
-
-    # Subquery to check if the user has completed each task
-    user_done_subquery = (
-        select(
-            user_done_history.task_id.label('task_id'),
-            func.count(user_done_history.id).label('user_done_count')
-        )
-        .filter(user_done_history.user_id.__eq__(user_id))
-        .group_by(user_done_history.task_id)
-        .subquery()
-    )
-
-    # Build the main query for active tasks
-    stmt = (
-        select(Task)
-        .outerjoin(done_subquery, Task.id == done_subquery.c.task_id)
-        .outerjoin(user_done_subquery, Task.id == user_done_subquery.c.task_id)
-        .filter(
-            and_(
-                Task.deleted_at.is_(None),
-                or_(
-                    # Time-based tasks: Not expired or no expiration time set
-                    and_(
-                        Task.type == TaskType.TIME_BASED,
-                        or_(Task.expires_at.is_(None), Task.expires_at > now(native=True))
-                    ),
-                    # Subscription-based tasks: done_limit is greater than the count of completed tasks
-                    and_(
-                        Task.type == TaskType.DONE_BASED,
-                        or_(Task.done_limit.is_(None), Task.done_limit > coalesce(done_subquery.c.done_count, 0))
-                    ),
-                    # Pool-based tasks: coin_pool is greater than the sum of distributed rewards
-                    and_(
-                        Task.type == TaskType.POOL_BASED,
-                        or_(Task.coin_pool.is_(None), Task.coin_pool > coalesce(done_subquery.c.done_count, 0))
-                    ),
-                    Task.type == TaskType.BONUS
-                ),
-                or_(
-                    # Tasks not done by user
-                    user_done_subquery.c.user_done_count.is_(None),
-                    user_done_subquery.c.user_done_count == 0
-                )
-            )
-        ).order_by(Task.created_at.desc())  # Order by created_at from new to old
-    )
-
-    if task_type is not None:
-        stmt = stmt.filter(Task.type.__eq__(task_type))
-
-    # Get the total count of matching tasks asynchronously
-    count_stmt = stmt.with_only_columns(func.count()).order_by(None)
-    total_tasks = (await session.execute(count_stmt)).scalar()
-
-    # Calculate offset based on the current page number
-    offset = (page - 1) * limit
-
-    stmt = stmt.limit(limit).offset(offset)
-    result = await session.execute(stmt)
-    tasks = list(result.scalars().all())
+                                cursor: str = None
+                                ) -> Pagination[ActiveTask]:
+    """
+    A page of the tasks `user_id` can still do, from new to old, filtered from the in-process `task_catalog`.
+
+    Without a `cursor` the page is found by its number; with one (a `next_cursor`/`prev_cursor`
+    of a previous page) it starts next to the cursor's task, so pages don't shift when tasks are
+    added or done in between. `page` is then only reported back as the current page.
+
+    :raises ValueError: on a malformed cursor
+    """
+    done_task_ids = await get_done_task_ids(user_id)
+    tasks = [task for task in await task_catalog.tasks()
+             if task.id not in done_task_ids and (task_type is None or task.type == task_type) and task.is_available]
+
+    position = Cursor.decode(cursor) if cursor is not None else None
+    if position is None:
+        start = (max(page, 1) - 1) * limit
+        end = start + limit
+    else:
+        # the catalog is ordered by (created_at, id) from new to old
+        key = (position.created_at, position.id)
+        if position.backward:
+            end = next((i for i, task in enumerate(tasks) if (task.created_at, task.id) <= key), len(tasks))
+            start = max(end - limit, 0)
+        else:
+            start = next((i for i, task in enumerate(tasks) if (task.created_at, task.id) < key), len(tasks))
+            end = start + limit
+    items = tasks[start:end]
 
     # Calculate pagination details
+    total_tasks = len(tasks)
     total_pages = (total_tasks + limit - 1) // limit if limit > 0 else 1
-    current_page = min(max(page, 1), total_pages)  # Ensure current_page is within the valid range
+    current_page = max(page, 1)
+    if position is None:
+        current_page = min(current_page, total_pages)  # Ensure current_page is within the valid range
 
     return Pagination(
-        items=tasks,
+        items=items,
         total_items=total_tasks,
         current_page=current_page,
-        total_pages=total_pages
-    )
-
-
-@with_session(override_name='session')
-async def get_active_task(user_id: int, task_id: int, session: AsyncSession = None):
-    # Aliasing TaskDoneHistory to join it twice for different purposes
-    user_done_history = aliased(TaskDoneHistory)
-
-    # Subquery to count the number of times each DONE_BASED task has been completed
-    done_subquery = (
-        select(
-            TaskDoneHistory.task_id,
-            func.count(TaskDoneHistory.id).label('done_count')
-        )
-        .group_by(TaskDoneHistory.task_id)
-        .subquery()
+        total_pages=total_pages,
+        next_cursor=Cursor(items[-1].created_at, items[-1].id).encode() if items and end < total_tasks else None,
+        prev_cursor=Cursor(items[0].created_at, items[0].id, backward=True).encode() if items and start > 0 else None
     )
 
-    # Subquery to check if the user has completed each task
-    user_done_subquery = (
-        select(
-            user_done_history.task_id.label('task_id'),
-            func.count(user_done_history.id).label('user_done_count')
-        )
-        .filter(user_done_history.user_id.__eq__(user_id))
-        .group_by(user_done_history.task_id)
-        .subquery()
-    )
 
-    # Build the main query for active tasks
-    stmt = (
-        select(Task)
-        .outerjoin(done_subquery, Task.id == done_subquery.c.task_id)
-        .outerjoin(user_done_subquery, Task.id == user_done_subquery.c.task_id)
-        .filter(
-            and_(
-                Task.deleted_at.is_(None),
-                Task.id.__eq__(task_id),
-                or_(
-                    # Time-based tasks: Not expired or no expiration time set
-                    and_(
-                        Task.type == TaskType.TIME_BASED,
-                        or_(Task.expires_at.is_(None), Task.expires_at > now(native=True))
-                    ),
-                    # Subscription-based tasks: done_limit is greater than the count of completed tasks
-                    and_(
-                        Task.type == TaskType.DONE_BASED,
-                        or_(Task.done_limit.is_(None), Task.done_limit > coalesce(done_subquery.c.done_count, 0))
-                    ),
-                    # Pool-based tasks: coin_pool is greater than the sum of distributed rewards
-                    and_(
-                        Task.type == TaskType.POOL_BASED,
-                        or_(Task.coin_pool.is_(None), Task.coin_pool > coalesce(done_subquery.c.done_count, 0))
-                    ),
-                    Task.type == TaskType.BONUS
-                ),
-                or_(
-                    # Tasks not done by user
-                    user_done_subquery.c.user_done_count.is_(None),
-                    user_done_subquery.c.user_done_count == 0
-                )
-            )
-        ).order_by(Task.created_at.desc())  # Order by created_at from new to old
-    )
-
-    result = await session.execute(stmt)
-    active_task = result.scalars().one_or_none()
-
-    return active_task
+async def get_active_task(user_id: int, task_id: int) -> Union[ActiveTask, None]:
+    if task_id in await get_done_task_ids(user_id):
+        return None
+    task = await task_catalog.get(task_id)
+    return task if task is not None and task.is_available else None
 
 
-@with_session
+@with_session(replica=True)
 async def get_tasks_statistics(s: AsyncSession = None):
     stmt = (
-        select(
-            Task.id,
-            func.count(TaskDoneHistory.id).label('done_count'),
-        )
-        .join(TaskDoneHistory, TaskDoneHistory.task_id == Task.id)
+        select(Task.id, Task.done_count)
+        .where(Task.done_count > 0)
         .where(Task.expires_at > func.now())
         .where(Task.deleted_at.is_(None))
-        .group_by(Task.id)
         .order_by(Task.id.desc())
     )
 
@@ -635,33 +599,20 @@ async def get_tasks_statistics(s: AsyncSession = None):
     return result.all()
 
 
-@with_session
+@with_session(readonly=True)
 async def get_task_statistic(id_: int, s: AsyncSession = None):
     stmt = (
-        select(
-            Task,
-            func.count(TaskDoneHistory.id).label('done_count')
-        )
-        .join(TaskDoneHistory, TaskDoneHistory.task_id == Task.id)
+        select(Task, Task.done_count)
         .where(Task.id.__eq__(id_))
-        .group_by(Task.id)
+        .where(Task.done_count > 0)
     )
 
     result = await s.execute(stmt)
     return result.one_or_none()
 
 
-@with_session
-async def check_task_is_done(task_id: int, user_id: int, s: AsyncSession = None) -> bool:
-    stmt = (
-        select(TaskDoneHistory)
-        .where(and_(TaskDoneHistory.task_id.__eq__(task_id),
-                    TaskDoneHistory.user_id.__eq__(user_id)))
-        .exists()
-        .select()
-    )
-    result = await s.execute(stmt)
-    return result.scalar()
+async def check_task_is_done(task_id: int, user_id: int) -> bool:
+    return task_id in await get_done_task_ids(user_id)
 
 
 @with_session
@@ -673,15 +624,15 @@ async def save_activity_statistic(user_id: int, context: UserActivityContext, s:
     s.add(statistic)
 
 
-@with_session
+@with_session(readonly=True)
 async def get_user_activity_statistic(s: AsyncSession = None):
     stmt = select(UserActivityStatistic).limit(1)
     result = await s.execute(stmt)
     return result.scalar()
 
 
-@cache.cacheable(ttl="10m")
-@with_session
+@cache.cacheable(ttl="10m", l1_ttl="5m")
+@with_session(readonly=True)
 async def is_client_token_valid(id_: str, type_: CustomClientTokenType, s: AsyncSession = None) -> bool:
     stmt = (select(CustomClientToken)
             .where(and_(CustomClientToken.deleted_at.is_(None),
@@ -694,7 +645,7 @@ async def is_client_token_valid(id_: str, type_: CustomClientTokenType, s: Async
     return result.scalar()
 
 
-@with_session
+@with_session(readonly=True)
 async def get_active_events(s: AsyncSession = None) -> list[EventBonus]:
     current_time = now()
 
@@ -710,8 +661,8 @@ async def get_active_events(s: AsyncSession = None) -> list[EventBonus]:
     return list(active_events)
 
 
-@cache.cacheable(ttl="10m", save_as_blob=True)
-@with_session
+@cache.cacheable(ttl="10m")
+@with_session(readonly=True)
 async def get_active_event_by_id(id_: int, s: AsyncSession = None) -> EventBonus | None:
     current_time = now()
 
@@ -728,7 +679,12 @@ async def get_active_event_by_id(id_: int, s: AsyncSession = None) -> EventBonus
     return active_events
 
 
-@with_session
+@cache.warmup
+async def warm_up_active_events() -> None:
+    await asyncio.gather(*(get_active_event_by_id(event.id) for event in await get_active_events()))
+
+
+@with_session(readonly=True)
 async def get_total_amount_by_user_event(user_id: int, event_bonus_id: int, s: AsyncSession = None) -> int:
     result = await s.execute(
         select(func.sum(EventBonusActivation.amount))
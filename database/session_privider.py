@@ -1,7 +1,16 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db_session
+from database import get_db_session, get_db_readonly_session, get_db_replica_session
+from database.pools import PoolClass
 
 
-def get_session() -> AsyncSession:
-    return get_db_session()
+def get_session(pool_class: PoolClass | None = None) -> AsyncSession:
+    return get_db_session(pool_class)
+
+
+def get_readonly_session(pool_class: PoolClass | None = None) -> AsyncSession:
+    return get_db_readonly_session(pool_class)
+
+
+def get_replica_session() -> AsyncSession:
+    return get_db_replica_session()
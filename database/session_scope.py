@@ -0,0 +1,100 @@
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.instrumentation import query_unit
+from database.pools import PoolClass
+from database.session_privider import get_session, get_readonly_session
+
+
+class _SessionScope:
+    def __init__(self):
+        self.task = asyncio.current_task()
+        self.session: AsyncSession | None = None
+        self.readonly_session: AsyncSession | None = None
+
+
+_current_scope: ContextVar[_SessionScope | None] = ContextVar('session_scope', default=None)
+
+
+def _own_scope() -> _SessionScope | None:
+    scope = _current_scope.get()
+    # tasks spawned inside the scope inherit the context, but must not use the session concurrently
+    if scope is None or scope.task is not asyncio.current_task():
+        return None
+    return scope
+
+
+def get_scoped_session(readonly: bool = False) -> AsyncSession | None:
+    """
+    The session of the enclosing `session_scope`, opened on first use; None outside a scope.
+
+    `readonly` calls get the scope's autocommit session, without BEGIN/COMMIT round trips,
+    unless the scope's transaction has begun: they must see what it wrote.
+    """
+    scope = _own_scope()
+    if scope is None:
+        return None
+    if readonly and (scope.session is None or not scope.session.in_transaction()):
+        if scope.readonly_session is None:
+            scope.readonly_session = get_readonly_session(PoolClass.INTERACTIVE)
+        return scope.readonly_session
+    if scope.session is None:
+        scope.session = get_session(PoolClass.INTERACTIVE)
+    return scope.session
+
+
+async def release_scoped_connection() -> None:
+    """
+    Commits what the enclosing `session_scope` did so far and returns its connection to the pool,
+    for a handler about to wait on something slow, like Telegram or another service. The next
+    `with_session` call checks one out again. Does nothing outside a scope.
+    """
+    scope = _own_scope()
+    if scope is None:
+        return
+    if scope.session is not None and scope.session.in_transaction():
+        await scope.session.commit()
+    if scope.readonly_session is not None:
+        await scope.readonly_session.close()
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[None]:
+    """
+    Unit of work: every interactive `with_session` call inside shares one session (and one connection),
+    which is committed once when the scope exits and rolled back if it exits with an error.
+    Readonly calls share an autocommit one until the first write, see `get_scoped_session`.
+    """
+    if _own_scope() is not None:
+        yield
+        return
+
+    scope = _SessionScope()
+    token = _current_scope.set(scope)
+    try:
+        yield
+        if scope.session is not None:
+            await scope.session.commit()
+    except BaseException:
+        if scope.session is not None:
+            await scope.session.rollback()
+        raise
+    finally:
+        if scope.session is not None:
+            await scope.session.close()
+        if scope.readonly_session is not None:
+            await scope.readonly_session.close()
+        _current_scope.reset(token)
+
+
+async def session_scope_dependency() -> AsyncIterator[None]:
+    """
+    FastAPI dependency running the request inside a `session_scope`, counting its statements.
+    """
+    with query_unit('request'):
+        async with session_scope():
+            yield
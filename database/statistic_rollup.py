@@ -0,0 +1,175 @@
+import asyncio
+import logging
+from datetime import date, timedelta
+
+from redis import RedisError
+from sqlalchemy import select, update, func, and_, cast, Date, bindparam
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache.circuit_breaker import redis_breaker, log_redis_error
+from variables import redis
+from .decorators import with_session
+from .entities import User, UserActivityStatistic, DailyUserStatistic, DailyCallbackStatistic, now
+from .pools import PoolClass
+from .repository import JOIN_STATISTIC_DAYS
+
+logger = logging.getLogger(__name__)
+
+# activities are saved in the background, so rows of a day may still arrive shortly after it ended
+LATE_ROWS = timedelta(minutes=5)
+
+STATISTIC_ROLLUP_LOCK_KEY = "statistic_rollup:lock"
+
+
+@with_session(readonly=True, pool=PoolClass.BACKGROUND)
+async def get_statistic_rollup_start(s: AsyncSession = None) -> date:
+    """
+    The first day whose rollup is not final: the day after the last one rolled up after it ended,
+    or the first day of the history on the first run.
+    """
+    last_final = await s.scalar(
+        select(func.max(DailyUserStatistic.date))
+        .where(DailyUserStatistic.rolled_up_at >= DailyUserStatistic.date + (timedelta(days=1) + LATE_ROWS))
+    )
+    if last_final is not None:
+        return last_final + timedelta(days=1)
+    first = await s.scalar(select(func.min(func.date(User.created_at))))
+    return first if first is not None else await s.scalar(select(func.current_date()))
+
+
+@with_session(readonly=True, pool=PoolClass.BACKGROUND)
+async def get_shown_joins_start(s: AsyncSession = None) -> date | None:
+    """
+    The first of the days shown by the incoming statistics, None before the first rollup.
+    """
+    shown = (
+        select(DailyUserStatistic.date)
+        .where(DailyUserStatistic.joined > 0)
+        .order_by(DailyUserStatistic.date.desc())
+        .limit(JOIN_STATISTIC_DAYS)
+        .subquery()
+    )
+    return await s.scalar(select(func.min(shown.c.date)))
+
+
+@with_session(pool=PoolClass.BACKGROUND)
+async def roll_up_statistic_days(since: date, clean_since: date | None = None, s: AsyncSession = None) -> int:
+    """
+    Recomputes the rollups of the days from `since` to today from the rows of those days only,
+    and the clean joins of the final days from `clean_since` on: users blocked or deleted later
+    leave the clean joins of the day they joined, which is final by then.
+
+    :return: number of rolled up days
+    """
+    today = await s.scalar(select(func.current_date()))
+    rolled_up_at = now()
+    clean_since = since if clean_since is None else min(clean_since, since)
+    start = cast(since, Date)  # compared with the timestamps, so their indexes are used
+
+    joined_date = func.date(User.created_at)
+    joins = {day: (joined, clean_joined) for day, joined, clean_joined in await s.execute(
+        select(joined_date, func.count(), func.count().filter(and_(User.blocked.is_(False), User.deleted_at.is_(None))))
+        .where(User.created_at >= cast(clean_since, Date))
+        .group_by(joined_date)
+    )}
+
+    activity_date = func.date(UserActivityStatistic.datetime_)
+    active_users = dict((await s.execute(
+        select(activity_date, func.count(func.distinct(UserActivityStatistic.user_id)))
+        .where(UserActivityStatistic.datetime_ >= start)
+        .group_by(activity_date)
+    )).all())
+
+    prefix = func.coalesce(UserActivityStatistic.context['callback_query_prefix'].astext, '')
+    callbacks = (await s.execute(
+        select(activity_date, prefix, func.count(), func.count(func.distinct(UserActivityStatistic.user_id)))
+        .where(UserActivityStatistic.datetime_ >= start)
+        .group_by(activity_date, prefix)
+    )).all()
+
+    days = [since + timedelta(days=i) for i in range((today - since).days + 1)]
+    stmt = insert(DailyUserStatistic)
+    await s.execute(
+        stmt.on_conflict_do_update(index_elements=[DailyUserStatistic.date],
+                                   set_={c: stmt.excluded[c] for c in ('joined', 'clean_joined', 'active_users', 'rolled_up_at')}),
+        [{'date': day, 'joined': joins.get(day, (0, 0))[0], 'clean_joined': joins.get(day, (0, 0))[1],
+          'active_users': active_users.get(day, 0), 'rolled_up_at': rolled_up_at} for day in days]
+    )
+    final_days = [clean_since + timedelta(days=i) for i in range((since - clean_since).days)]
+    if final_days:
+        await s.execute(
+            update(DailyUserStatistic.__table__)
+            .where(DailyUserStatistic.__table__.c.date == bindparam('day'))
+            .values(clean_joined=bindparam('clean_joined')),
+            [{'day': day, 'clean_joined': joins.get(day, (0, 0))[1]} for day in final_days]
+        )
+    if callbacks:
+        stmt = insert(DailyCallbackStatistic)
+        await s.execute(
+            stmt.on_conflict_do_update(constraint='daily_callback_statistics_pk',
+                                       set_={c: stmt.excluded[c] for c in ('activities', 'active_users')}),
+            [{'date': day, 'callback_query_prefix': prefix_, 'activities': activities, 'active_users': users}
+             for day, prefix_, activities, users in callbacks]
+        )
+    await s.commit()
+    return len(days)
+
+
+async def roll_up_statistics() -> int:
+    """
+    Brings the daily rollups up to date: the open day, and the days that ended since the last run.
+
+    :return: number of rolled up days
+    """
+    since = await get_statistic_rollup_start()
+    days = await roll_up_statistic_days(since, await get_shown_joins_start())
+    if days > 2:
+        logger.info(f"Rolled up the statistics of {days} days since {since}")
+    return days
+
+
+async def _acquire_rollup_lease(ttl: float) -> bool:
+    """
+    Whether this worker runs the rollup of the current interval: the first to ask takes the lease,
+    which expires instead of being released, so the workers together roll up once per interval.
+    The rollups are upserts, so without Redis every worker runs them.
+    """
+    try:
+        return bool(await redis_breaker.call(lambda: redis.set(STATISTIC_ROLLUP_LOCK_KEY, 1, nx=True, ex=max(int(ttl), 1))))
+    except RedisError as e:
+        log_redis_error(logger, "Redis error while acquiring the statistic rollup lease, rolling up anyway", e)
+        return True
+
+
+class StatisticRollupJob:
+    """
+    Runs `roll_up_statistics` every `interval` seconds, starting right away, on one worker at a time.
+    """
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+
+    def run(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                if await _acquire_rollup_lease(self._interval):
+                    await roll_up_statistics()
+            except Exception as e:
+                logger.error(f"Statistic rollup failed: {e}")
+            await asyncio.sleep(self._interval)
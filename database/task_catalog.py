@@ -0,0 +1,196 @@
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Iterable
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from pydantic import BaseModel, ConfigDict
+from redis import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import cache
+from cache.circuit_breaker import redis_breaker, log_redis_error
+from cache.single_flight import single_flight
+from keyboard_markup.json_markup import deserialize_inline_keyboard_markup
+from metrics import registry
+from utils.timer_wheel import TimerWheel
+from variables import redis
+from .decorators import with_session
+from .entities import Task, TaskType, now
+from .enums import CurrencyType
+from .json_classes import BotApiConfig
+
+logger = logging.getLogger(__name__)
+
+TASK_CATALOG_VERSION_KEY = "task_catalog:version"
+# how stale the snapshot may be after another worker changed the tasks
+TASK_CATALOG_CHECK_INTERVAL = float(os.getenv('TASK_CATALOG_CHECK_INTERVAL', 1))
+# completions change the counters of limited tasks without a version bump, until one uses a task up
+TASK_CATALOG_MAX_AGE = float(os.getenv('TASK_CATALOG_MAX_AGE', 60))
+
+catalog_rebuilds = registry.counter("task_catalog_rebuilds_total", "Rebuilds of the in-process active task snapshot.")
+catalog_size = registry.gauge("task_catalog_tasks", "Tasks in the in-process active task snapshot.")
+
+
+class ActiveTask(BaseModel):
+    """
+    Immutable copy of a `Task` row kept in the catalog snapshot, with the markup already deserialized.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    id: int
+    type: TaskType
+    title: str | None
+    text: str | None
+    markup: dict | None
+    keyboard_rows: tuple[tuple[InlineKeyboardButton, ...], ...]
+    require_subscriptions: tuple[Any, ...]
+    api_configs: tuple[BotApiConfig, ...]
+    coin_type: CurrencyType
+    done_limit: int | None
+    coin_pool: int | None
+    done_reward: int | None
+    done_count: int
+    rewarded_amount: int
+    created_at: datetime
+    expires_at: datetime | None
+    trace_uuid: uuid.UUID
+
+    @classmethod
+    def of(cls, task: Task) -> 'ActiveTask':
+        keyboard = deserialize_inline_keyboard_markup(task.markup)
+        return cls(id=task.id, type=task.type, title=task.title, text=task.text, markup=task.markup,
+                   keyboard_rows=tuple(tuple(row) for row in keyboard.inline_keyboard),
+                   require_subscriptions=tuple(task.require_subscriptions or ()), api_configs=tuple(task.api_configs or ()),
+                   coin_type=task.coin_type, done_limit=task.done_limit, coin_pool=task.coin_pool, done_reward=task.done_reward,
+                   done_count=task.done_count, rewarded_amount=task.rewarded_amount,
+                   created_at=task.created_at, expires_at=task.expires_at, trace_uuid=task.trace_uuid)
+
+    @property
+    def is_available(self) -> bool:
+        # same as the predicates of `get_active_task_by_id`; the timer wheel only evicts expired tasks,
+        # which stay in the snapshot until its next tick
+        if self.type == TaskType.DONE_BASED:
+            return self.done_limit is None or self.done_limit > self.done_count
+        if self.type == TaskType.POOL_BASED:
+            return self.coin_pool is None or self.coin_pool - self.rewarded_amount >= (self.done_reward or 0)
+        return not _is_expired(self, now())
+
+    def keyboard(self) -> InlineKeyboardMarkup:
+        # a fresh markup every time: the keyboard builders append their rows to the source markup
+        return InlineKeyboardMarkup.model_construct(inline_keyboard=[list(row) for row in self.keyboard_rows])
+
+
+def _is_expired(task: Task | ActiveTask, at: datetime) -> bool:
+    return task.type == TaskType.TIME_BASED and task.expires_at is not None and task.expires_at <= at
+
+
+@with_session(readonly=True)
+async def load_catalog_tasks(s: AsyncSession = None) -> list[Task]:
+    stmt = select(Task).where(Task.deleted_at.is_(None))
+    return list((await s.execute(stmt)).scalars().all())
+
+
+class TaskCatalog:
+    """
+    In-process snapshot of the tasks that are not deleted or expired, ordered from new to old.
+
+    Workers share a version in Redis: `invalidate` bumps it, and every worker rebuilds its snapshot
+    the next time it reads the catalog after noticing the bump (checked at most every
+    `TASK_CATALOG_CHECK_INTERVAL` seconds). `TIME_BASED` tasks leave the snapshot at `expires_at`
+    through a timer wheel, without a rebuild.
+    """
+
+    def __init__(self):
+        self._tasks: tuple[ActiveTask, ...] = ()
+        self._by_id: dict[int, ActiveTask] = {}
+        self._version: int | None = None
+        self._built_at = 0.0
+        self._checked_at = 0.0
+        self._wheel = TimerWheel()
+
+    def run(self) -> None:
+        self._wheel.run()
+
+    async def stop(self) -> None:
+        await self._wheel.stop()
+
+    async def tasks(self) -> tuple[ActiveTask, ...]:
+        await self._refresh()
+        return self._tasks
+
+    async def get(self, task_id: int) -> ActiveTask | None:
+        await self._refresh()
+        return self._by_id.get(task_id)
+
+    async def invalidate(self) -> None:
+        """
+        Makes every worker rebuild its snapshot, call after changing tasks.
+        """
+        self._version = None
+        try:
+            await redis_breaker.call(lambda: redis.incr(TASK_CATALOG_VERSION_KEY))
+        except RedisError as e:
+            log_redis_error(logger, "Redis error while bumping the task catalog version, other workers catch up within the max age", e)
+
+    def replace(self, tasks: Iterable[Task]) -> None:
+        """
+        Installs a snapshot of `tasks`, scheduling the expiry of the time based ones.
+        """
+        at = now()
+        snapshot = sorted((ActiveTask.of(task) for task in tasks if not _is_expired(task, at)),
+                          key=lambda task: (task.created_at, task.id), reverse=True)
+        for task_id in self._by_id:
+            self._wheel.cancel(task_id)
+        self._tasks = tuple(snapshot)
+        self._by_id = {task.id: task for task in snapshot}
+        for task in snapshot:
+            if task.type == TaskType.TIME_BASED and task.expires_at is not None:
+                self._wheel.schedule(task.id, task.expires_at.timestamp(), self._expire)
+        catalog_size.labels().set(len(snapshot))
+
+    def _expire(self, task_id: int) -> None:
+        task = self._by_id.pop(task_id, None)
+        if task is not None:
+            logger.info(f"Task {task_id} expired, removing it from the catalog")
+            self._tasks = tuple(t for t in self._tasks if t.id != task_id)
+            catalog_size.labels().set(len(self._tasks))
+
+    async def _refresh(self) -> None:
+        started = time.monotonic()
+        if started - self._built_at > TASK_CATALOG_MAX_AGE:
+            self._version = None
+        elif self._version is not None and started - self._checked_at < TASK_CATALOG_CHECK_INTERVAL:
+            return
+        await single_flight(TASK_CATALOG_VERSION_KEY, self._check)
+
+    async def _check(self) -> None:
+        try:
+            raw_version = await redis_breaker.call(lambda: redis.get(TASK_CATALOG_VERSION_KEY))
+        except RedisError as e:
+            # without the version only the max age refreshes the snapshot
+            log_redis_error(logger, "Redis error while reading the task catalog version", e)
+            version = self._version if self._version is not None else -1
+        else:
+            version = int(raw_version) if raw_version else 0
+        self._checked_at = time.monotonic()
+        if version == self._version:
+            return
+
+        started = time.monotonic()
+        self.replace(await load_catalog_tasks())
+        self._version = version
+        self._built_at = started
+        catalog_rebuilds.labels().inc()
+        logger.info(f"Rebuilt task catalog version {version} with {len(self._tasks)} tasks in {(time.monotonic() - started) * 1000:.0f}ms")
+
+
+task_catalog = TaskCatalog()
+
+
+@cache.warmup
+async def warm_up_task_catalog() -> None:
+    await task_catalog.tasks()
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from sqlalchemy import select, update, func, or_, and_, not_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.functions import coalesce
+
+from metrics import registry
+from .decorators import with_session
+from .entities import Task, TaskDoneHistory, TaskDoneHistoryDuplicate
+from .pools import PoolClass
+from .repository import any_of_ids, unlimited_task
+
+logger = logging.getLogger(__name__)
+
+# an expired task can still get the completions that were being verified when it expired
+UNLIMITED_COUNT_GRACE = timedelta(hours=1)
+
+repaired_counters = registry.counter("task_counters_repaired_total", "Tasks whose completion counters disagreed with tasks_done_history.")
+
+
+def _completions():
+    # the archived duplicates were paid too, see `TaskDoneHistoryDuplicate`
+    return union_all(
+        select(TaskDoneHistory.task_id, TaskDoneHistory.reward),
+        select(TaskDoneHistoryDuplicate.task_id, TaskDoneHistoryDuplicate.reward),
+    ).subquery()
+
+
+def _counted_later():
+    # unlimited tasks still running, whose counters `count_unlimited_task_completions` keeps
+    return and_(
+        unlimited_task(),
+        Task.deleted_at.is_(None),
+        or_(Task.expires_at.is_(None), Task.expires_at > func.now() - UNLIMITED_COUNT_GRACE),
+    )
+
+
+@with_session(readonly=True, pool=PoolClass.BACKGROUND)
+async def get_tasks_with_counter_drift(s: AsyncSession = None) -> list[int]:
+    completions = _completions()
+    counted = (
+        select(
+            completions.c.task_id,
+            func.count().label('done_count'),
+            coalesce(func.sum(completions.c.reward), 0).label('rewarded_amount')
+        )
+        .group_by(completions.c.task_id)
+        .subquery()
+    )
+    stmt = (
+        select(Task.id)
+        .outerjoin(counted, Task.id == counted.c.task_id)
+        .where(not_(_counted_later()))
+        .where(or_(Task.done_count != coalesce(counted.c.done_count, 0),
+                   Task.rewarded_amount != coalesce(counted.c.rewarded_amount, 0)))
+    )
+    return list((await s.execute(stmt)).scalars())
+
+
+@with_session(pool=PoolClass.BACKGROUND)
+async def recount_task_counters(task_ids: list[int], s: AsyncSession = None) -> None:
+    # lock the tasks first: `add_task_done` calls wait, and the recount sees every completion committed before
+    await s.execute(select(Task.id).where(Task.id.__eq__(any_of_ids(task_ids))).with_for_update())
+    completions = _completions()
+    done_count = select(func.count()).select_from(completions).where(completions.c.task_id.__eq__(Task.id)).scalar_subquery()
+    rewarded_amount = select(coalesce(func.sum(completions.c.reward), 0)).where(completions.c.task_id.__eq__(Task.id)).scalar_subquery()
+    await s.execute(
+        update(Task)
+        .where(Task.id.__eq__(any_of_ids(task_ids)))
+        .values(done_count=done_count, rewarded_amount=rewarded_amount)
+        .execution_options(synchronize_session=False)
+    )
+
+
+@with_session(pool=PoolClass.BACKGROUND)
+async def count_unlimited_task_completions(s: AsyncSession = None) -> int:
+    """
+    Brings the counters of the unlimited tasks still running up to date: `add_task_done` leaves them
+    to this, so the completing users don't take turns on the task row.
+
+    :return: number of updated tasks
+    """
+    completions = _completions()
+    done_count = select(func.count()).select_from(completions).where(completions.c.task_id.__eq__(Task.id)).scalar_subquery()
+    rewarded_amount = select(coalesce(func.sum(completions.c.reward), 0)).where(completions.c.task_id.__eq__(Task.id)).scalar_subquery()
+    result = await s.execute(
+        update(Task)
+        .where(_counted_later())
+        .where(or_(Task.done_count != done_count, Task.rewarded_amount != rewarded_amount))
+        .values(done_count=done_count, rewarded_amount=rewarded_amount)
+        .execution_options(synchronize_session=False)
+    )
+    await s.commit()
+    return result.rowcount
+
+
+async def reconcile_task_counters() -> list[int]:
+    """
+    Verifies `tasks.done_count`/`rewarded_amount` against the completions and recounts the tasks that drifted.
+
+    :return: ids of the recounted tasks
+    """
+    task_ids = await get_tasks_with_counter_drift()
+    if task_ids:
+        logger.warning(f"Task completion counters drifted from tasks_done_history, recounting tasks: {task_ids}")
+        await recount_task_counters(task_ids)
+        repaired_counters.labels().inc(len(task_ids))
+    return task_ids
+
+
+class UnlimitedTaskCounter:
+    """
+    Runs `count_unlimited_task_completions` every `interval` seconds.
+    """
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+
+    def run(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await count_unlimited_task_completions()
+            except Exception as e:
+                logger.error(f"Counting unlimited task completions failed: {e}")
+
+
+class TaskCounterReconciler:
+    """
+    Runs `reconcile_task_counters` every `interval` seconds.
+    """
+
+    def __init__(self, interval: float):
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+
+    def run(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            try:
+                await reconcile_task_counters()
+            except Exception as e:
+                logger.error(f"Task counter reconciliation failed: {e}")
@@ -0,0 +1,126 @@
+import logging
+import os
+
+from redis import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache.circuit_breaker import redis_breaker, log_redis_error
+from variables import redis
+from .decorators import with_session
+from .entities import Task, TaskType
+
+logger = logging.getLogger(__name__)
+
+# the counter is rebuilt from the task row after this long, which also returns slots leaked by crashed workers
+TASK_SLOTS_TTL = int(os.getenv('TASK_SLOTS_TTL', 600))
+
+# -2: there is no counter yet, see `_seed_script`
+_reserve_script = redis.register_script("""
+local left = redis.call('get', KEYS[1])
+if not left then
+    return -2
+end
+if tonumber(left) <= 0 then
+    return -1
+end
+return redis.call('decr', KEYS[1])
+""")
+
+# NX: a counter seeded by another worker meanwhile already has claims taken off
+_seed_script = redis.register_script("""
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2], 'NX')
+if tonumber(redis.call('get', KEYS[1])) <= 0 then
+    return -1
+end
+return redis.call('decr', KEYS[1])
+""")
+
+_release_script = redis.register_script("""
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('incr', KEYS[1])
+end
+return 0
+""")
+
+
+def task_slots_key(task_id: int) -> str:
+    return f"task:slots:{task_id}"
+
+
+@with_session(readonly=True)
+async def load_task_counters(task_id: int, s: AsyncSession = None):
+    stmt = (
+        select(Task.type, Task.done_limit, Task.done_count, Task.coin_pool, Task.rewarded_amount, Task.done_reward)
+        .where(Task.id.__eq__(task_id))
+    )
+    return (await s.execute(stmt)).one_or_none()
+
+
+def remaining_slots(task: Task) -> int | None:
+    """
+    Completions `task` can still pay for according to its counters, None if unlimited.
+    """
+    if task.type == TaskType.DONE_BASED and task.done_limit is not None:
+        return max(task.done_limit - task.done_count, 0)
+    if task.type == TaskType.POOL_BASED and task.coin_pool is not None and task.done_reward:
+        return max((task.coin_pool - task.rewarded_amount) // task.done_reward, 0)
+    return None
+
+
+class TaskSlot:
+    """
+    A claim on one completion of a limited task, taken with one atomic decrement in Redis:
+    once the task is used up, completing users are turned away before they verify anything
+    or reach the task row, which an admitted completion still locks until it commits
+    (see `add_task_done`). The counter is seeded from the task row read when it is missing.
+
+        async with TaskSlot(task) as slot:
+            if not slot.reserved:
+                ...  # the task is used up
+            ...  # verify, `add_task_done`, commit
+            slot.confirm()
+
+    A slot that is not confirmed is released when the block exits, also on errors.
+    `add_task_done` re-checks the limit in the database, so a Redis outage (every claim
+    succeeds then) or a counter rebuilt while claims were in flight can't overshoot it.
+    """
+
+    def __init__(self, task: Task):
+        self._task = task
+        self._key = task_slots_key(task.id)
+        self._claimed = False
+        self._confirmed = False
+        self.reserved = False
+
+    async def __aenter__(self) -> 'TaskSlot':
+        if remaining_slots(self._task) is None:
+            self.reserved = True
+            return self
+        try:
+            left = await redis_breaker.call(lambda: _reserve_script(keys=[self._key]))
+            if left == -2:
+                # `self._task` may be a catalog snapshot, the counter starts from the current counts
+                counters = await load_task_counters(self._task.id)
+                remaining = remaining_slots(counters) if counters is not None else 0
+                if remaining is None:
+                    self.reserved = True
+                    return self
+                left = await redis_breaker.call(lambda: _seed_script(keys=[self._key], args=[remaining, TASK_SLOTS_TTL]))
+        except RedisError as e:
+            log_redis_error(logger, f"Redis error while reserving a slot of task {self._task.id}, relying on the database check", e)
+            self.reserved = True
+            return self
+        self._claimed = self.reserved = left >= 0
+        return self
+
+    def confirm(self) -> None:
+        self._confirmed = True
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if not self._claimed or self._confirmed:
+            return
+        try:
+            await redis_breaker.call(lambda: _release_script(keys=[self._key]))
+        except RedisError as e:
+            log_redis_error(logger, f"Redis error while releasing a slot of task {self._task.id}", e)
@@ -0,0 +1,176 @@
+import logging
+import time
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict
+from redis import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache.circuit_breaker import redis_breaker, log_redis_error
+from cache.local_cache import local_cache, MISSING
+from cache.metrics import CacheMetrics
+from cache.single_flight import single_flight
+from cache.tags import tag_version_key, parse_versions
+from lang.lang_based_provider import Lang
+from variables import redis
+from .decorators import with_session
+from .entities import User
+
+logger = logging.getLogger(__name__)
+
+USER_CONTEXT_TTL = 600
+USER_CONTEXT_L1_TTL = 60
+
+_metrics = CacheMetrics("get_user_context")
+
+
+class UserContext(BaseModel):
+    """
+    Everything the filters and middlewares of an update need to know about its user.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    exists: bool
+    blocked: bool = False
+    deleted_at: datetime | None = None
+    is_admin: bool = False
+    is_premium: bool = False
+    language: Lang | None = None
+
+    @property
+    def is_good(self) -> bool:
+        return self.exists and not self.blocked and self.deleted_at is None
+
+
+def user_context_key(tg_user_id: int) -> str:
+    return f"user_ctx:{tg_user_id}"
+
+
+def _user_tag(tg_user_id: int) -> str:
+    # the tag every cached per-user lookup carries, bumped by `cache.invalidate_tag` on user updates
+    return f"user:{tg_user_id}"
+
+
+def _flag(value: bool) -> bytes:
+    return b"1" if value else b"0"
+
+
+def _to_hash(context: UserContext, version: int) -> dict[str, bytes]:
+    """
+    One-byte field names and values, so the hash stays in Redis' compact listpack encoding.
+    """
+    return {
+        "v": str(version).encode('ascii'),
+        "e": _flag(context.exists),
+        "b": _flag(context.blocked),
+        "d": context.deleted_at.isoformat().encode('ascii') if context.deleted_at is not None else b"",
+        "a": _flag(context.is_admin),
+        "p": _flag(context.is_premium),
+        "l": context.language.value.encode('utf-8') if context.language is not None else b"",
+    }
+
+
+def _from_hash(fields: dict[bytes, bytes], version: int) -> UserContext | None:
+    """
+    None if the hash is missing, malformed or was stored before the user's tag was last bumped.
+    """
+    try:
+        if int(fields[b"v"]) != version:
+            return None
+        return UserContext(exists=fields[b"e"] == b"1",
+                           blocked=fields[b"b"] == b"1",
+                           deleted_at=datetime.fromisoformat(fields[b"d"].decode('ascii')) if fields[b"d"] else None,
+                           is_admin=fields[b"a"] == b"1",
+                           is_premium=fields[b"p"] == b"1",
+                           language=Lang(fields[b"l"].decode('utf-8')) if fields[b"l"] else None)
+    except (KeyError, ValueError) as e:
+        if fields:
+            logger.warning(f"Ignoring malformed user context hash: {e}")
+        return None
+
+
+@with_session(readonly=True)
+async def load_user_context(tg_user_id: int, s: AsyncSession = None) -> UserContext:
+    stmt = (select(User.blocked, User.deleted_at, User.is_admin, User.is_premium, User.language)
+            .where(User.telegram_id.__eq__(tg_user_id)))
+    row = (await s.execute(stmt)).first()
+    if row is None:
+        return UserContext(exists=False)
+    return UserContext(exists=True, blocked=row.blocked, deleted_at=row.deleted_at,
+                       is_admin=row.is_admin, is_premium=row.is_premium, language=row.language)
+
+
+async def _read(key: str, tg_user_id: int) -> tuple[dict[bytes, bytes], int]:
+    async def operation():
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(key)
+            pipe.get(tag_version_key(_user_tag(tg_user_id)))
+            return await pipe.execute()
+
+    started = time.perf_counter()
+    try:
+        fields, raw_version = await redis_breaker.call(operation)
+    finally:
+        _metrics.redis_seconds.observe(time.perf_counter() - started)
+    return fields, parse_versions([raw_version])[0]
+
+
+async def _store(key: str, context: UserContext, version: int) -> None:
+    async def operation():
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping=_to_hash(context, version))
+            pipe.expire(key, USER_CONTEXT_TTL)
+            return await pipe.execute()
+
+    try:
+        await redis_breaker.call(operation)
+    except RedisError as e:
+        _metrics.redis_errors.inc()
+        log_redis_error(logger, f"Redis error while caching user context: {key}", e)
+
+
+async def get_user_context(tg_user_id: int) -> UserContext:
+    """
+    The user's flags and language from one `users` row, cached as one small Redis hash
+    (plus the in-process L1) and invalidated together with the other lookups tagged `user:{id}`.
+    A missing user is cached too, as `exists=False`.
+    """
+    key = user_context_key(tg_user_id)
+    context = local_cache.get(key)
+    if context is not MISSING:
+        _metrics.l1_hits.inc()
+        return context
+
+    async def compute() -> UserContext:
+        try:
+            fields, version = await _read(key, tg_user_id)
+        except RedisError as e:
+            _metrics.redis_errors.inc()
+            _metrics.bypasses.inc()
+            log_redis_error(logger, f"Redis error while reading user context: {key}", e)
+            version = None
+        else:
+            cached = _from_hash(fields, version)
+            if cached is not None:
+                _metrics.hits.inc()
+                local_cache.set(key, cached, USER_CONTEXT_L1_TTL, tags=(_user_tag(tg_user_id),))
+                return cached
+            _metrics.misses.inc()
+
+        started = time.perf_counter()
+        try:
+            loaded = await load_user_context(tg_user_id)
+        except Exception:
+            _metrics.compute_errors.inc()
+            raise
+        finally:
+            _metrics.compute_seconds.observe(time.perf_counter() - started)
+        # the version was read before the query, so an update racing with it leaves a stale-stamped hash
+        if version is not None:
+            await _store(key, loaded, version)
+        local_cache.set(key, loaded, USER_CONTEXT_L1_TTL, tags=(_user_tag(tg_user_id),))
+        return loaded
+
+    return await single_flight(key, compute)
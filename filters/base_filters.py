@@ -1,12 +1,23 @@
+from abc import abstractmethod
+
 from aiogram.enums import ChatType
 from aiogram.filters import Filter
 from aiogram.types import Message, CallbackQuery
 
-from database import is_user_exists_by_tg, is_good_user_by_tg, has_premium, is_admin
+from database import get_user_context
+
+
+class UserFilter(Filter):
+    """
+    A predicate on the user of the update. With `FilterMemoMiddleware` installed it is
+    evaluated at most once per update and user, however many handlers carry it.
+    """
 
+    @abstractmethod
+    async def check(self, tg_user_id: int) -> bool:
+        pass
 
-class UserExistsFilter(Filter):
-    async def __call__(self, message: Message = None, query: CallbackQuery = None) -> bool:
+    async def __call__(self, message: Message = None, query: CallbackQuery = None, filter_memo: dict | None = None) -> bool:
         if message is not None:
             tg_user_id = message.from_user.id
         elif query is not None:
@@ -14,31 +25,27 @@ class UserExistsFilter(Filter):
         else:
             return False
 
-        return await is_user_exists_by_tg(tg_user_id, cache_id=tg_user_id)
+        if filter_memo is None:
+            return await self.check(tg_user_id)
+        key = (type(self), tg_user_id)
+        if key not in filter_memo:
+            filter_memo[key] = await self.check(tg_user_id)
+        return filter_memo[key]
 
 
-class IsPremiumUser(Filter):
-    async def __call__(self, message: Message = None, query: CallbackQuery = None) -> bool:
-        if message is not None:
-            tg_user_id = message.from_user.id
-        elif query is not None:
-            tg_user_id = query.from_user.id
-        else:
-            return False
+class UserExistsFilter(UserFilter):
+    async def check(self, tg_user_id: int) -> bool:
+        return (await get_user_context(tg_user_id)).exists
 
-        return await has_premium(tg_user_id, cache_id=tg_user_id)
 
+class IsPremiumUser(UserFilter):
+    async def check(self, tg_user_id: int) -> bool:
+        return (await get_user_context(tg_user_id)).is_premium
 
-class IsGoodUserFilter(Filter):
-    async def __call__(self, message: Message = None, query: CallbackQuery = None) -> bool:
-        if message is not None:
-            tg_user_id = message.from_user.id
-        elif query is not None:
-            tg_user_id = query.from_user.id
-        else:
-            return False
 
-        return await is_good_user_by_tg(tg_user_id, cache_id=tg_user_id)
+class IsGoodUserFilter(UserFilter):
+    async def check(self, tg_user_id: int) -> bool:
+        return (await get_user_context(tg_user_id)).is_good
 
 
 class ChatTypeFilter(Filter):
@@ -59,16 +66,9 @@ class ChatTypeFilter(Filter):
         return chat_type == self.chat_type
 
 
-class AdminOnlyFilter(Filter):
-    async def __call__(self, message: Message = None, query: CallbackQuery = None) -> bool:
-        if message is not None:
-            tg_user_id = message.from_user.id
-        elif query is not None:
-            tg_user_id = query.from_user.id
-        else:
-            return False
-
-        return await is_admin(tg_user_id, cache_id=tg_user_id)
+class AdminOnlyFilter(UserFilter):
+    async def check(self, tg_user_id: int) -> bool:
+        return (await get_user_context(tg_user_id)).is_admin
 
 
 class ChannelIdFilter(Filter):
@@ -17,11 +17,18 @@ from handlers.slots import router as slots_router
 from handlers.start import router as start_router
 from handlers.task import router as task_router
 from middleware.metadata_providers import LangProviderMiddleware
-from middleware.middleware import ActivityStatisticMiddleware
+from middleware.middleware import ActivityStatisticMiddleware, SessionScopeMiddleware, FilterMemoMiddleware
 from . import statistic
 
 base_router = Router(name="base_router")
 
+# outer, so filters and middlewares share the update's session too
+base_router.message.outer_middleware(SessionScopeMiddleware())
+base_router.callback_query.outer_middleware(SessionScopeMiddleware())
+# outer, so the memo lives for the whole update, across every router and handler tried
+base_router.message.outer_middleware(FilterMemoMiddleware())
+base_router.callback_query.outer_middleware(FilterMemoMiddleware())
+
 base_router.callback_query.middleware(ActivityStatisticMiddleware())
 
 base_router.message.middleware(LangProviderMiddleware())
@@ -9,7 +9,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message, InlineKeyboardButton
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import TaskType, Task, CurrencyType, now, get_active_task_by_id, delete_task_by_id, with_session
+from database import TaskType, Task, CurrencyType, now, get_active_task_by_id, delete_task_by_id, with_session, save_task
 from filters.base_filters import UserExistsFilter
 from keyboard_markup.inline_user_kb import get_task_menu_kbm, get_admin_task_type_menu_kbm, with_step_back_button, with_exit_button, get_builder, get_inline_button_preview_kbm, get_add_more_buttons_or_continue_kbm, get_continue_or_retry_kbm, \
     get_save_kbm, \
@@ -279,8 +279,7 @@ async def preview(m: CallbackQuery | Message, lang: Lang, state: FSMContext):
 @with_session
 async def save(query: CallbackQuery, lang: Lang, state: FSMContext, s: AsyncSession = None) -> None:
     task = await create_task_from_state_data(state, query.from_user.id)
-    s.add(task)
-    await s.commit()
+    await save_task(task, s=s)
     await state.clear()
     await query.message.answer(text=format_string(get_message(MessageKey.ADMIN_TASK_SAVED_SUCCESSFULLY, lang),
                                                   task_id=task.id))
@@ -4,7 +4,7 @@ from aiogram.types import CallbackQuery
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from chat_processor.member import check_memberships
-from database import get_active_tasks_page, TaskType, get_active_task, Task, TaskDoneHistory, TransactionOperation, with_session
+from database import get_active_tasks_page, TaskType, get_active_task, ActiveTask, add_task_done, TransactionOperation, with_session, TaskSlot, TaskDoneResult, mark_task_done, release_scoped_connection
 from filters.base_filters import UserExistsFilter
 from keyboard_markup.inline_user_kb import with_step_back_button, with_back_to_menu_button, with_pagination_menu, with_task_submit_button
 from lang.lang_based_provider import Lang, get_message, MessageKey, format_string
@@ -26,7 +26,7 @@ async def bonus_task_menu_entrypoint(query: CallbackQuery, lang: Lang, state: FS
 async def bonus_task_menu(query: CallbackQuery, callback_data: PaginationMove, lang: Lang, state: FSMContext) -> None:
     await state.set_state(TaskStates.bonus_select)
     limit = 4
-    pagination = await get_active_tasks_page(query.from_user.id, page=callback_data.page, task_type=TaskType.BONUS, limit=limit)
+    pagination = await get_active_tasks_page(query.from_user.id, page=callback_data.page, task_type=TaskType.BONUS, limit=limit, cursor=callback_data.cursor)
 
     if pagination.is_empty():
         await query.message.edit_text(text=get_message(MessageKey.BONUS_TASK_ENDED, lang),
@@ -38,8 +38,8 @@ async def bonus_task_menu(query: CallbackQuery, callback_data: PaginationMove, l
     prev_page = callback_data.page - 1
 
     params = [
-        {'page': prev_page, 'disabled': prev_page <= 0},
-        {'page': next_page, 'disabled': next_page > pagination.total_pages}
+        {'page': prev_page, 'cursor': pagination.prev_cursor, 'disabled': not pagination.has_prev},
+        {'page': next_page, 'cursor': pagination.next_cursor, 'disabled': not pagination.has_next}
     ]
     text_params = [
         {'cur_page': pagination.current_page, 'total_pages': pagination.total_pages},
@@ -51,7 +51,7 @@ async def bonus_task_menu(query: CallbackQuery, callback_data: PaginationMove, l
 @router.callback_query(TaskStates.bonus_select, BonusTaskSelect.filter(), UserExistsFilter())
 async def select_bonus(query: CallbackQuery, callback_data: BonusTaskSelect, lang: Lang, state: FSMContext) -> None:
     await state.set_state(TaskStates.bonus_select)
-    task: Task = await get_active_task(user_id=query.from_user.id, task_id=callback_data.task_id)
+    task: ActiveTask = await get_active_task(user_id=query.from_user.id, task_id=callback_data.task_id)
     if task is None:
         await bonus_task_menu_entrypoint(query, lang, state)
         return
@@ -69,19 +69,37 @@ async def select_bonus(query: CallbackQuery, callback_data: BonusTaskSelect, lan
 @router.callback_query(TaskStates.bonus_select, TaskDone.filter(), UserExistsFilter())
 @with_session(transaction=True)
 async def process_bonus_task_done(query: CallbackQuery, callback_data: TaskDone, lang: Lang, state: FSMContext, s: AsyncSession) -> None:
-    task: Task = await get_active_task(user_id=query.from_user.id, task_id=callback_data.task_id, session=s)
+    task: ActiveTask = await get_active_task(user_id=query.from_user.id, task_id=callback_data.task_id)
     if task is None:
         await bonus_task_menu_entrypoint(query, lang, state)
         return
 
-    subscription_passed = await check_memberships(query.from_user.id, task.require_subscriptions)
-    if not subscription_passed:
-        await query.answer(get_message(MessageKey.TASK_DONE_UNSUCCESSFULLY, lang), show_alert=True)
-        return
-
-    s.add(TaskDoneHistory(reward=task.done_reward, user_id=query.from_user.id, task_id=task.id))
-    await make_transaction_from_system(query.from_user.id, TransactionOperation.INCREMENT, task.done_reward, description="bonus task done",
-                                       trace=generate_trace(TraceType.TASK_DONE, str(task.trace_uuid)), session=s, currency_type=task.coin_type)
+    async with TaskSlot(task) as slot:
+        if not slot.reserved:
+            await query.answer(get_message(MessageKey.TASK_ENDED, lang), show_alert=True)
+            return
+
+        # the checks call Telegram and the task's services, the update's connection isn't needed meanwhile
+        await release_scoped_connection()
+        subscription_passed = await check_memberships(query.from_user.id, task.require_subscriptions)
+        if not subscription_passed:
+            await query.answer(get_message(MessageKey.TASK_DONE_UNSUCCESSFULLY, lang), show_alert=True)
+            return
+
+        result = await add_task_done(task, query.from_user.id, s=s)
+        if result is TaskDoneResult.ALREADY_DONE:
+            await query.answer(get_message(MessageKey.TASK_ALREADY_HAS_DONE, lang), show_alert=True)
+            return
+        if result is TaskDoneResult.USED_UP:
+            await query.answer(get_message(MessageKey.TASK_ENDED, lang), show_alert=True)
+            return
+
+        # commits the completion along with the reward: the slot is used and the task marked done only once it is
+        await make_transaction_from_system(query.from_user.id, TransactionOperation.INCREMENT, task.done_reward, description="bonus task done",
+                                           trace=generate_trace(TraceType.TASK_DONE, str(task.trace_uuid)), session=s, currency_type=task.coin_type)
+        slot.confirm()
+
+    await mark_task_done(query.from_user.id, task.id)
 
     await query.message.answer(text=format_string(get_message(MessageKey.TASK_DONE_SUCCESSFULLY, lang), task_id=task.id))
     await bonus_task_menu_entrypoint(query, lang, state)
@@ -7,7 +7,6 @@ from filters.base_filters import UserExistsFilter
 from keyboard_markup.inline_user_kb import get_lang_kbm, with_exit_button
 from lang.lang_based_provider import MessageKey
 from lang.lang_based_provider import get_message
-from lang.lang_provider import cache_lang
 from lang_based_variable import LangSetCallback, SetLangMenu, Lang
 from states.states import SettingsStates
 
@@ -25,6 +24,5 @@ async def settings_set_lang_menu(query: CallbackQuery, lang: Lang, state: FSMCon
 async def change_lang_handler(query: CallbackQuery, callback_data: LangSetCallback, state: FSMContext) -> None:
     await update_user_language(query.from_user.id, callback_data.lang)
     await query.answer(text=get_message(MessageKey.LANG_CHANGE, callback_data.lang))
-    await cache_lang(query.from_user.id, callback_data.lang)
     await query.message.delete()
     await state.clear()
@@ -6,7 +6,6 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery, BufferedInputFile, InputMediaPhoto
 from sqlalchemy.ext.asyncio import AsyncSession
 
-import cache
 from chat_processor.member import check_membership
 from database import User, save_user, is_user_exists_by_tg, update_user_language, update_user_is_bot_start_completed_by_tg_id, is_good_user_by_tg, with_session, is_admin
 from filters.base_filters import UserExistsFilter, IsGoodUserFilter
@@ -15,7 +14,6 @@ from keyboard_markup.custom_user_kb import get_reply_keyboard_kbm
 from keyboard_markup.inline_user_kb import get_lang_kbm, get_require_subscription_kbm, get_user_menu_kbm, get_captcha_select_menu_kbm
 from lang.lang_based_provider import MessageKey as msgK, MessageKey, Lang, get_keyboard
 from lang.lang_based_provider import get_message
-from lang.lang_provider import cache_lang
 from lang_based_variable import LangSetCallback, CheckStartMembershipCallback, KeyboardKey, BackToMenu, CaptchaCodeSelect, CaptchaRegenerate
 from providers.tg_arg_provider import TgArg, ArgType
 from states.states import StartStates
@@ -39,7 +37,6 @@ async def command_start_handler(message: Message, state: FSMContext, session: As
         await save_user(user, s=session)
         await state.set_state(StartStates.language)
         await message.answer(get_message(msgK.START), reply_markup=get_lang_kbm())
-        await cache.drop_cache(is_user_exists_by_tg, cache_id=message.from_user.id)
     else:
         await message.answer(text=get_message(msgK.START),
                              reply_markup=get_reply_keyboard_kbm(Lang.EN, await is_admin(message.from_user.id)))
@@ -51,7 +48,6 @@ async def change_lang_handler(query: CallbackQuery, callback_data: LangSetCallba
                               state: FSMContext) -> None:
     await update_user_language(query.from_user.id, callback_data.lang)
     await query.answer(text=get_message(MessageKey.LANG_CHANGE, callback_data.lang))
-    await cache_lang(query.from_user.id, callback_data.lang)
     await state.set_state(StartStates.captcha)
     await query.message.delete()
     # await generate_captcha(query.message, callback_data.lang, state)
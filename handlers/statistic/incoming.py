@@ -18,8 +18,12 @@ router = Router(name="incoming_router")
 
 @router.callback_query(DirtyIncomingStatistic.filter(), UserExistsFilter())
 async def process_dirty_incoming_statistic(query: CallbackQuery, lang: Lang) -> None:
-    await query.message.delete()
     statistic = list(await get_dirty_incoming_statistic())
+    if not statistic:
+        # the daily rollups are empty until the statistic rollup job first runs
+        await query.answer(get_message(MessageKey.STATISTIC_NOT_READY, lang), show_alert=True)
+        return
+    await query.message.delete()
     img = await generate_plot_async(statistic)
     text_table = generate_text_table(list(reversed(statistic)))
     img_file = BufferedInputFile(file=img.read(), filename=f"{uuid4()}.png")
@@ -34,8 +38,12 @@ async def process_dirty_incoming_statistic(query: CallbackQuery, lang: Lang) ->
 
 @router.callback_query(IncomingStatistic.filter(), UserExistsFilter())
 async def process_incoming_statistic(query: CallbackQuery, lang: Lang) -> None:
-    await query.message.delete()
     statistic = list(await get_incoming_statistic())
+    if not statistic:
+        # the daily rollups are empty until the statistic rollup job first runs
+        await query.answer(get_message(MessageKey.STATISTIC_NOT_READY, lang), show_alert=True)
+        return
+    await query.message.delete()
     img = await generate_plot_async(statistic)
     text_table = generate_text_table(list(reversed(statistic)))
     img_file = BufferedInputFile(file=img.read(), filename=f"{uuid4()}.png")
@@ -19,6 +19,10 @@ router = Router(name="user_activity_router")
 @router.callback_query(ActivityStatistic.filter(), UserExistsFilter())
 async def process_statistic(query: CallbackQuery, lang: Lang) -> None:
     statistic = list(await get_activity_statistic())
+    if not statistic:
+        # the daily rollups are empty until the statistic rollup job first runs
+        await query.answer(get_message(MessageKey.STATISTIC_NOT_READY, lang), show_alert=True)
+        return
     img = await generate_plot_async(statistic)
     text_table = generate_text_table(list(reversed(statistic)))
     img_file = BufferedInputFile(file=img.read(), filename=f"{uuid4()}.png")
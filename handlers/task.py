@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from api_request import check_user_exists_via_api
 from chat_processor.member import check_memberships
-from database import get_active_tasks_page, TaskType, Task, get_active_task_by_id, check_task_is_done, TaskDoneHistory, TransactionOperation, with_session
+from database import get_active_tasks_page, TaskType, Task, get_active_task_by_id, check_task_is_done, add_task_done, TransactionOperation, with_session, TaskSlot, ActiveTask, TaskDoneResult, mark_task_done, release_scoped_connection
 from filters.base_filters import UserExistsFilter
 from keyboard_markup.inline_user_kb import with_step_back_button, with_back_to_menu_button, get_select_task_nav_menu_kbm
 from lang.lang_based_provider import Lang, get_message, MessageKey, format_string
@@ -38,8 +38,8 @@ async def task_menu(query: CallbackQuery, lang: Lang, state: FSMContext) -> None
 @router.callback_query(TaskStates.menu, TaskSelect.filter(F.disabled.__eq__(False)), UserExistsFilter())
 async def select_task(query: CallbackQuery, callback_data: TaskSelect, lang: Lang, state: FSMContext) -> None:
     await state.set_state(TaskStates.select)
-    pagination = await get_active_tasks_page(page=callback_data.page, task_type=TaskType(callback_data.task_type), user_id=query.from_user.id)
-    task: Task = pagination.get_one()
+    pagination = await get_active_tasks_page(page=callback_data.page, task_type=TaskType(callback_data.task_type), user_id=query.from_user.id, cursor=callback_data.cursor)
+    task: ActiveTask = pagination.get_one()
     if task is None:
         await query.message.edit_text(text=get_message(MessageKey.TASK_ENDED, lang),
                                       reply_markup=with_back_to_menu_button(lang, with_step_back_button(lang), remove_source=True))
@@ -53,8 +53,8 @@ async def select_task(query: CallbackQuery, callback_data: TaskSelect, lang: Lan
         {'task_id': task.id},
     ]
     params = [
-        {'task_type': callback_data.task_type, 'page': prev_page, 'disabled': prev_page <= 0},
-        {'task_type': callback_data.task_type, 'page': next_offset, 'disabled': next_offset > pagination.total_pages}
+        {'task_type': callback_data.task_type, 'page': prev_page, 'cursor': pagination.prev_cursor, 'disabled': not pagination.has_prev},
+        {'task_type': callback_data.task_type, 'page': next_offset, 'cursor': pagination.next_cursor, 'disabled': not pagination.has_next}
     ]
     await query.message.edit_text(text=text,
                                   reply_markup=with_back_to_menu_button(lang, get_select_task_nav_menu_kbm(lang, done_params, params, markup), remove_source=True),
@@ -67,29 +67,50 @@ async def process_task_done(query: CallbackQuery, callback_data: TaskDone, lang:
     logger.info(f"Processing task done for user_id={query.from_user.id} and task_id={callback_data.task_id}")
 
     task: Task = await get_active_task_by_id(callback_data.task_id, session=s)
+    if task is None:
+        await query.answer(get_message(MessageKey.TASK_ENDED, lang), show_alert=True)
+        return
 
-    done = await check_task_is_done(task.id, query.from_user.id, s=s)
+    done = await check_task_is_done(task.id, query.from_user.id)
     task_type = task.type.value
 
     if done:
         await query.answer(get_message(MessageKey.TASK_ALREADY_HAS_DONE, lang), show_alert=True)
         return
 
-    logger.info(f"Checking task {task.id} for user {query.from_user.id} - Validating memberships and API activations")
+    async with TaskSlot(task) as slot:
+        if not slot.reserved:
+            await query.answer(get_message(MessageKey.TASK_ENDED, lang), show_alert=True)
+            return
 
-    subscription_passed = await check_memberships(query.from_user.id, task.require_subscriptions)
-    api_validation_passed = await check_api_activation(query.from_user.id, task)
+        logger.info(f"Checking task {task.id} for user {query.from_user.id} - Validating memberships and API activations")
 
-    if not (subscription_passed and api_validation_passed):
-        logger.warning(f"Task {task.id} validation failed for user {query.from_user.id}. Subscriptions passed: {subscription_passed}, API passed: {api_validation_passed}")
-        await query.answer(get_message(MessageKey.TASK_DONE_UNSUCCESSFULLY, lang), show_alert=True)
-        return
+        # the checks call Telegram and the task's services, the update's connection isn't needed meanwhile
+        await release_scoped_connection()
+        subscription_passed = await check_memberships(query.from_user.id, task.require_subscriptions)
+        api_validation_passed = await check_api_activation(query.from_user.id, task)
+
+        if not (subscription_passed and api_validation_passed):
+            logger.warning(f"Task {task.id} validation failed for user {query.from_user.id}. Subscriptions passed: {subscription_passed}, API passed: {api_validation_passed}")
+            await query.answer(get_message(MessageKey.TASK_DONE_UNSUCCESSFULLY, lang), show_alert=True)
+            return
+
+        logger.info(f"Task {task.id} successfully validated for user {query.from_user.id}. Adding task history and processing transaction.")
+
+        result = await add_task_done(task, query.from_user.id, s=s)
+        if result is TaskDoneResult.ALREADY_DONE:
+            await query.answer(get_message(MessageKey.TASK_ALREADY_HAS_DONE, lang), show_alert=True)
+            return
+        if result is TaskDoneResult.USED_UP:
+            await query.answer(get_message(MessageKey.TASK_ENDED, lang), show_alert=True)
+            return
 
-    logger.info(f"Task {task.id} successfully validated for user {query.from_user.id}. Adding task history and processing transaction.")
+        # commits the completion along with the reward: the slot is used and the task marked done only once it is
+        await make_transaction_from_system(query.from_user.id, TransactionOperation.INCREMENT, task.done_reward, description="task done",
+                                           trace=generate_trace(TraceType.TASK_DONE, str(task.trace_uuid)), session=s, currency_type=task.coin_type)
+        slot.confirm()
 
-    s.add(TaskDoneHistory(reward=task.done_reward, user_id=query.from_user.id, task_id=task.id))
-    await make_transaction_from_system(query.from_user.id, TransactionOperation.INCREMENT, task.done_reward, description="task done",
-                                       trace=generate_trace(TraceType.TASK_DONE, str(task.trace_uuid)), session=s, currency_type=task.coin_type)
+    await mark_task_done(query.from_user.id, task.id)
 
     logger.info(f"Task {task.id} done successfully for user {query.from_user.id}. Reward: {task.done_reward}")
 
@@ -79,6 +79,7 @@ class MessageKey(Enum):
     USER_DIRTY_INCOMING_STATISTIC = "user_dirty_incoming_statistic"
     USER_INCOMING_STATISTIC = "user_incoming_statistic"
     TASK_DONE_STATISTIC = "task_done_statistic"
+    STATISTIC_NOT_READY = "statistic_not_ready"
 
 
 class KeyboardKey(Enum):
@@ -311,6 +312,7 @@ class DeleteTask(CallbackData, prefix="delete-task"):
 class TaskSelect(CallbackData, prefix="task-select"):
     task_type: int
     page: int
+    cursor: str | None = None
     disabled: bool = False
 
 
@@ -320,6 +322,7 @@ class BonusTaskSelect(CallbackData, prefix="bonus-task-select"):
 
 class PaginationMove(CallbackData, prefix="pagination-move"):
     page: int
+    cursor: str | None = None
     disabled: bool = False
 
 
@@ -432,6 +435,7 @@ message_data = {
         MessageKey.USER_DIRTY_INCOMING_STATISTIC: "<b>📊 Статистика грязного прихода юзеров.\n⚠️ Это юзеры, которые зашли в бота, но не прошли регистрацию.\n({min_date} - {max_date})</b>\n<pre>{text_table}</pre>",
         MessageKey.USER_INCOMING_STATISTIC: "<b>📊 Статистика прихода юзеров.\n⚠️ Это юзеры, которые зашли в бота и прошли регистрацию.\n({min_date} - {max_date})</b>\n<pre>{text_table}</pre>",
         MessageKey.TASK_DONE_STATISTIC: "<b>📊 Статистика выполнения активных заданий</b>\n<pre>{text_table}</pre>",
+        MessageKey.STATISTIC_NOT_READY: "⏳ Статистика ещё собирается, попробуйте через несколько минут.",
     },
     Lang.EN: {
         MessageKey.LANG_CHANGE: "Language successfully changed to English!",
@@ -499,6 +503,7 @@ message_data = {
         MessageKey.USER_DIRTY_INCOMING_STATISTIC: "<b>📊 Dirty user incoming statistics.\n⚠️ These are users who entered the bot but did not complete registration.\n({min_date} - {max_date})</b>\n<pre>{text_table}</pre>",
         MessageKey.USER_INCOMING_STATISTIC: "<b>📊 User incoming statistics.\n⚠️ These are users who entered the bot and completed registration.\n({min_date} - {max_date})</b>\n<pre>{text_table}</pre>",
         MessageKey.TASK_DONE_STATISTIC: "<b>📊 Task Completion Statistics</b>\n<pre>{text_table}</pre>",
+        MessageKey.STATISTIC_NOT_READY: "⏳ The statistics are still being collected, try again in a few minutes.",
 
     },
     Lang.TR: {
@@ -567,6 +572,7 @@ message_data = {
         MessageKey.USER_DIRTY_INCOMING_STATISTIC: "<b>📊 Kirli kullanıcı giriş istatistikleri.\n⚠️ Bunlar bota giren ancak kaydını tamamlamayan kullanıcılardır.\n({min_date} - {max_date})</b>\n<pre>{text_table}</pre>",
         MessageKey.USER_INCOMING_STATISTIC: "<b>📊 Kullanıcı giriş istatistikleri.\n⚠️ Bunlar bota girip kaydını tamamlayan kullanıcılardır.\n({min_date} - {max_date})</b>\n<pre>{text_table}</pre>",
         MessageKey.TASK_DONE_STATISTIC: "<b>📊 Aktif Görevlerin İstatistikleri</b>\n<pre>{text_table}</pre>",
+        MessageKey.STATISTIC_NOT_READY: "⏳ İstatistikler hâlâ toplanıyor, birkaç dakika sonra tekrar deneyin.",
 
     },
     Lang.DE: {
@@ -635,6 +641,7 @@ message_data = {
         MessageKey.USER_DIRTY_INCOMING_STATISTIC: "<b>📊 Statistiken über nicht registrierte Nutzer.\n⚠️ Dies sind Nutzer, die den Bot betreten, aber die Registrierung nicht abgeschlossen haben.\n({min_date} - {max_date})</b>\n<pre>{text_table}</pre>",
         MessageKey.USER_INCOMING_STATISTIC: "<b>📊 Nutzerstatistiken.\n⚠️ Dies sind Nutzer, die den Bot betreten und die Registrierung abgeschlossen haben.\n({min_date} - {max_date})</b>\n<pre>{text_table}</pre>",
         MessageKey.TASK_DONE_STATISTIC: "<b>📊 Statistik über abgeschlossene Aufgaben</b>\n<pre>{text_table}</pre>",
+        MessageKey.STATISTIC_NOT_READY: "⏳ Die Statistiken werden noch erfasst, versuchen Sie es in ein paar Minuten erneut.",
     },
 }
 
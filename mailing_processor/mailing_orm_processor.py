@@ -2,12 +2,11 @@ import logging
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import Mailing, get_session, MailingStatus, MailingMessage, MailingMessageStatus
+from database import Mailing, get_session, MailingStatus, MailingMessage, MailingMessageStatus, PoolClass
 from mailing_processor.classes import MM
 
 
 async def generate_mailing(s: AsyncSession, mm: MM) -> Mailing:
-    await s.begin()
     mailing = Mailing(
         files=mm.files,
         text=mm.text,
@@ -17,12 +16,12 @@ async def generate_mailing(s: AsyncSession, mm: MM) -> Mailing:
     )
     s.add(mailing)
     await s.commit()
-    s.expunge_all()
+    s.expunge(mailing)
     return mailing
 
 
 async def generate_mailing_messages(mailing: Mailing, user_ids: list[int]) -> list["MailingMessage"]:
-    s = get_session()
+    s = get_session(PoolClass.BACKGROUND)
     await s.begin()
     messages: list["MailingMessage"] = []
     for user_id in user_ids:
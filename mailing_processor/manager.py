@@ -1,7 +1,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import rabbit
-from database import MailingMessage, get_mailing, get_mailing_messages_by_mailing_id, update_mailing_message_statuses_by_mailing_id, MailingMessageStatus, with_session
+from database import MailingMessage, get_mailing, get_mailing_messages_by_mailing_id, update_mailing_message_statuses_by_mailing_id, MailingMessageStatus, with_session, PoolClass
 from mailing_processor.classes import MM, MMD
 from mailing_processor.mailing_orm_processor import generate_mailing, generate_mailing_messages
 from mailing_processor.user_selector import get_all_user_ids
@@ -10,7 +10,7 @@ from rabbit.producers import BlockingTransactionalPublisher
 from utils import trywrap_async
 
 
-@with_session
+@with_session(pool=PoolClass.BACKGROUND)
 async def start_mailing(mm: MM, s: AsyncSession = None) -> (MMD, bool):
     user_ids = await get_all_user_ids()
     mailing = await generate_mailing(s, mm)
@@ -34,7 +34,7 @@ async def fill_queue(mailing, messages):
     return result
 
 
-@with_session
+@with_session(pool=PoolClass.BACKGROUND)
 async def fill_queue_by_mailing_id(mailing_id: int, s: AsyncSession = None) -> bool:
     mailing = await get_mailing(mailing_id, s=s)
     messages = await get_mailing_messages_by_mailing_id(mailing_id, s=s)
@@ -4,7 +4,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from database import User, with_session
 
 
-@with_session
+@with_session(replica=True)
 async def get_all_user_ids(s: AsyncSession = None) -> list[int]:
     stmt = (select(User.telegram_id)
             .where(User.deleted_at.__eq__(None)))
@@ -0,0 +1 @@
+from metrics.registry import Counter, Gauge, Histogram, Registry, registry, LATENCY_BUCKETS, SIZE_BUCKETS
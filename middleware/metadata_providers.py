@@ -3,7 +3,7 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message
 
-from database import is_user_admin_by_tg_id, has_premium
+from database import get_user_context
 from lang.lang_provider import get_cached_lang
 
 
@@ -27,7 +27,7 @@ class IsAdminProviderMiddleware(BaseMiddleware):
             event: Message,
             data: Dict[str, Any]
     ) -> Any:
-        data['is_admin'] = await is_user_admin_by_tg_id(event.from_user.id, cache_id=event.from_user.id)
+        data['is_admin'] = (await get_user_context(event.from_user.id)).is_admin
         return await handler(event, data)
 
 
@@ -38,5 +38,5 @@ class IsPremiumUserMiddleware(BaseMiddleware):
             event: Message,
             data: Dict[str, Any]
     ) -> Any:
-        data['is_premium'] = await has_premium(event.from_user.id, cache_id=event.from_user.id)
+        data['is_premium'] = (await get_user_context(event.from_user.id)).is_premium
         return await handler(event, data)
@@ -2,9 +2,10 @@ import asyncio
 from typing import Callable, Dict, Any, Awaitable
 
 from aiogram import BaseMiddleware
-from aiogram.types import CallbackQuery
+from aiogram.types import CallbackQuery, TelegramObject
 
-from database import save_activity_statistic, UserActivityContext
+from database import save_activity_statistic, track_active_user, UserActivityContext, session_scope, query_unit, OTHER_CALLBACK_PREFIX
+from utils.callback_prefix_filters import registered_callback_prefixes
 
 
 class ActivityStatisticMiddleware(BaseMiddleware):
@@ -17,4 +18,33 @@ class ActivityStatisticMiddleware(BaseMiddleware):
         prefix = event.data.split(':', 1)[0]
         context = UserActivityContext(callback_query_prefix=prefix)
         _ = asyncio.create_task(save_activity_statistic(event.from_user.id, context))
+        tracked_prefix = prefix if prefix in registered_callback_prefixes() else OTHER_CALLBACK_PREFIX
+        _ = asyncio.create_task(track_active_user(event.from_user.id, tracked_prefix))
+        return await handler(event, data)
+
+
+class SessionScopeMiddleware(BaseMiddleware):
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        with query_unit('update'):
+            async with session_scope():
+                return await handler(event, data)
+
+
+class FilterMemoMiddleware(BaseMiddleware):
+    """
+    Gives the filters of one update a shared memo (`filter_memo`), see `filters.base_filters.UserFilter`.
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        data['filter_memo'] = {}
         return await handler(event, data)
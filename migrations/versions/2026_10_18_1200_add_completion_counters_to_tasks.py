@@ -0,0 +1,35 @@
+"""add completion counters to tasks
+
+Revision ID: 89fcffabbdc9
+Revises: 71ebdf16831f
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '89fcffabbdc9'
+down_revision: Union[str, None] = '71ebdf16831f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tasks', sa.Column('done_count', sa.BigInteger(), server_default='0', nullable=False, comment='number of tasks_done_history rows'))
+    op.add_column('tasks', sa.Column('rewarded_amount', sa.BigInteger(), server_default='0', nullable=False, comment='sum of tasks_done_history rewards'))
+    op.execute("""
+        UPDATE tasks
+        SET done_count = h.done_count, rewarded_amount = h.rewarded_amount
+        FROM (SELECT task_id, count(*) AS done_count, COALESCE(sum(reward), 0) AS rewarded_amount
+              FROM tasks_done_history
+              GROUP BY task_id) AS h
+        WHERE tasks.id = h.task_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('tasks', 'rewarded_amount')
+    op.drop_column('tasks', 'done_count')
@@ -0,0 +1,126 @@
+"""add indexes for hot lookups
+
+Revision ID: 5d0e7b2c94a1
+Revises: 89fcffabbdc9
+Create Date: 2026-10-18 18:00:00.000000
+
+Deploy order: run this migration to completion before deploying the `add_task_done` that inserts
+with ON CONFLICT ON CONSTRAINT uq_tasks_done_history_task_id_user_id, which fails while the constraint
+is missing. The code running meanwhile may still insert duplicate completions: they are archived again
+before every attempt at the unique index, and the migration can be rerun after any failure.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.exc import IntegrityError
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0e7b2c94a1'
+down_revision: Union[str, None] = '89fcffabbdc9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# built with CREATE INDEX CONCURRENTLY, so the tables stay writable while the indexes are built
+INDEXES = (
+    ('ix_users_referred_by_id', 'users', ['referred_by_id']),
+    ('ix_tasks_done_history_user_id_task_id', 'tasks_done_history', ['user_id', 'task_id']),
+    ('ix_transactions_source_id_type', 'transactions', ['source_id', 'type']),
+    ('ix_mailing_messages_mailing_id_status', 'mailing_messages', ['mailing_id', 'status']),
+    ('ix_user_activity_statistics_datetime', 'user_activity_statistics', ['datetime']),
+)
+TASK_DONE_ONCE = 'uq_tasks_done_history_task_id_user_id'
+# duplicates inserted by the running code while the unique index is built make it fail
+UNIQUE_INDEX_ATTEMPTS = 3
+
+# the completions after the first of every (task, user) pair were paid too: they move to the archive,
+# which the task counters keep counting, so done_count and rewarded_amount stay as they are
+ARCHIVE_DUPLICATES = """
+    WITH duplicates AS (
+        DELETE FROM tasks_done_history AS h
+        USING tasks_done_history AS first
+        WHERE h.task_id = first.task_id AND h.user_id = first.user_id AND h.id > first.id
+        RETURNING h.id, h.reward, h.user_id, h.task_id, h.created_at
+    )
+    INSERT INTO tasks_done_history_duplicates (id, reward, user_id, task_id, created_at)
+    SELECT id, reward, user_id, task_id, created_at FROM duplicates
+"""
+
+
+def _index_valid(name: str) -> bool | None:
+    """
+    Whether the index exists and is valid: a failed concurrent build leaves an invalid one behind.
+    None if it doesn't exist, or when only generating the SQL.
+    """
+    if op.get_context().as_sql:
+        return None
+    return op.get_bind().scalar(sa.text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {'name': name})
+
+
+def _create_index_concurrently(name: str, table: str, columns: list[str], unique: bool = False) -> None:
+    valid = _index_valid(name)
+    if valid:
+        return
+    if valid is False:
+        op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+
+
+def _constraint_exists(name: str, table: str) -> bool:
+    if op.get_context().as_sql:
+        return False
+    return op.get_bind().scalar(sa.text("SELECT EXISTS (SELECT FROM pg_constraint WHERE conname = :name AND conrelid = to_regclass(:table))"),
+                                {'name': name, 'table': table})
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS tasks_done_history_duplicates (
+            id BIGINT PRIMARY KEY,
+            reward BIGINT,
+            user_id BIGINT NOT NULL,
+            task_id BIGINT NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE,
+            archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_tasks_done_history_duplicates_task_id ON tasks_done_history_duplicates (task_id)")
+    op.execute("COMMENT ON TABLE tasks_done_history_duplicates IS 'completions repeated before the unique (task_id, user_id) constraint existed'")
+    op.alter_column('tasks', 'done_count', existing_type=sa.BigInteger(), existing_nullable=False, existing_server_default='0',
+                    comment='number of tasks_done_history and tasks_done_history_duplicates rows')
+    op.alter_column('tasks', 'rewarded_amount', existing_type=sa.BigInteger(), existing_nullable=False, existing_server_default='0',
+                    comment='sum of tasks_done_history and tasks_done_history_duplicates rewards')
+
+    # CONCURRENTLY can't run inside a transaction, every statement below commits on its own
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            _create_index_concurrently(name, table, columns)
+
+        if not _constraint_exists(TASK_DONE_ONCE, 'tasks_done_history'):
+            for attempt in range(1, UNIQUE_INDEX_ATTEMPTS + 1):
+                op.execute(ARCHIVE_DUPLICATES)
+                try:
+                    _create_index_concurrently(TASK_DONE_ONCE, 'tasks_done_history', ['task_id', 'user_id'], unique=True)
+                    break
+                except IntegrityError:
+                    if attempt == UNIQUE_INDEX_ATTEMPTS:
+                        raise
+            # only takes a short lock: the index is already built and checked
+            op.execute(f"ALTER TABLE tasks_done_history ADD CONSTRAINT {TASK_DONE_ONCE} UNIQUE USING INDEX {TASK_DONE_ONCE}")
+
+
+def downgrade() -> None:
+    op.drop_constraint(TASK_DONE_ONCE, 'tasks_done_history', type_='unique')
+    # the counters count the archived completions, the history does again once they are back
+    op.execute("""
+        INSERT INTO tasks_done_history (id, reward, user_id, task_id, created_at)
+        SELECT id, reward, user_id, task_id, created_at FROM tasks_done_history_duplicates
+    """)
+    op.drop_table('tasks_done_history_duplicates')
+    op.alter_column('tasks', 'done_count', existing_type=sa.BigInteger(), existing_nullable=False, existing_server_default='0',
+                    comment='number of tasks_done_history rows')
+    op.alter_column('tasks', 'rewarded_amount', existing_type=sa.BigInteger(), existing_nullable=False, existing_server_default='0',
+                    comment='sum of tasks_done_history rewards')
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,61 @@
+"""add daily statistic rollups
+
+Revision ID: 2f8a6c1d7e35
+Revises: 5d0e7b2c94a1
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '2f8a6c1d7e35'
+down_revision: Union[str, None] = '5d0e7b2c94a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('daily_user_statistics',
+                    sa.Column('date', sa.Date(), nullable=False),
+                    sa.Column('joined', sa.BigInteger(), nullable=False, comment='users created that day'),
+                    sa.Column('clean_joined', sa.BigInteger(), nullable=False, comment='users created that day, not blocked or deleted when rolled up'),
+                    sa.Column('active_users', sa.BigInteger(), nullable=False, comment='distinct users of user_activity_statistics that day'),
+                    sa.Column('rolled_up_at', sa.DateTime(timezone=True), nullable=False),
+                    sa.PrimaryKeyConstraint('date')
+                    )
+    op.create_table('daily_callback_statistics',
+                    sa.Column('date', sa.Date(), nullable=False),
+                    sa.Column('callback_query_prefix', sa.Text(), nullable=False, comment='empty for activities without one'),
+                    sa.Column('activities', sa.BigInteger(), nullable=False),
+                    sa.Column('active_users', sa.BigInteger(), nullable=False),
+                    sa.PrimaryKeyConstraint('date', 'callback_query_prefix', name='daily_callback_statistics_pk')
+                    )
+
+    # backfilled here, so the statistics have data from the deploy on; the statistic rollup job
+    # keeps the last two days, which are not final yet, up to date (see `get_statistic_rollup_start`)
+    op.execute("""
+        INSERT INTO daily_user_statistics (date, joined, clean_joined, active_users, rolled_up_at)
+        SELECT date, COALESCE(j.joined, 0), COALESCE(j.clean_joined, 0), COALESCE(a.active_users, 0), now()
+        FROM (SELECT date(created_at) AS date,
+                     count(*) AS joined,
+                     count(*) FILTER (WHERE blocked IS false AND deleted_at IS NULL) AS clean_joined
+              FROM users
+              GROUP BY 1) AS j
+        FULL JOIN (SELECT date(datetime) AS date, count(DISTINCT user_id) AS active_users
+                   FROM user_activity_statistics
+                   GROUP BY 1) AS a USING (date)
+    """)
+    op.execute("""
+        INSERT INTO daily_callback_statistics (date, callback_query_prefix, activities, active_users)
+        SELECT date(datetime), COALESCE(context ->> 'callback_query_prefix', ''), count(*), count(DISTINCT user_id)
+        FROM user_activity_statistics
+        GROUP BY 1, 2
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('daily_callback_statistics')
+    op.drop_table('daily_user_statistics')
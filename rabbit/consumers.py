@@ -10,7 +10,7 @@ import pika
 from pika.adapters.asyncio_connection import AsyncioConnection
 from pika.channel import Channel
 
-from database import get_session, get_mailing_message, MailingMessageStatus, MailingStatus, finish_mailing
+from database import get_session, get_mailing_message, MailingMessageStatus, MailingStatus, finish_mailing, PoolClass, pool_scope
 from rabbit.classes import MessageDto
 from variables import bot
 
@@ -249,7 +249,9 @@ class MessageConsumer(object):
             logger.info(f"Decoded JSON: {json_data}")
 
             m = MessageDto.model_validate_json(json_data)
-            self._outer_async_loop.create_task(self.__send_message(m, basic_deliver))
+            # the task copies the context: every session it opens comes from the background pool
+            with pool_scope(PoolClass.BACKGROUND):
+                self._outer_async_loop.create_task(self.__send_message(m, basic_deliver))
         except Exception as e:
             logger.error(f"Failed to process message: {e}")
             logger.debug(f"Stack trace: {traceback.format_exc()}")
@@ -1,10 +1,12 @@
+import asyncio
+
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import cache
 from database import get_setting_by_id, SettingsKey, with_session
 
 
-@cache.cacheable()
+@cache.cacheable(l1_ttl="5m")
 async def get_setting(key: SettingsKey) -> str | int:
     setting = await get_setting_by_id(key)
     if setting.int_val is not None:
@@ -13,6 +15,11 @@ async def get_setting(key: SettingsKey) -> str | int:
         return setting.str_val
 
 
+@cache.warmup
+async def warm_up_settings() -> None:
+    await asyncio.gather(*(get_setting(key) for key in SettingsKey))
+
+
 @with_session(transaction=True)
 async def update_setting(key: SettingsKey, value: str | int, s: AsyncSession = None) -> None:
     setting = get_setting_by_id(key, s=s)
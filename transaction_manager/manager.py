@@ -3,6 +3,7 @@ from typing import Tuple
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+import cache
 from database import TransactionOperation, Transaction, get_user_by_tg, User, TransactionStatus, TransactionType, TransactionInitiatorType, CurrencyType, with_session
 
 
@@ -95,9 +96,10 @@ async def make_transaction_from_system(target: int,
     )
     session.add(transaction)
     await session.commit()
+    await cache.invalidate_tag(f"user:{target}")
 
 
-@with_session
+@with_session(readonly=True)
 async def select_transactions_sum_amount(tg_user_id: int, transaction_type: TransactionType, s: AsyncSession = None) -> int:
     stmt = (select(func.sum(Transaction.amount))
             .where(Transaction.source_id.__eq__(tg_user_id))
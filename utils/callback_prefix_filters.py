@@ -0,0 +1,95 @@
+import logging
+from functools import cache
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import HandlerObject, FilterObject
+from aiogram.filters import Filter
+from aiogram.filters.callback_data import CallbackQueryFilter, CallbackData
+from aiogram.types import CallbackQuery
+
+logger = logging.getLogger(__name__)
+
+CALLBACK_DATA_SEPARATOR = ':'
+
+
+def callback_prefix(data: str | None) -> str | None:
+    if data is None:
+        return None
+    return data.split(CALLBACK_DATA_SEPARATOR, 1)[0]
+
+
+@cache
+def registered_callback_prefixes() -> frozenset[str]:
+    """
+    Prefixes of every `CallbackData` class defined. Callback data is set by clients, so anything else is arbitrary;
+    call once the handlers are imported.
+    """
+    prefixes = set()
+    classes = list(CallbackData.__subclasses__())
+    while classes:
+        cls = classes.pop()
+        classes.extend(cls.__subclasses__())
+        if getattr(cls, '__prefix__', None):
+            prefixes.add(cls.__prefix__)
+    return frozenset(prefixes)
+
+
+def _handler_prefix(handler: HandlerObject) -> str | None:
+    """
+    The prefix every callback accepted by `handler` carries, None if any callback may pass its filters.
+    """
+    for filter_object in handler.filters or ():
+        if isinstance(filter_object.callback, CallbackQueryFilter):
+            return filter_object.callback.callback_data.__prefix__
+    return None
+
+
+class _CallbackPrefixFilter(Filter):
+    """
+    Passes callbacks with one of `prefixes`: a string split and a set lookup, checked before the
+    filters of a handler, or among the root filters of a router, that can't accept any other.
+    """
+
+    def __init__(self, prefixes: frozenset[str]):
+        self.prefixes = prefixes
+
+    async def __call__(self, query: CallbackQuery) -> bool:
+        return callback_prefix(query.data) in self.prefixes
+
+
+def _check_prefix_first(handler: HandlerObject, prefix: str) -> None:
+    # filters are checked in order and the first failing one rejects, so a foreign callback costs one lookup
+    handler.filters.insert(0, FilterObject(_CallbackPrefixFilter(frozenset((prefix,)))))
+
+
+def install_callback_prefix_filters(router: Router) -> tuple[frozenset[str], bool]:
+    """
+    Pre-filters the callback query handlers of `router` and its sub-routers by callback data prefix.
+    This is not an index: aiogram still walks the handlers in order, but one registered for another
+    prefix rejects the callback on its first filter, and a router whose subtree can't handle the prefix
+    is skipped as a whole by a root filter (checked after the root filters the router already has).
+    Call once, after every router is included.
+
+    :return: the prefixes handled in the subtree, and whether it also has handlers accepting any callback
+    """
+    prefixes = set()
+    accepts_any = False
+    for handler in router.callback_query.handlers:
+        prefix = _handler_prefix(handler)
+        if prefix is None:
+            accepts_any = True
+        else:
+            prefixes.add(prefix)
+            _check_prefix_first(handler, prefix)
+
+    for sub_router in router.sub_routers:
+        sub_prefixes, sub_accepts_any = install_callback_prefix_filters(sub_router)
+        prefixes |= sub_prefixes
+        accepts_any |= sub_accepts_any
+
+    prefixes = frozenset(prefixes)
+    if not accepts_any:
+        router.callback_query.filter(_CallbackPrefixFilter(prefixes))
+    logger.debug(f"Pre-filtered callback handlers of {router.name}: {len(prefixes)} prefixes"
+                 f"{', plus handlers accepting any callback' if accepts_any else ''}")
+    return prefixes, accepts_any
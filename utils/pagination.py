@@ -1,4 +1,8 @@
-from typing import List, TypeVar, Generic, Union, Callable, Any, Optional
+import base64
+import binascii
+import datetime
+import struct
+from typing import List, TypeVar, Generic, Union, Callable, Any, Optional, NamedTuple
 
 from starlette.responses import JSONResponse
 
@@ -7,12 +11,45 @@ T = TypeVar('T')
 R = TypeVar('R')
 
 
+# backward flag, created_at in microseconds since the epoch, id
+_CURSOR_FORMAT = struct.Struct('>?qq')
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.UTC)
+
+
+class Cursor(NamedTuple):
+    """
+    Keyset position in a listing ordered by `(created_at, id)` from new to old.
+    A `backward` cursor points at the page before the row, otherwise at the page after it.
+    """
+    created_at: datetime.datetime
+    id: int
+    backward: bool = False
+
+    def encode(self) -> str:
+        # 23 url-safe characters without ':', so it fits into callback data
+        created_at = self.created_at if self.created_at.tzinfo else self.created_at.replace(tzinfo=datetime.UTC)
+        micros = (created_at - _EPOCH) // datetime.timedelta(microseconds=1)
+        return base64.urlsafe_b64encode(_CURSOR_FORMAT.pack(self.backward, micros, self.id)).rstrip(b'=').decode('ascii')
+
+    @classmethod
+    def decode(cls, value: str) -> 'Cursor':
+        try:
+            raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+            backward, micros, id_ = _CURSOR_FORMAT.unpack(raw)
+        except (binascii.Error, struct.error, UnicodeEncodeError) as e:
+            raise ValueError(f"Invalid pagination cursor: {value!r}") from e
+        return cls(_EPOCH + datetime.timedelta(microseconds=micros), id_, backward)
+
+
 class Pagination(Generic[T]):
-    def __init__(self, items: List[T], total_items: int, current_page: int, total_pages: int):
+    def __init__(self, items: List[T], total_items: int, current_page: int, total_pages: int,
+                 next_cursor: str | None = None, prev_cursor: str | None = None):
         self.items = items  # List of items on the current page
         self.total_items = total_items  # Total number of items matching the criteria
         self.current_page = current_page  # Current page number
         self.total_pages = total_pages  # Total number of pages
+        self.next_cursor = next_cursor  # Cursor of the next page, None on the last one
+        self.prev_cursor = prev_cursor  # Cursor of the previous page, None on the first one
 
     def __repr__(self) -> str:
         return (
@@ -20,7 +57,9 @@ class Pagination(Generic[T]):
             f"items={self.items}, "
             f"total_items={self.total_items}, "
             f"current_page={self.current_page}, "
-            f"total_pages={self.total_pages})"
+            f"total_pages={self.total_pages}, "
+            f"next_cursor={self.next_cursor}, "
+            f"prev_cursor={self.prev_cursor})"
         )
 
     def get_one(self) -> Union[T, None]:
@@ -29,6 +68,14 @@ class Pagination(Generic[T]):
     def is_empty(self):
         return len(self.items) == 0
 
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
     def map_each(self, func: Callable[[T], Any]) -> None:
         """
         Applies the given function to each item in the `items` list.
@@ -47,7 +94,9 @@ class PaginatedResponse(Generic[R], JSONResponse):
             "items": pagination.items,
             "total_items": pagination.total_items,
             "current_page": pagination.current_page,
-            "total_pages": pagination.total_pages
+            "total_pages": pagination.total_pages,
+            "next_cursor": pagination.next_cursor,
+            "prev_cursor": pagination.prev_cursor
         }
 
         super().__init__(content=content, *args, **kwargs)
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel: `schedule` and `cancel` are O(1) whatever the number of timers,
+    and each tick only looks at the timers of one slot. A timer never fires before its time,
+    and at most two ticks after it.
+
+    Callbacks are plain functions called with the timer key from the wheel's task;
+    they must not block. `run` starts ticking, timers scheduled before are kept.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self._tick = tick
+        self._slots: list[dict[Hashable, tuple[int, Callable[[Hashable], None]]]] = [{} for _ in range(slots)]
+        self._slot_of: dict[Hashable, int] = {}
+        self._cursor = 0
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def schedule(self, key: Hashable, when: float, callback: Callable[[Hashable], None]) -> None:
+        """
+        Calls `callback(key)` at the epoch time `when`, replacing the timer `key` had.
+        """
+        self.cancel(key)
+        # the current tick is already partly over, so one more keeps the timer from firing early
+        ticks = max(math.ceil((when - time.time()) / self._tick), 0) + 1
+        slot = (self._cursor + ticks) % len(self._slots)
+        # the slot comes around every len(slots) ticks
+        self._slots[slot][key] = ((ticks - 1) // len(self._slots), callback)
+        self._slot_of[key] = slot
+
+    def cancel(self, key: Hashable) -> None:
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            del self._slots[slot][key]
+
+    def run(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _advance(self) -> None:
+        self._cursor = (self._cursor + 1) % len(self._slots)
+        slot = self._slots[self._cursor]
+        due = [key for key, (rounds, _) in slot.items() if rounds == 0]
+        for key, (rounds, callback) in list(slot.items()):
+            if rounds > 0:
+                slot[key] = (rounds - 1, callback)
+        for key in due:
+            _, callback = slot.pop(key)
+            del self._slot_of[key]
+            try:
+                callback(key)
+            except Exception as e:
+                logger.error(f"Timer {key} failed: {e}")
+
+    async def _loop(self) -> None:
+        started = time.monotonic()
+        ticks = 0
+        while True:
+            await asyncio.sleep(max(started + (ticks + 1) * self._tick - time.monotonic(), 0))
+            # catch up on the ticks a busy loop delayed
+            while started + (ticks + 1) * self._tick <= time.monotonic():
+                self._advance()
+                ticks += 1